@@ -2,12 +2,12 @@ import os
 import uvicorn
 from fastapi import FastAPI, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -27,6 +27,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure Gemini
@@ -52,6 +53,7 @@ from datetime import datetime
 # Database Initialization
 from .database import JsonDatabase, FirestoreDatabase
 from auth import verify_token
+from langsmith_config import token_tracker
 from fastapi import Depends, HTTPException
 
 project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -204,10 +206,24 @@ async def chat_endpoint(
         db.save_job(job_data)
 
 @app.get("/analytics")
-def get_analytics(user_id: str, token_uid: str = Depends(verify_token)):
+def get_analytics(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    token_uid: str = Depends(verify_token)
+):
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="User ID mismatch.")
-    return db.get_user_jobs(user_id)
+    if limit is None and cursor is None:
+        return db.get_user_jobs(user_id)
+    try:
+        jobs, next_cursor = db.get_user_jobs_page(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
 
 @app.get("/chat")
 def health_check_chat():
@@ -9,7 +9,7 @@ import json
 import re
 from datetime import datetime
 from typing import List, Optional, Dict
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import google.generativeai as genai
@@ -49,6 +49,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Initialize Providers
@@ -95,6 +96,12 @@ app.mount("/videos", StaticFiles(directory="Generated_Videos"), name="videos")
 
 # --- Core Logic ---
 
+def update_job(job: MovieJob, **fields):
+    """Applies fields to the in-memory job and persists only those fields."""
+    for key, value in fields.items():
+        setattr(job, key, value)
+    db.update_job_fields(job.job_id, fields)
+
 async def generate_script(job_id: str, topic: str, duration_seconds: int, resolution: str = "1080p"):
     """Generates a scene-by-scene script using Gemini."""
     logger.info(f"[{job_id}] Generating script for: {topic} ({duration_seconds}s, {resolution})")
@@ -323,7 +330,7 @@ async def production_loop(job_id: str):
                 
             logger.info(f"[{job_id}] Generating Scene {scene.id}/{total_scenes}: {scene.visual_prompt[:50]}...")
             scene.status = "generating"
-            db.save_job(job)
+            update_job(job, scenes=job.scenes)
             
             max_retries = 0
             retry_delay = 0
@@ -400,8 +407,7 @@ async def production_loop(job_id: str):
                     previous_operation_name = operation_name
                     logger.info(f"[{job_id}] Scene {scene.id} completed. Path: {final_path}")
                     
-                    job.progress = int(10 + ((i + 1) / total_scenes) * 80)
-                    db.save_job(job)
+                    update_job(job, scenes=job.scenes, progress=int(10 + ((i + 1) / total_scenes) * 80))
                     break 
                     
                 except Exception as e:
@@ -412,15 +418,14 @@ async def production_loop(job_id: str):
                         await asyncio.sleep(wait_time)
                     else:
                         scene.status = "failed"
-                        db.save_job(job)
+                        update_job(job, scenes=job.scenes)
                         continue
 
         # All scenes processed
         await stitch_movie(job_id)
         
-        job.status = "completed"
-        job.progress = 100
-        db.save_job(job)
+        # Only status/progress: stitch_movie already stored final_video_path
+        update_job(job, status="completed", progress=100)
         logger.info(f"[{job_id}] Job completed successfully.")
 
 async def stitch_movie(job_id: str):
@@ -466,8 +471,7 @@ async def stitch_movie(job_id: str):
         if os.path.exists(temp_output_path):
             os.remove(temp_output_path)
 
-        job.final_video_path = output_filename 
-        db.save_job(job)
+        update_job(job, final_video_path=output_filename)
         
         logger.info(f"[{job_id}] Stitching complete: {final_key}")
 
@@ -507,22 +511,17 @@ async def generate_script_task(job_id: str, request: MovieRequest):
         
     try:
         # 1. Scripting
-        job.status = "scripting"
-        job.progress = 5
-        db.save_job(job)
+        update_job(job, status="scripting", progress=5)
         await generate_script(job_id, request.topic, request.duration_seconds, request.resolution)
         
         # Pause for approval
-        job.status = "waiting_for_approval"
-        job.progress = 10
-        db.save_job(job)
+        # generate_script saved the scenes on its own copy; leave them untouched here
+        update_job(job, status="waiting_for_approval", progress=10)
         logger.info(f"[{job_id}] Script generated. Waiting for approval.")
         
     except Exception as e:
         logger.error(f"[{job_id}] Script generation failed: {e}")
-        job.status = "failed"
-        job.error = str(e)
-        db.save_job(job)
+        update_job(job, status="failed", error=str(e))
 
 @app.post("/create_movie")
 async def create_movie(
@@ -623,13 +622,46 @@ async def get_movie_status(job_id: str):
     return job
 
 @app.get("/my_jobs/{user_id}")
-async def get_my_jobs(user_id: str, token_uid: str = Depends(verify_token)):
-    """Fetches all jobs belonging to a specific user."""
+async def get_my_jobs(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    token_uid: str = Depends(verify_token)
+):
+    """Fetches jobs belonging to a specific user. Pass limit/cursor to page (next cursor in X-Next-Cursor)."""
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized access to another user's jobs.")
         
     logger.info(f"Fetching jobs for user: {user_id}")
-    return db.get_user_jobs(user_id)
+    if limit is None and cursor is None:
+        return db.get_user_jobs(user_id)
+    try:
+        jobs, next_cursor = db.get_user_jobs_page(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
+
+@app.get("/my_jobs/{user_id}/summary")
+async def get_my_job_summaries(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    token_uid: str = Depends(verify_token)
+):
+    """Lightweight job listing (id, topic, status, progress, thumbnail, created_at) for dashboards."""
+    if token_uid != user_id:
+        raise HTTPException(status_code=403, detail="Unauthorized access to another user's jobs.")
+    try:
+        summaries, next_cursor = db.get_user_job_summaries(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return summaries
 
 @app.post("/save_external_job")
 async def save_external_job(job: MovieJob):
@@ -1,17 +1,42 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
 import os
 import logging
+import threading
+import atexit
+from pydantic_core import to_jsonable_python
 from .models import MovieJob
+from pagination import UserJobIndex, firestore_page, clamp_limit
+from firestore_batch import FirestoreWriteBatcher
 
 logger = logging.getLogger("Database")
 
+# Fields needed by listing views; everything else (scenes, prompts) is left out
+SUMMARY_FIELDS = ["job_id", "type", "topic", "status", "progress", "final_video_path", "created_at"]
+
+def summarize_job(data: Dict) -> Dict:
+    """Projects a raw job document onto the listing summary without Pydantic validation."""
+    return {
+        "job_id": data.get("job_id"),
+        "type": data.get("type", "director_movie"),
+        "topic": data.get("topic"),
+        "status": data.get("status"),
+        "progress": data.get("progress", 0),
+        "thumbnail": data.get("final_video_path"),
+        "created_at": data.get("created_at"),
+    }
+
 class DatabaseProvider(ABC):
     @abstractmethod
     def save_job(self, job: MovieJob):
         pass
     
+    @abstractmethod
+    def update_job_fields(self, job_id: str, fields: Dict):
+        """Persists only the given top-level fields of a job (e.g. status, progress)."""
+        pass
+    
     @abstractmethod
     def get_job(self, job_id: str) -> Optional[MovieJob]:
         pass
@@ -24,33 +49,156 @@ class DatabaseProvider(ABC):
     def get_user_jobs(self, user_id: str) -> List[MovieJob]:
         pass
 
+    @abstractmethod
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[MovieJob], Optional[str]]:
+        """Returns one page of the user's jobs (newest first) and the cursor for the next page."""
+        pass
+
+    @abstractmethod
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        """Like get_user_jobs_page, but returns lightweight summary dicts (see summarize_job)."""
+        pass
+
 class JsonDatabase(DatabaseProvider):
-    def __init__(self, file_path: str = "jobs.json"):
+    """
+    Stores each job in its own JSON file under jobs_dir, written via temp file + atomic rename,
+    so a save costs only the size of the changed job. Progress-only updates are coalesced and
+    written after progress_debounce seconds from a copy taken at save time. The legacy single-file
+    store at file_path is migrated on load and renamed to .migrated once every job is written.
+    Other services share that jobs.json name (VideoGeneration writes a list), so only the
+    Director's dict format is migrated.
+    """
+    def __init__(self, file_path: str = "jobs.json", jobs_dir: str = None, progress_debounce: float = 2.0):
         self.file_path = file_path
+        self.jobs_dir = jobs_dir or os.path.join(os.path.dirname(file_path), "director_jobs.d")
+        self.progress_debounce = progress_debounce
         self.jobs: Dict[str, MovieJob] = {}
+        self.index = UserJobIndex(
+            get_key=lambda j: (j.created_at, j.job_id),
+            get_user=lambda j: j.user_id
+        )
+        self.persisted: Dict[str, Dict] = {}  # job_id -> last written document, minus progress
+        self.dirty: Dict[str, MovieJob] = {}  # job_id -> copy awaiting a debounced write
+        self.flush_timer: Optional[threading.Timer] = None
+        self.lock = threading.RLock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
         self.load_jobs()
+        atexit.register(self.flush)
 
     def load_jobs(self):
+        # 1. Legacy single-file store (migrated to per-job files below)
+        legacy_loaded = False
         if os.path.exists(self.file_path):
             try:
                 with open(self.file_path, "r") as f:
                     data = json.load(f)
+                if isinstance(data, dict):
                     self.jobs = {jid: MovieJob(**j_data) for jid, j_data in data.items()}
-                logger.info(f"Loaded {len(self.jobs)} jobs from {self.file_path}")
+                    legacy_loaded = True
+                    logger.info(f"Loaded {len(self.jobs)} jobs from legacy {self.file_path}")
+                else:
+                    logger.info(f"{self.file_path} is not a Director job store; leaving it in place")
             except Exception as e:
-                logger.error(f"Failed to load jobs: {e}")
+                self.jobs = {}
+                logger.error(f"Failed to load legacy jobs from {self.file_path}, leaving it in place: {e}")
 
-    def save_disk(self):
+        # 2. Per-job files take precedence over the legacy file
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), "r") as f:
+                    job = MovieJob(**json.load(f))
+                self.jobs[job.job_id] = job
+                self.persisted[job.job_id] = self._snapshot(job)
+            except Exception as e:
+                logger.error(f"Failed to load job file {name}: {e}")
+
+        migrated = True
+        for job_id, job in self.jobs.items():
+            if job_id not in self.persisted:
+                migrated = self._write_job(job) and migrated
+        if legacy_loaded:
+            if migrated:
+                os.replace(self.file_path, self.file_path + ".migrated")
+                logger.info(f"Migrated {self.file_path} to per-job files in {self.jobs_dir}")
+            else:
+                logger.error(f"Some jobs from {self.file_path} could not be written; keeping it for the next start")
+
+        self.index.rebuild(self.jobs.values())
+        logger.info(f"Loaded {len(self.jobs)} jobs from {self.jobs_dir}")
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _snapshot(self, job: MovieJob) -> Dict:
+        data = job.model_dump(mode="json")
+        data.pop("progress", None)
+        return data
+
+    def _write_job(self, job: MovieJob) -> bool:
         try:
-            data = {jid: job.dict() for jid, job in self.jobs.items()}
-            with open(self.file_path, "w") as f:
-                json.dump(data, f, default=str, indent=2)
+            path = self._job_path(job.job_id)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(job.model_dump(mode="json"), f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self.persisted[job.job_id] = self._snapshot(job)
+            return True
         except Exception as e:
-            logger.error(f"Failed to save jobs to disk: {e}")
+            logger.error(f"Failed to save job {job.job_id} to disk: {e}")
+            return False
+
+    def save_disk(self):
+        """Writes every job to disk (e.g. before shutdown)."""
+        with self.lock:
+            for job in self.jobs.values():
+                self._write_job(job)
+            self.dirty.clear()
+
+    def flush(self):
+        """Writes any debounced progress updates now."""
+        with self.lock:
+            if self.flush_timer:
+                self.flush_timer.cancel()
+                self.flush_timer = None
+            pending, self.dirty = self.dirty, {}
+            for job in pending.values():
+                self._write_job(job)
 
     def save_job(self, job: MovieJob):
-        self.jobs[job.job_id] = job
-        self.save_disk()
+        with self.lock:
+            previous = self.jobs.get(job.job_id)
+            if previous is not None:
+                self.index.remove(previous)
+            self.jobs[job.job_id] = job
+            self.index.add(job)
+
+            if self.progress_debounce > 0 and self.persisted.get(job.job_id) == self._snapshot(job):
+                # Only progress changed: coalesce with other updates in the debounce window.
+                # The timer thread writes this copy, since the caller keeps mutating the job.
+                self.dirty[job.job_id] = job.model_copy(deep=True)
+                if not self.flush_timer:
+                    self.flush_timer = threading.Timer(self.progress_debounce, self.flush)
+                    self.flush_timer.daemon = True
+                    self.flush_timer.start()
+                return
+
+            self.dirty.pop(job.job_id, None)
+            self._write_job(job)
+
+    def update_job_fields(self, job_id: str, fields: Dict):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                logger.warning(f"Cannot update missing job {job_id}")
+                return
+            for key, value in fields.items():
+                setattr(job, key, value)
+            # Progress-only updates are debounced by save_job
+            self.save_job(job)
     
     def get_job(self, job_id: str) -> Optional[MovieJob]:
         return self.jobs.get(job_id)
@@ -61,12 +209,21 @@ class JsonDatabase(DatabaseProvider):
     def get_user_jobs(self, user_id: str) -> List[MovieJob]:
         return [job for job in self.jobs.values() if job.user_id == user_id]
 
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[MovieJob], Optional[str]]:
+        return self.index.page(user_id, clamp_limit(limit), cursor)
+
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        jobs, next_cursor = self.index.page(user_id, clamp_limit(limit), cursor)
+        # Read attributes directly instead of dumping the nested scenes
+        return [summarize_job({f: getattr(job, f, None) for f in SUMMARY_FIELDS}) for job in jobs], next_cursor
+
 class FirestoreDatabase(DatabaseProvider):
-    def __init__(self, project_id: str, collection: str = "nexus_director_jobs"):
+    def __init__(self, project_id: str, collection: str = "nexus_director_jobs", batch_window: float = 0.5):
         try:
             from google.cloud import firestore
             self.db = firestore.Client(project=project_id)
             self.collection = self.db.collection(collection)
+            self.batcher = FirestoreWriteBatcher(self.db, window=batch_window)
             logger.info(f"Connected to Firestore Project: {project_id}, Collection: {collection}")
         except Exception as e:
             logger.error(f"Failed to connect to Firestore: {e}")
@@ -74,19 +231,29 @@ class FirestoreDatabase(DatabaseProvider):
 
     def save_job(self, job: MovieJob):
         try:
-            # Convert Pydantic model to dict (using jsonable_encoder style or .dict())
             doc_ref = self.collection.document(job.job_id)
-            doc_ref.set(json.loads(job.json())) # Utilizing .json() then loads ensures generic serialization
+            # The full document supersedes any batched field updates still queued for it
+            self.batcher.discard(doc_ref)
+            doc_ref.set(job.model_dump(mode="json"))
             logger.info(f"Saved job {job.job_id} to Firestore")
         except Exception as e:
             logger.error(f"Failed to save job to Firestore: {e}")
 
+    def update_job_fields(self, job_id: str, fields: Dict):
+        """Queues a Firestore update() of just these fields; rapid updates are merged into one WriteBatch."""
+        try:
+            doc_ref = self.collection.document(job_id)
+            self.batcher.update(doc_ref, to_jsonable_python(fields))
+        except Exception as e:
+            logger.error(f"Failed to update job {job_id} in Firestore: {e}")
+
     def get_job(self, job_id: str) -> Optional[MovieJob]:
         try:
             doc_ref = self.collection.document(job_id)
             doc = doc_ref.get()
             if doc.exists:
-                return MovieJob(**doc.to_dict())
+                # Overlay updates that are still waiting in the batcher
+                return MovieJob(**{**doc.to_dict(), **self.batcher.pending_fields(doc_ref)})
             return None
         except Exception as e:
             logger.error(f"Failed to get job from Firestore: {e}")
@@ -122,3 +289,19 @@ class FirestoreDatabase(DatabaseProvider):
         except Exception as e:
             logger.error(f"Failed to get user jobs from Firestore: {e}")
             return []
+
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[MovieJob], Optional[str]]:
+        query = self.collection.where("user_id", "==", user_id)
+        docs, next_cursor = firestore_page(query, "created_at", clamp_limit(limit), cursor)
+        jobs = []
+        for data in docs:
+            try:
+                jobs.append(MovieJob(**data))
+            except Exception as parse_err:
+                logger.warning(f"Skipping invalid job doc {data.get('job_id')}: {parse_err}")
+        return jobs, next_cursor
+
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict], Optional[str]]:
+        query = self.collection.where("user_id", "==", user_id)
+        docs, next_cursor = firestore_page(query, "created_at", clamp_limit(limit), cursor, fields=SUMMARY_FIELDS)
+        return [summarize_job(d) for d in docs], next_cursor
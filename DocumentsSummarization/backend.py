@@ -1,22 +1,24 @@
 import os
 import sys
 import logging
+import asyncio
 import base64
-import io
 import json
 import yaml
 import csv
+from contextlib import aclosing
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import google.generativeai as genai
 from dotenv import load_dotenv
 
 # Document Parsers
-from docx import Document
-from pptx import Presentation
-import openpyxl
-from bs4 import BeautifulSoup
+from .extractors import EXTRACTOR_VERSION, PYPDF_AVAILABLE, extract_text_from_docx, extract_text_from_pptx, extract_text_from_xlsx, extract_text_from_html, extract_pdf_segments
+from .extraction import ExtractionPool
+from .cache import TextCache, DEFAULT_CACHE_DIR
+from .mapreduce import MapReduceSummarizer, preflight_tokens
+from llm_usage import response_usage
 
 load_dotenv()
 
@@ -39,6 +41,25 @@ else:
 
 app = FastAPI(title="Universal Document Summarization Backend")
 
+# Parallel extraction for multi-file uploads
+extraction_pool = ExtractionPool(
+    max_workers=int(os.getenv("DOC_EXTRACT_WORKERS", "0")) or None,
+    timeout=float(os.getenv("DOC_EXTRACT_TIMEOUT", "60")),
+    inline_max_bytes=int(os.getenv("DOC_EXTRACT_INLINE_MAX_BYTES", str(256 * 1024)))
+)
+
+# Extracted text keyed by file content hash, reused when the same file is summarized again
+extraction_cache = TextCache(
+    cache_dir=os.path.join(os.getenv("DOC_CACHE_DIR", DEFAULT_CACHE_DIR), "extract"),
+    max_memory_chars=int(os.getenv("DOC_EXTRACT_CACHE_CHARS", str(64 * 1024 * 1024)))
+)
+
+# Inputs above this many tokens are summarized chunk by chunk (map-reduce) instead of in one call
+SINGLE_SHOT_MAX_TOKENS = int(os.getenv("DOC_SINGLE_SHOT_MAX_TOKENS", "200000"))
+CHUNK_TOKENS = int(os.getenv("DOC_CHUNK_TOKENS", "50000"))
+MAP_CONCURRENCY = int(os.getenv("DOC_MAP_CONCURRENCY", "4"))
+summary_cache = TextCache(cache_dir=os.path.join(os.getenv("DOC_CACHE_DIR", DEFAULT_CACHE_DIR), "partials"))
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -46,38 +67,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-def extract_text_from_docx(file_bytes):
-    doc = Document(io.BytesIO(file_bytes))
-    return "\n".join([para.text for para in doc.paragraphs])
-
-def extract_text_from_pptx(file_bytes):
-    prs = Presentation(io.BytesIO(file_bytes))
-    text = []
-    for slide in prs.slides:
-        for shape in slide.shapes:
-            if hasattr(shape, "text"):
-                text.append(shape.text)
-    return "\n".join(text)
-
-def extract_text_from_xlsx(file_bytes):
-    wb = openpyxl.load_workbook(io.BytesIO(file_bytes), data_only=True)
-    text = []
-    for sheet in wb.sheetnames:
-        ws = wb[sheet]
-        text.append(f"--- Sheet: {sheet} ---")
-        for row in ws.iter_rows(values_only=True):
-            row_text = [str(cell) for cell in row if cell is not None]
-            if row_text:
-                text.append(", ".join(row_text))
-    return "\n".join(text)
-
-def extract_text_from_html(file_bytes):
-    soup = BeautifulSoup(file_bytes, 'html.parser')
-    return soup.get_text(separator='\n')
-
-from typing import List
+def select_extractor(filename):
+    """Returns the parser for formats that need text extraction, or None."""
+    if filename.endswith(".docx"):
+        return extract_text_from_docx
+    if filename.endswith(".pptx"):
+        return extract_text_from_pptx
+    if filename.endswith(".xlsx"):
+        return extract_text_from_xlsx
+    if filename.endswith((".html", ".htm")):
+        return extract_text_from_html
+    if filename.endswith(".pdf") and PYPDF_AVAILABLE:
+        return extract_pdf_segments
+    return None
+
+# Gemini bills each native PDF page as an image of this many tokens, on top of its text
+PDF_PAGE_TOKENS = 258
+
+def dump_extraction(result):
+    """Serializes an extractor result (text, or PDF segments holding bytes) for the text cache."""
+    if isinstance(result, str):
+        return result
+    return json.dumps([
+        {**seg, "data": base64.b64encode(seg["data"]).decode("ascii")} if seg["kind"] == "pdf" else seg
+        for seg in result
+    ])
+
+def load_extraction(filename, cached):
+    if not filename.endswith(".pdf"):
+        return cached
+    return [
+        {**seg, "data": base64.b64decode(seg["data"])} if seg["kind"] == "pdf" else seg
+        for seg in json.loads(cached)
+    ]
+
+from typing import List, Optional
 
 import uuid
 from datetime import datetime
@@ -85,6 +112,8 @@ from datetime import datetime
 # Database Initialization
 from .database import JsonDatabase, FirestoreDatabase
 from auth import verify_token
+from langsmith_config import token_tracker
+from uploads import spool_upload
 from fastapi import Depends, HTTPException
 
 project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -111,6 +140,216 @@ else:
     db = JsonDatabase()
     job_history = db.get_user_jobs(None)
 
+TEXT_EXTENSIONS = (".txt", ".md", ".rtf", ".csv", ".json", ".xml", ".yaml", ".yml", ".log", ".py", ".js")
+
+class SummaryRun:
+    """Per-request state shared by /summarize and /summarize/stream; becomes the job record."""
+    def __init__(self, user_id: Optional[str], model: str):
+        self.job_id = str(uuid.uuid4())[:8]
+        self.user_id = user_id
+        self.model = model
+        self.start_time = datetime.now()
+        self.status = "Failed"
+        self.response = None
+        self.summarizer = None
+        self.cache_hits = 0
+        self.pdf_pages_text = 0
+        self.pdf_pages_native = 0
+        self.uploads = []  # (lowercased filename, SpooledUpload)
+
+    def total_tokens(self) -> int:
+        try:
+            if self.summarizer:
+                return self.summarizer.total_tokens
+            if hasattr(self.response, 'usage_metadata'):
+                return self.response.usage_metadata.total_token_count
+        except Exception:
+            pass
+        return 0
+
+async def spool_files(run: SummaryRun, files: List[UploadFile]):
+    for file in files:
+        filename = file.filename.lower()
+        upload = await spool_upload(file)
+        run.uploads.append((filename, upload))
+        logger.info(f"Processing file: {filename} ({upload.mime_type}, {upload.size} bytes)")
+
+async def iter_extractions(run: SummaryRun):
+    """
+    Parses all office/HTML/PDF files concurrently and yields (index, result, cached) as each
+    one finishes. Files seen before (same bytes, same extractor version) come from the cache.
+    Failed or timed-out files yield the exception as their result.
+    """
+    tasks = {}
+    cached_results = []
+    try:
+        for i, (filename, upload) in enumerate(run.uploads):
+            extractor = select_extractor(filename)
+            if not extractor:
+                continue
+            key = f"extract:{EXTRACTOR_VERSION}:{os.path.splitext(filename)[1]}:{upload.sha256}"
+            cached = extraction_cache.get(key)
+            if cached is not None:
+                run.cache_hits += 1
+                cached_results.append((i, load_extraction(filename, cached)))
+            else:
+                tasks[asyncio.ensure_future(extraction_pool.run(extractor, upload.path))] = (i, key)
+        if run.cache_hits:
+            logger.info(f"Extraction cache hits: {run.cache_hits}/{run.cache_hits + len(tasks)}")
+        for i, result in cached_results:
+            yield i, result, True
+
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i, key = tasks[task]
+                try:
+                    result = task.result()
+                except Exception as e:
+                    result = e
+                if isinstance(result, (str, list)):
+                    extraction_cache.put(key, dump_extraction(result))
+                yield i, result, False
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def build_content(run: SummaryRun, extracted: dict):
+    """Assembles the documents in upload order. Returns (combined_content, documents)."""
+    combined_content = []
+    documents = []  # (filename, text or native part) for map-reduce
+    for i, (filename, upload) in enumerate(run.uploads):
+        # Determine processing method
+        text_content = None
+
+        # 1. PDF: embedded text where the page has it, native Gemini PDF for scanned pages
+        if filename.endswith(".pdf"):
+            segments = extracted.get(i)
+            if isinstance(segments, Exception):
+                logger.warning(f"Local PDF extraction failed for {filename}, sending native PDF: {segments!r}")
+            if not isinstance(segments, list) or not segments:
+                segments = [{"kind": "pdf", "pages": None, "data": upload.read_bytes()}]
+            for segment in segments:
+                label = filename
+                if len(segments) > 1:
+                    label = f"{filename} (pages {segment['pages'][0]}-{segment['pages'][1]})"
+                page_count = segment["pages"][1] - segment["pages"][0] + 1 if segment["pages"] else 0
+                if segment["kind"] == "text":
+                    part = segment["text"]
+                    run.pdf_pages_text += page_count
+                else:
+                    part = {"mime_type": "application/pdf", "data": segment["data"]}
+                    run.pdf_pages_native += page_count
+                combined_content.append(f"\n\n--- Document: {label} ---\n")
+                combined_content.append(part)
+                documents.append((label, part))
+            continue
+
+        # 2. Text Extraction for Office Formats and HTML
+        elif i in extracted:
+            result = extracted[i]
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"Skipping {filename}: extraction timed out after {extraction_pool.timeout}s")
+                continue
+            if isinstance(result, Exception):
+                raise result
+            text_content = result
+
+        # 3. Direct Text Formats
+        elif filename.endswith(TEXT_EXTENSIONS):
+            # Try to decode as text
+            file_bytes = upload.read_bytes()
+            try:
+                text_content = file_bytes.decode('utf-8')
+            except UnicodeDecodeError:
+                 text_content = file_bytes.decode('latin-1')
+
+        else:
+            logger.warning(f"Skipping unsupported file: {filename}")
+            continue
+
+        if text_content:
+            combined_content.append(f"\n\n--- Document: {filename} ---\n")
+            combined_content.append(text_content)
+            documents.append((filename, text_content))
+
+    if run.pdf_pages_text:
+        logger.info(f"PDF pages sent as text: {run.pdf_pages_text}, as native PDF: {run.pdf_pages_native} (~{run.pdf_pages_text * PDF_PAGE_TOKENS} input tokens saved)")
+    return combined_content, documents
+
+def build_prompt(prompt: Optional[str], combined_content: list) -> list:
+    user_prompt = "Summarize the following documents."
+    if prompt:
+        user_prompt = f"{prompt}\n\nDocuments:"
+    # Construct the final prompt parts
+    return [user_prompt, *combined_content]
+
+async def start_map_reduce(run: SummaryRun, gen_model, prompt_parts: list) -> bool:
+    """Pre-flight: picks single-shot or map-reduce from the input size. Sets run.summarizer for map-reduce."""
+    input_size = await asyncio.to_thread(preflight_tokens, gen_model, prompt_parts, SINGLE_SHOT_MAX_TOKENS // 2)
+    if input_size <= SINGLE_SHOT_MAX_TOKENS:
+        return False
+    logger.info(f"Input is ~{input_size} tokens; using map-reduce")
+    run.summarizer = MapReduceSummarizer(gen_model, cache=summary_cache, model_name=run.model, max_chunk_tokens=CHUNK_TOKENS, concurrency=MAP_CONCURRENCY)
+    return True
+
+def log_token_usage(run: SummaryRun, input_tokens: int, output_tokens: int):
+    # Track token usage with LangSmith
+    if (input_tokens or output_tokens) and run.user_id:
+        try:
+            token_tracker.log_usage(
+                service="DocumentsSummarization",
+                operation="summarize_documents",
+                model=run.model,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                user_id=run.user_id,
+                job_id=run.job_id or str(uuid.uuid4())
+            )
+        except Exception as e:
+            logger.warning(f"Failed to log token usage: {e}")
+
+def finish_run(run: SummaryRun):
+    """Deletes the spooled uploads and records the job. Always called from a finally block."""
+    for _, upload in run.uploads:
+        upload.close()
+
+    # Calculate Metrics - approximate for now if using Firestore only, 
+    # or fetch recent from DB
+    # For simplicity, we'll skip complex RPM/RPD calc optimization 
+    # and just save the job.
+    
+    # TPM (Tokens Per Minute)
+    current_tokens = run.total_tokens()
+    summarizer = run.summarizer
+    
+    # Record Job
+    job_data = {
+        "job_id": run.job_id,
+        "user_id": run.user_id, 
+        "type": "Summarization",
+        "model": run.model,
+        "rpm": 1, # Placeholder
+        "tpm": current_tokens,
+        "rpd": 1, # Placeholder
+        "tokens": current_tokens,
+        "cache_hits": run.cache_hits + (summarizer.cache_hits if summarizer else 0),
+        "strategy": "map_reduce" if summarizer else "single_shot",
+        "pdf_pages_text": run.pdf_pages_text,
+        "pdf_pages_native": run.pdf_pages_native,
+        "pdf_tokens_saved": run.pdf_pages_text * PDF_PAGE_TOKENS,
+        "chunks": summarizer.chunks if summarizer else 1,
+        "status": run.status,
+        "time": run.start_time.strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    # Save Job
+    try:
+        db.save_job(job_data)
+    except Exception as e:
+         logger.error(f"Failed to save job history: {e}")
+
 @app.post("/summarize")
 async def summarize_document(
     files: List[UploadFile] = File(...), 
@@ -118,142 +357,158 @@ async def summarize_document(
     model: str = Form("gemini-2.5-flash"),
     user_id: str = Form(None)
 ):
-    job_id = str(uuid.uuid4())[:8]
-    start_time = datetime.now()
-    status = "Failed"
-    response = None
+    run = SummaryRun(user_id, model)
     
     try:
-        combined_content = []
-        
-        for file in files:
-            filename = file.filename.lower()
-            content_type = file.content_type
-            file_bytes = await file.read()
-            
-            logger.info(f"Processing file: {filename} ({content_type})")
-
-            # Determine processing method
-            text_content = None
-
-            # 1. Native Gemini Support (PDF)
-            if filename.endswith(".pdf"):
-                # For multiple PDFs, we'll convert them to parts
-                combined_content.append(f"\n\n--- Document: {filename} ---\n")
-                combined_content.append({
-                    "mime_type": "application/pdf",
-                    "data": file_bytes
-                })
-                continue
-
-            # 2. Text Extraction for Office Formats
-            elif filename.endswith(".docx"):
-                text_content = extract_text_from_docx(file_bytes)
-            elif filename.endswith(".pptx"):
-                text_content = extract_text_from_pptx(file_bytes)
-            elif filename.endswith(".xlsx"):
-                text_content = extract_text_from_xlsx(file_bytes)
-            
-            # 3. Direct Text Formats
-            elif filename.endswith((".txt", ".md", ".rtf", ".csv", ".json", ".xml", ".yaml", ".yml", ".log", ".py", ".js", ".html", ".htm")):
-                # Try to decode as text
-                try:
-                    text_content = file_bytes.decode('utf-8')
-                    if filename.endswith((".html", ".htm")):
-                         text_content = extract_text_from_html(file_bytes)
-                except UnicodeDecodeError:
-                     text_content = file_bytes.decode('latin-1')
-
-            else:
-                logger.warning(f"Skipping unsupported file: {filename}")
-                continue
-
-            if text_content:
-                combined_content.append(f"\n\n--- Document: {filename} ---\n")
-                combined_content.append(text_content)
+        await spool_files(run, files)
+        async with aclosing(iter_extractions(run)) as results:
+            extracted = {i: result async for i, result, _ in results}
+        combined_content, documents = build_content(run, extracted)
         
         if not combined_content:
-             status = "Failed"
              return JSONResponse({"detail": "No valid content could be extracted from the uploaded files."}, status_code=400)
 
         # Generate Summary
         logger.info(f"Summarizing with model: {model}")
         gen_model = genai.GenerativeModel(model)
-        
-        user_prompt = "Summarize the following documents."
-        if prompt:
-            user_prompt = f"{prompt}\n\nDocuments:"
+        prompt_parts = build_prompt(prompt, combined_content)
             
-        # Construct the final prompt parts
-        prompt_parts = [user_prompt]
-        prompt_parts.extend(combined_content)
-            
-        response = gen_model.generate_content(prompt_parts)
-        
-        # Track token usage with LangSmith
-        if response.usage_metadata and user_id:
-            try:
-                token_tracker.log_usage(
-                    service="DocumentsSummarization",
-                    operation="summarize_documents",
-                    model=model,
-                    input_tokens=response.usage_metadata.prompt_token_count,
-                    output_tokens=response.usage_metadata.candidates_token_count,
-                    user_id=user_id,
-                    job_id=job_id or str(uuid.uuid4())
-                )
-            except Exception as e:
-                logger.warning(f"Failed to log token usage: {e}")
+        if await start_map_reduce(run, gen_model, prompt_parts):
+            summary = await run.summarizer.summarize(documents, prompt)
+            input_tokens, output_tokens = run.summarizer.input_tokens, run.summarizer.output_tokens
+        else:
+            run.response = gen_model.generate_content(prompt_parts)
+            summary = run.response.text
+            input_tokens, output_tokens, _ = response_usage(run.response)
+        log_token_usage(run, input_tokens, output_tokens)
         
-        status = "Success"
-        return JSONResponse({"summary": response.text})
+        run.status = "Success"
+        return JSONResponse({"summary": summary})
+
+    except HTTPException as e:
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code)
 
     except Exception as e:
         logger.error(f"Error processing file: {e}", exc_info=True)
         print(f"ERROR: {e}", flush=True)
-        status = "Failed"
         return JSONResponse({"detail": str(e)}, status_code=500)
     
     finally:
-        # Calculate Metrics - approximate for now if using Firestore only, 
-        # or fetch recent from DB
-        # For simplicity, we'll skip complex RPM/RPD calc optimization 
-        # and just save the job.
-        
-        # TPM (Tokens Per Minute)
-        tpm = 0
-        current_tokens = 0
-        try:
-            if hasattr(response, 'usage_metadata'):
-                current_tokens = response.usage_metadata.total_token_count
-        except:
-            pass 
-        
-        # Record Job
-        job_data = {
-            "job_id": job_id,
-            "user_id": user_id, 
-            "type": "Summarization",
-            "model": model,
-            "rpm": 1, # Placeholder
-            "tpm": current_tokens,
-            "rpd": 1, # Placeholder
-            "tokens": current_tokens,
-            "status": status,
-            "time": start_time.strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # Save Job
+        finish_run(run)
+
+@app.post("/summarize/stream")
+async def summarize_document_stream(
+    files: List[UploadFile] = File(...), 
+    prompt: str = Form(None), 
+    model: str = Form("gemini-2.5-flash"),
+    user_id: str = Form(None),
+    format: str = Form("ndjson")
+):
+    """
+    Streaming variant of /summarize. Sends a "file" frame per upload as its extraction
+    finishes, "token" frames while the summary is generated, then a final "usage" frame
+    (or an "error" frame). Frames are NDJSON lines, or Server-Sent Events with format=sse.
+    """
+    run = SummaryRun(user_id, model)
+    try:
+        # Spool before responding: the request's upload files are closed once streaming starts
+        await spool_files(run, files)
+    except HTTPException as e:
+        finish_run(run)
+        return JSONResponse({"detail": e.detail}, status_code=e.status_code)
+    sse = format == "sse"
+
+    def frame(event: str, **data) -> str:
+        payload = json.dumps({"event": event, **data})
+        return f"event: {event}\ndata: {payload}\n\n" if sse else f"{payload}\n"
+
+    async def events():
         try:
-            db.save_job(job_data)
+            for i, (filename, _) in enumerate(run.uploads):
+                if not select_extractor(filename):
+                    ready = filename.endswith((".pdf", *TEXT_EXTENSIONS))
+                    yield frame("file", index=i, filename=filename, status="ready" if ready else "skipped")
+            extracted = {}
+            async with aclosing(iter_extractions(run)) as results:
+                async for i, result, cached in results:
+                    extracted[i] = result
+                    if cached:
+                        state = "cached"
+                    elif isinstance(result, asyncio.TimeoutError):
+                        state = "timeout"
+                    elif isinstance(result, Exception):
+                        state = "failed"
+                    else:
+                        state = "extracted"
+                    yield frame("file", index=i, filename=run.uploads[i][0], status=state)
+            combined_content, documents = build_content(run, extracted)
+            if not combined_content:
+                yield frame("error", detail="No valid content could be extracted from the uploaded files.")
+                return
+
+            gen_model = genai.GenerativeModel(model)
+            prompt_parts = build_prompt(prompt, combined_content)
+            if await start_map_reduce(run, gen_model, prompt_parts):
+                # Partial summaries are not user-facing; only the final text is sent
+                yield frame("strategy", strategy="map_reduce")
+                summary = await run.summarizer.summarize(documents, prompt)
+                yield frame("token", text=summary)
+                input_tokens, output_tokens = run.summarizer.input_tokens, run.summarizer.output_tokens
+            else:
+                yield frame("strategy", strategy="single_shot")
+                run.response = await asyncio.to_thread(gen_model.generate_content, prompt_parts, stream=True)
+                chunks = iter(run.response)
+                while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue  # Chunk without text parts (e.g. finish/safety metadata only)
+                    if text:
+                        yield frame("token", text=text)
+                input_tokens, output_tokens, _ = response_usage(run.response)
+            log_token_usage(run, input_tokens, output_tokens)
+
+            run.status = "Success"
+            yield frame(
+                "usage",
+                job_id=run.job_id,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                total_tokens=run.total_tokens(),
+                cache_hits=run.cache_hits + (run.summarizer.cache_hits if run.summarizer else 0),
+                pdf_tokens_saved=run.pdf_pages_text * PDF_PAGE_TOKENS
+            )
         except Exception as e:
-             logger.error(f"Failed to save job history: {e}")
+            logger.error(f"Error streaming summary: {e}", exc_info=True)
+            yield frame("error", detail=str(e))
+        finally:
+            finish_run(run)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # Stop nginx from buffering frames
+    )
 
 @app.get("/analytics")
-def get_analytics(user_id: str, token_uid: str = Depends(verify_token)):
+def get_analytics(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    token_uid: str = Depends(verify_token)
+):
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="User ID mismatch.")
-    return db.get_user_jobs(user_id)
+    if limit is None and cursor is None:
+        return db.get_user_jobs(user_id)
+    try:
+        jobs, next_cursor = db.get_user_jobs_page(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
 
 @app.get("/health")
 def health_check_explicit():
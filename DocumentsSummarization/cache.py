@@ -0,0 +1,100 @@
+"""
+Two-tier (memory LRU + disk) cache for text derived from uploaded documents.
+Keys are content hashes, so re-uploading the same file with a different prompt or
+model reuses the earlier result instead of parsing the file again.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "doc_summary_cache")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class TextCache:
+    def __init__(self, cache_dir: Optional[str] = None, max_memory_chars: int = 64 * 1024 * 1024, max_disk_items: int = 1000):
+        self.cache_dir = cache_dir
+        self.max_memory_chars = max_memory_chars
+        self.max_disk_items = max_disk_items
+        self.memory: "OrderedDict[str, str]" = OrderedDict()
+        self.memory_chars = 0
+        self.puts = 0
+        self.lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        # Keys may contain ':' separators; hash them into a safe filename
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".txt")
+
+    def _remember(self, key: str, value: str):
+        with self.lock:
+            old = self.memory.pop(key, None)
+            if old is not None:
+                self.memory_chars -= len(old)
+            if len(value) > self.max_memory_chars:
+                return  # Too large for memory; disk tier only
+            self.memory[key] = value
+            self.memory_chars += len(value)
+            while self.memory_chars > self.max_memory_chars:
+                _, evicted = self.memory.popitem(last=False)
+                self.memory_chars -= len(evicted)
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                value = f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Failed to read cache entry: {e}")
+            return None
+        self._remember(key, value)
+        return value
+
+    def put(self, key: str, value: str):
+        self._remember(key, value)
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(value)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry: {e}")
+            return
+        with self.lock:
+            self.puts += 1
+            prune = self.puts % 100 == 0
+        if prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Drops the least recently written files once the disk tier exceeds max_disk_items."""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".txt")]
+            if len(entries) <= self.max_disk_items:
+                return
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_disk_items]:
+                os.remove(entry.path)
+        except Exception as e:
+            logger.warning(f"Failed to prune cache directory: {e}")
@@ -2,9 +2,11 @@ from abc import ABC, abstractmethod
 import json
 import os
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from pagination import UserJobIndex, firestore_page, clamp_limit
+
 logger = logging.getLogger("Database")
 
 class DatabaseProvider(ABC):
@@ -16,10 +18,21 @@ class DatabaseProvider(ABC):
     def get_user_jobs(self, user_id: str) -> List[Dict[str, Any]]:
         pass
 
+    @abstractmethod
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Returns one page of the user's jobs (newest first) and the cursor for the next page."""
+        pass
+
 class JsonDatabase(DatabaseProvider):
     def __init__(self, db_file="analytics.json"):
         self.db_file = db_file
-        self.jobs = self._load_db()
+        self.index = UserJobIndex(
+            get_key=lambda j: (j.get('time', ''), str(j.get('job_id', ''))),
+            get_user=lambda j: j.get('user_id')
+        )
+        self.index_mtime = None
+        self.jobs = []
+        self._refresh()
 
     def _load_db(self):
         if not os.path.exists(self.db_file):
@@ -34,18 +47,32 @@ class JsonDatabase(DatabaseProvider):
         with open(self.db_file, 'w') as f:
             json.dump(self.jobs, f, indent=2)
 
+    def _refresh(self):
+        # Other processes may write the file; reload and re-index only when it changed
+        mtime = os.path.getmtime(self.db_file) if os.path.exists(self.db_file) else None
+        if mtime != self.index_mtime:
+            self.jobs = self._load_db()
+            self.index.rebuild(self.jobs)
+            self.index_mtime = mtime
+
     def save_job(self, job: Dict[str, Any]):
         # Insert at beginning to keep latest first
-        self.jobs = self._load_db() # Reload to get latest data
+        self._refresh() # Reload to get latest data
         self.jobs.insert(0, job)
+        self.index.add(job)
         self._save_db()
+        self.index_mtime = os.path.getmtime(self.db_file)
 
     def get_user_jobs(self, user_id: str) -> List[Dict[str, Any]]:
-        self.jobs = self._load_db() # Reload to ensure freshness
+        self._refresh() # Reload to ensure freshness
         if not user_id:
             return self.jobs
         return [job for job in self.jobs if job.get('user_id') == user_id]
 
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        self._refresh()
+        return self.index.page(user_id, clamp_limit(limit), cursor)
+
 class FirestoreDatabase(DatabaseProvider):
     def __init__(self, project_id: str, collection_name: str = "doc_sum_analytics"):
         from google.cloud import firestore
@@ -82,3 +109,7 @@ class FirestoreDatabase(DatabaseProvider):
         except Exception as e:
             logger.error(f"Failed to fetch jobs from Firestore: {e}")
             return []
+
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = self.db.collection(self.collection).where("user_id", "==", user_id)
+        return firestore_page(query, "time", clamp_limit(limit), cursor)
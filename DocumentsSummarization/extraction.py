@@ -0,0 +1,112 @@
+"""
+Parallel text extraction for multi-file summarization requests.
+CPU-bound parsers (docx/pptx/xlsx/html) run in a bounded process pool so several
+uploads are parsed at once without blocking the event loop. Small files are parsed
+in a thread instead, where the cost of shipping bytes to a worker process outweighs the gain.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 60.0
+DEFAULT_INLINE_MAX_BYTES = 256 * 1024
+
+Source = Union[bytes, str]  # Raw bytes or a path to the file
+
+
+class ExtractionPool:
+    def __init__(self, max_workers: Optional[int] = None, timeout: float = DEFAULT_TIMEOUT, inline_max_bytes: int = DEFAULT_INLINE_MAX_BYTES):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.timeout = timeout
+        self.inline_max_bytes = inline_max_bytes
+        self.executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.recycled = weakref.WeakSet()  # pools whose workers _recycle terminated
+        self.slots = weakref.WeakKeyDictionary()  # event loop -> semaphore capping in-flight pool tasks
+        self.lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                # spawn: forking a multi-threaded server process is unsafe
+                self.executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+                logger.info(f"Started extraction pool with {self.max_workers} worker(s)")
+            return self.executor
+
+    def _slots(self) -> asyncio.Semaphore:
+        """One semaphore per event loop, so tasks only reach the pool when a worker is free."""
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            slots = self.slots.get(loop)
+            if slots is None:
+                slots = self.slots[loop] = asyncio.Semaphore(self.max_workers)
+            return slots
+
+    def _recycle(self, executor):
+        """
+        Replaces a pool whose workers are stuck or dead and terminates its worker processes, since
+        shutdown() alone leaves a hung parser running. Other tasks on that pool then fail with
+        BrokenProcessPool and run() retries them once on the new pool.
+        """
+        with self.lock:
+            if self.executor is executor:
+                self.executor = None
+            if executor is None or executor in self.recycled:
+                return
+            self.recycled.add(executor)
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        executor.shutdown(wait=False)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    async def run(self, func: Callable[[Source], str], source: Source, retry: bool = True) -> str:
+        """
+        Runs one extractor on raw bytes or a file path. Passing a path keeps large uploads out of
+        the pickled task. Raises asyncio.TimeoutError if it takes longer than the per-file timeout.
+        The timeout starts once a worker is free, so files queued behind others are not penalized.
+        """
+        size = os.path.getsize(source) if isinstance(source, str) else len(source)
+        if size <= self.inline_max_bytes:
+            return await asyncio.wait_for(asyncio.to_thread(func, source), self.timeout)
+
+        loop = asyncio.get_running_loop()
+        async with self._slots():
+            executor = self._get_executor()
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(executor, func, source), self.timeout)
+            except asyncio.TimeoutError:
+                # The worker is still busy with the file; don't let it hold a slot for later requests
+                self._recycle(executor)
+                raise
+            except concurrent.futures.process.BrokenProcessPool:
+                if not (retry and executor in self.recycled):
+                    self._recycle(executor)
+                    raise
+        # Terminated because another file timed out, not because of this one
+        return await self.run(func, source, retry=False)
+
+    async def map(self, tasks: Sequence[Tuple[Callable[[Source], str], Source]]) -> List[object]:
+        """
+        Runs all extractors concurrently and returns their results in input order.
+        Failed or timed-out files yield the exception in their slot instead of failing the batch.
+        """
+        return await asyncio.gather(*(self.run(func, data) for func, data in tasks), return_exceptions=True)
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,164 @@
+"""
+Text extractors for the office and markup formats.
+Kept free of service state (no Gemini/DB setup) so extraction worker processes can import it cheaply.
+"""
+
+import io
+import math
+import os
+
+from docx import Document
+from pptx import Presentation
+import openpyxl
+from bs4 import BeautifulSoup
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+# Bump whenever an extractor's output changes so cached extractions are not reused
+EXTRACTOR_VERSION = "4"
+
+# Spreadsheet extraction budget
+XLSX_MAX_ROWS_PER_SHEET = int(os.getenv("XLSX_MAX_ROWS_PER_SHEET", "20000"))
+XLSX_MAX_CELLS = int(os.getenv("XLSX_MAX_CELLS", "1000000"))
+XLSX_MAX_TOKENS = int(os.getenv("XLSX_MAX_TOKENS", "500000"))
+XLSX_HEAD_ROWS = 20  # Always kept when sampling, they usually hold the column headers
+
+# Pages with less embedded text than this are treated as scanned/image pages and sent as native PDF
+PDF_MIN_PAGE_CHARS = int(os.getenv("PDF_MIN_PAGE_CHARS", "200"))
+# Pages whose embedded images add up to this many pixels are sent as native PDF even when they
+# carry text (figures, charts, photos with captions); small logos and icons stay below it
+PDF_MIN_IMAGE_PIXELS = int(os.getenv("PDF_MIN_IMAGE_PIXELS", "250000"))
+
+
+def _open_source(source):
+    """Extractors accept raw bytes or the path of a spooled upload."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return open(source, "rb")
+
+
+def extract_text_from_docx(source):
+    with _open_source(source) as f:
+        doc = Document(f)
+    return "\n".join([para.text for para in doc.paragraphs])
+
+def extract_text_from_pptx(source):
+    with _open_source(source) as f:
+        prs = Presentation(f)
+    text = []
+    for slide in prs.slides:
+        for shape in slide.shapes:
+            if hasattr(shape, "text"):
+                text.append(shape.text)
+    return "\n".join(text)
+
+def extract_text_from_xlsx(source, max_rows_per_sheet=None, max_cells=None, max_tokens=None):
+    """
+    Streams the workbook in read-only mode, so rows are parsed lazily instead of loading
+    the whole workbook model. Output stops at the row/cell/token budget; sheets whose
+    declared size exceeds the row budget are sampled at a fixed stride after the header rows.
+    """
+    max_rows_per_sheet = max_rows_per_sheet or XLSX_MAX_ROWS_PER_SHEET
+    max_cells = max_cells or XLSX_MAX_CELLS
+    max_chars = (max_tokens or XLSX_MAX_TOKENS) * 4
+    f = _open_source(source)
+    wb = openpyxl.load_workbook(f, read_only=True, data_only=True)
+    text = []
+    cells = chars = 0
+    try:
+        for ws in wb.worksheets:
+            text.append(f"--- Sheet: {ws.title} ---")
+            total_rows = ws.max_row  # From the sheet's dimension record; None if the writer omitted it
+            stride = 1
+            if total_rows and total_rows > max_rows_per_sheet > XLSX_HEAD_ROWS:
+                stride = math.ceil((total_rows - XLSX_HEAD_ROWS) / (max_rows_per_sheet - XLSX_HEAD_ROWS))
+                text.append(f"[Sampled: header rows, then every {stride}th of {total_rows} rows]")
+            kept = 0
+            for n, row in enumerate(ws.iter_rows(values_only=True)):
+                if n >= XLSX_HEAD_ROWS and (n - XLSX_HEAD_ROWS) % stride:
+                    continue
+                if kept >= max_rows_per_sheet:
+                    text.append("[Remaining rows omitted]")
+                    break
+                row_text = [str(cell) for cell in row if cell is not None]
+                if not row_text:
+                    continue
+                line = ", ".join(row_text)
+                cells += len(row_text)
+                chars += len(line) + 1
+                if cells > max_cells or chars > max_chars:
+                    text.append("[Truncated: workbook exceeds the extraction budget]")
+                    return "\n".join(text)
+                text.append(line)
+                kept += 1
+    finally:
+        wb.close()
+        f.close()
+    return "\n".join(text)
+
+def extract_text_from_html(source):
+    with _open_source(source) as f:
+        soup = BeautifulSoup(f, 'html.parser')
+    return soup.get_text(separator='\n')
+
+def _image_pixels(resources, depth=0):
+    """Sums the pixel size of the image XObjects in a resource dictionary, following nested forms."""
+    if resources is None or depth > 3:
+        return 0
+    xobjects = resources.get_object().get("/XObject")
+    if xobjects is None:
+        return 0
+    pixels = 0
+    for ref in xobjects.get_object().values():
+        xobject = ref.get_object()
+        subtype = xobject.get("/Subtype")
+        if subtype == "/Image":
+            pixels += int(xobject.get("/Width", 0)) * int(xobject.get("/Height", 0))
+        elif subtype == "/Form":
+            pixels += _image_pixels(xobject.get("/Resources"), depth + 1)
+    return pixels
+
+def extract_pdf_segments(source, min_page_chars=None, min_image_pixels=None):
+    """
+    Splits a PDF into ordered segments, deciding per page: pages with an embedded text layer
+    become text, runs of scanned or image-heavy pages (little text, or large embedded images
+    read from the page's /XObject resources) are re-packed into smaller native PDFs.
+    Returns [{"kind": "text"|"pdf", "pages": [first, last], "text"|"data": ...}] with 1-based pages,
+    or [] when no page has usable text (the original file should be sent as is).
+    """
+    min_page_chars = min_page_chars or PDF_MIN_PAGE_CHARS
+    min_image_pixels = min_image_pixels or PDF_MIN_IMAGE_PIXELS
+    with _open_source(source) as f:
+        reader = PdfReader(f)
+        kinds = []
+        texts = []
+        for page in reader.pages:
+            text = (page.extract_text() or "").strip()
+            texts.append(text)
+            image_heavy = _image_pixels(page.get("/Resources")) >= min_image_pixels
+            kinds.append("text" if len(text) >= min_page_chars and not image_heavy else "pdf")
+        if "text" not in kinds:
+            return []
+
+        segments = []
+        start = 0
+        for i in range(1, len(kinds) + 1):
+            if i < len(kinds) and kinds[i] == kinds[start]:
+                continue
+            pages = [start + 1, i]
+            if kinds[start] == "text":
+                body = "\n\n".join(f"[Page {n + 1}]\n{texts[n]}" for n in range(start, i))
+                segments.append({"kind": "text", "pages": pages, "text": body})
+            else:
+                writer = PdfWriter()
+                for n in range(start, i):
+                    writer.add_page(reader.pages[n])
+                buf = io.BytesIO()
+                writer.write(buf)
+                segments.append({"kind": "pdf", "pages": pages, "data": buf.getvalue()})
+            start = i
+        return segments
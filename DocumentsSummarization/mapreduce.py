@@ -0,0 +1,144 @@
+"""
+Hierarchical map-reduce summarization for inputs that do not fit in one request.
+Text is split into token-bounded chunks on section/sheet boundaries, each chunk (and each
+native PDF part) is summarized concurrently, and the partial summaries are reduced until
+a single summary remains. Partial summaries are cached by content hash.
+"""
+
+import asyncio
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from llm_usage import CHARS_PER_TOKEN, estimate_tokens, response_usage
+from .cache import TextCache, content_hash
+
+logger = logging.getLogger(__name__)
+
+# Section boundaries: spreadsheet sheet markers, markdown headings, or blank lines
+SECTION_BOUNDARY = re.compile(r"\n(?=--- Sheet: )|\n(?=#{1,6} )|\n\s*\n")
+
+MAP_PROMPT = (
+    "Summarize the following part of the document '{name}' (part {index} of {total}). "
+    "Keep key facts, figures, names and conclusions."
+)
+REDUCE_PROMPT = "Combine the following partial summaries into one coherent summary without repeating points."
+
+
+def preflight_tokens(gen_model, parts: List[Any], skip_below: int = 0) -> int:
+    """
+    Counts the input tokens of a request before sending it. Small text-only inputs are
+    estimated locally to save the round trip; native parts (PDFs) always need the model's count.
+    """
+    estimate = sum(estimate_tokens(p) for p in parts if isinstance(p, str))
+    if estimate < skip_below and all(isinstance(p, str) for p in parts):
+        return estimate
+    try:
+        return int(gen_model.count_tokens(parts).total_tokens)
+    except Exception as e:
+        logger.warning(f"Token pre-flight failed, using estimate: {e}")
+        return estimate
+
+
+def split_sections(text: str) -> List[str]:
+    return [s for s in SECTION_BOUNDARY.split(text) if s.strip()]
+
+
+def _hard_split(text: str, max_chars: int) -> List[str]:
+    """Splits an oversized section by lines, and by characters for single overlong lines."""
+    pieces, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int) -> List[str]:
+    """Packs whole sections into chunks of at most max_tokens (estimated)."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks, current = [], []
+    current_len = 0
+    for section in split_sections(text):
+        for piece in (_hard_split(section, max_chars) if len(section) > max_chars else [section]):
+            if current and current_len + len(piece) + 2 > max_chars:
+                chunks.append("\n\n".join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class MapReduceSummarizer:
+    def __init__(self, gen_model, cache: Optional[TextCache] = None, model_name: str = "", max_chunk_tokens: int = 50000, concurrency: int = 4):
+        self.gen_model = gen_model
+        self.cache = cache
+        self.model_name = model_name
+        self.max_chunk_tokens = max_chunk_tokens
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.calls = 0
+        self.cache_hits = 0
+        self.chunks = 0
+
+    async def _generate(self, parts: List[Any]) -> str:
+        async with self.semaphore:
+            response = await asyncio.to_thread(self.gen_model.generate_content, parts)
+        input_tokens, output_tokens, total_tokens = response_usage(response)
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.total_tokens += total_tokens
+        self.calls += 1
+        return response.text
+
+    async def _map(self, name: str, index: int, total: int, content: Union[str, Dict[str, Any]], focus: str) -> str:
+        instruction = MAP_PROMPT.format(name=name, index=index, total=total) + focus
+        payload = content["data"] if isinstance(content, dict) else content.encode("utf-8")
+        key = f"map:{self.model_name}:{content_hash(instruction.encode('utf-8') + payload)}"
+        if self.cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+        summary = await self._generate([instruction, content])
+        if self.cache:
+            self.cache.put(key, summary)
+        return summary
+
+    async def summarize(self, documents: List[Tuple[str, Union[str, Dict[str, Any]]]], prompt: Optional[str] = None) -> str:
+        """documents: (name, text or native part) in upload order."""
+        focus = f" Focus on what is relevant to: {prompt}" if prompt else ""
+        units = []
+        for name, content in documents:
+            pieces = chunk_text(content, self.max_chunk_tokens) if isinstance(content, str) else [content]
+            units.extend((name, i + 1, len(pieces), piece) for i, piece in enumerate(pieces))
+        self.chunks = len(units)
+        logger.info(f"Map-reduce summarization over {len(units)} chunk(s)")
+
+        partials = await asyncio.gather(*(self._map(name, i, n, piece, focus) for name, i, n, piece in units))
+        partials = [f"--- {name} (part {i} of {n}) ---\n{p}" for (name, i, n, _), p in zip(units, partials)]
+
+        # Reduce in rounds until the partial summaries fit in one request
+        while len(partials) > 1 and estimate_tokens("\n\n".join(partials)) > self.max_chunk_tokens:
+            groups = chunk_text("\n\n".join(partials), self.max_chunk_tokens)
+            if len(groups) >= len(partials):
+                break  # Individual partials are already as large as a chunk; reduce them in one go
+            partials = await asyncio.gather(*(self._generate([REDUCE_PROMPT, group]) for group in groups))
+
+        final_prompt = REDUCE_PROMPT
+        if prompt:
+            final_prompt = f"{prompt}\n\n{REDUCE_PROMPT}"
+        return await self._generate([final_prompt, "\n\n".join(partials)])
@@ -1,4 +1,3 @@
-import base64
 import os
 import time
 import requests
@@ -16,6 +15,8 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from auth import verify_token
+from langsmith_config import token_tracker
+from uploads import spool_file
 
 from dotenv import load_dotenv
 load_dotenv() # Load from .env in CWD
@@ -51,7 +52,7 @@ print("DEBUG: ImageGeneration backend module loaded", flush=True)
 # === Database & Models ===
 # Imports from local modules
 from .database import ImageJob, JsonDatabase, FirestoreDatabase
-from .storage import LocalStorage, GoogleCloudStorage
+from .storage import LocalStorage, GoogleCloudStorage, WriteBehindGoogleCloudStorage
 
 # Database Selection Logic
 project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -68,7 +69,16 @@ if is_cloud_run and project_id:
     # Cloud Storage Initialization
     bucket_name = os.getenv("GCS_BUCKET_NAME", "nexus-ai-media")
     try:
-        storage = GoogleCloudStorage(bucket_name)
+        # Write-behind uploads keep GCS latency out of the request path.
+        # Requires CPU to stay allocated after the response (Cloud Run "CPU always allocated").
+        if os.getenv("GCS_WRITE_BEHIND", "true").lower() == "true":
+            storage = WriteBehindGoogleCloudStorage(
+                bucket_name,
+                max_pending=int(os.getenv("GCS_UPLOAD_QUEUE_SIZE", "64")),
+                workers=int(os.getenv("GCS_UPLOAD_WORKERS", "2"))
+            )
+        else:
+            storage = GoogleCloudStorage(bucket_name)
     except Exception as e:
         logger.error(f"Failed to initialize GCS: {e}. Falling back to LocalStorage.")
         storage = LocalStorage()
@@ -86,9 +96,10 @@ def get_api_key(api_key_input: str = None):
     return key
 
 def b64encode_file(file: UploadFile):
-    data = file.file.read()
-    mime = file.content_type or "image/png"
-    return base64.b64encode(data).decode('utf-8'), mime
+    # Spool and encode in chunks rather than holding the raw upload and its base64 copy at once
+    with spool_file(file.file, file.filename, file.content_type) as upload:
+        mime = upload.mime_type if upload.mime_type.startswith("image/") else (file.content_type or "image/png")
+        return upload.b64encode(), mime
 
 def call_nano_banana(api_key: str, prompt: str, images: List[dict] = None, model: str = "gemini-2.5-flash-image", grounding: bool = False, aspect_ratio: str = None, retries: int = 3, backoff: float = 1.5, user_id: str = None, job_id: str = None):
     # Construct URL based on model
@@ -188,6 +199,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Serve generated images statically
@@ -207,10 +219,43 @@ def health_check_explicit():
     return {"status": "healthy"}
 
 @router.get("/my_images/{user_id}")
-def get_my_images(user_id: str, token_uid: str = Depends(verify_token)):
+def get_my_images(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    token_uid: str = Depends(verify_token)
+):
+    if token_uid != user_id:
+        raise HTTPException(status_code=403, detail="Unauthorized access to another user's images.")
+    if limit is None and cursor is None:
+        return db.get_user_jobs(user_id)
+    # Paginated: the cursor for the next page is returned in the X-Next-Cursor header
+    try:
+        jobs, next_cursor = db.get_user_jobs_page(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
+
+@router.get("/my_images/{user_id}/summary")
+def get_my_image_summaries(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    token_uid: str = Depends(verify_token)
+):
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized access to another user's images.")
-    return db.get_user_jobs(user_id)
+    try:
+        summaries, next_cursor = db.get_user_job_summaries(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return summaries
 
 @router.post("/generate")
 def generate_image(
@@ -603,6 +648,12 @@ def serve_gcs_image(filename: str):
     if not isinstance(storage, GoogleCloudStorage):
         raise HTTPException(status_code=400, detail="GCS storage not configured")
 
+    # Read-through: serve images whose background upload has not finished yet
+    if isinstance(storage, WriteBehindGoogleCloudStorage):
+        pending = storage.get_pending_image(filename)
+        if pending is not None:
+            return Response(content=pending, media_type="image/png")
+
     try:
         blob = storage.bucket.blob(f"images/{filename}")
         if not blob.exists():
@@ -2,12 +2,28 @@ from abc import ABC, abstractmethod
 import json
 import os
 import logging
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from pydantic import BaseModel
+from pagination import UserJobIndex, firestore_page, clamp_limit
 
 logger = logging.getLogger("Database")
 
+# Fields needed by listing views
+SUMMARY_FIELDS = ["job_id", "type", "prompt", "status", "image_path", "timestamp"]
+
+def summarize_job(data: dict) -> dict:
+    """Projects a raw job document onto the listing summary without Pydantic validation."""
+    return {
+        "job_id": data.get("job_id"),
+        "type": data.get("type"),
+        "topic": data.get("prompt"),
+        "status": data.get("status", "completed"),
+        "progress": 100,
+        "thumbnail": data.get("image_path"),
+        "created_at": data.get("timestamp"),
+    }
+
 class ImageJob(BaseModel):
     job_id: str
     user_id: str
@@ -30,10 +46,25 @@ class DatabaseProvider(ABC):
     def get_user_jobs(self, user_id: str) -> List[dict]:
         pass
 
+    @abstractmethod
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[dict], Optional[str]]:
+        """Returns one page of the user's jobs (newest first) and the cursor for the next page."""
+        pass
+
+    @abstractmethod
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[dict], Optional[str]]:
+        """Like get_user_jobs_page, but returns lightweight summary dicts (see summarize_job)."""
+        pass
+
 class JsonDatabase(DatabaseProvider):
     def __init__(self, db_file="images.json"):
         self.db_file = db_file
         self.jobs = self._load_db()
+        self.index = UserJobIndex(
+            get_key=lambda j: (j.get('timestamp', ''), j.get('job_id', '')),
+            get_user=lambda j: j.get('user_id')
+        )
+        self.index.rebuild(self.jobs)
 
     def _load_db(self):
         if not os.path.exists(self.db_file):
@@ -49,12 +80,21 @@ class JsonDatabase(DatabaseProvider):
             json.dump(self.jobs, f, indent=2)
 
     def save_job(self, job: ImageJob):
-        self.jobs.append(job.dict())
+        job_dict = job.dict()
+        self.jobs.append(job_dict)
+        self.index.add(job_dict)
         self._save_db()
 
     def get_user_jobs(self, user_id: str) -> List[dict]:
         return [job for job in self.jobs if job.get('user_id') == user_id]
 
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[dict], Optional[str]]:
+        return self.index.page(user_id, clamp_limit(limit), cursor)
+
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[dict], Optional[str]]:
+        jobs, next_cursor = self.index.page(user_id, clamp_limit(limit), cursor)
+        return [summarize_job(j) for j in jobs], next_cursor
+
 class FirestoreDatabase(DatabaseProvider):
     def __init__(self, project_id: str, collection_name: str = "image_jobs"):
         from google.cloud import firestore
@@ -87,3 +127,12 @@ class FirestoreDatabase(DatabaseProvider):
         except Exception as e:
             logger.error(f"Failed to fetch jobs from Firestore: {e}")
             return []
+
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[dict], Optional[str]]:
+        query = self.db.collection(self.collection).where("user_id", "==", user_id)
+        return firestore_page(query, "timestamp", clamp_limit(limit), cursor)
+
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[dict], Optional[str]]:
+        query = self.db.collection(self.collection).where("user_id", "==", user_id)
+        docs, next_cursor = firestore_page(query, "timestamp", clamp_limit(limit), cursor, fields=SUMMARY_FIELDS)
+        return [summarize_job(d) for d in docs], next_cursor
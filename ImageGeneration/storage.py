@@ -2,6 +2,8 @@ from abc import ABC, abstractmethod
 import os
 import logging
 import base64
+from typing import Optional
+from gcs_uploader import BackgroundUploader
 
 logger = logging.getLogger("Storage")
 
@@ -50,3 +52,25 @@ class GoogleCloudStorage(StorageProvider):
         except Exception as e:
             logger.error(f"Failed to upload image to GCS: {e}")
             return ""
+
+class WriteBehindGoogleCloudStorage(GoogleCloudStorage):
+    """GoogleCloudStorage that returns the final URL immediately and uploads in the background."""
+    def __init__(self, bucket_name: str, max_pending: int = 64, workers: int = 2):
+        super().__init__(bucket_name)
+        self.uploader = BackgroundUploader(self.bucket, max_pending=max_pending, workers=workers)
+
+    def save_image(self, b64_data: str, job_id: str) -> str:
+        try:
+            image_data = base64.b64decode(b64_data)
+            filename = f"{job_id}.png"
+            if not self.uploader.submit(f"images/{filename}", data=image_data, content_type="image/png"):
+                logger.warning("Upload queue full. Uploading image inline.")
+                return super().save_image(b64_data, job_id)
+            return f"/image/gcs/{filename}"
+        except Exception as e:
+            logger.error(f"Failed to queue image upload to GCS: {e}")
+            return ""
+
+    def get_pending_image(self, filename: str) -> Optional[bytes]:
+        """Returns image bytes that are still waiting to be uploaded, if any."""
+        return self.uploader.get_pending(f"images/{filename}")
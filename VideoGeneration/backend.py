@@ -1,10 +1,10 @@
 # backend.py
 from fastapi import FastAPI, File, Form, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, RedirectResponse
 from pydantic import BaseModel
 from typing import List, Optional
-import io, os, logging
+import io, os, logging, shutil
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 load_dotenv()
@@ -55,6 +55,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 try:
@@ -67,7 +68,7 @@ except Exception as e:
 # Persistence Initialization
 from .models import VideoJob
 from .database import JsonDatabase, FirestoreDatabase
-from .storage import LocalStorage, GoogleCloudStorage
+from .storage import LocalStorage, GoogleCloudStorage, WriteBehindGoogleCloudStorage
 import uuid
 import google.auth
 from google.auth.exceptions import DefaultCredentialsError
@@ -88,7 +89,15 @@ if is_cloud_run and project_id:
     # Cloud Storage Initialization
     bucket_name = os.getenv("GCS_BUCKET_NAME", "nexus-ai-media")
     try:
-        storage = GoogleCloudStorage(bucket_name)
+        # Status polling returns as soon as the video is queued; the upload runs in the background.
+        if os.getenv("GCS_WRITE_BEHIND", "true").lower() == "true":
+            storage = WriteBehindGoogleCloudStorage(
+                bucket_name,
+                max_pending=int(os.getenv("GCS_UPLOAD_QUEUE_SIZE", "16")),
+                workers=int(os.getenv("GCS_UPLOAD_WORKERS", "2"))
+            )
+        else:
+            storage = GoogleCloudStorage(bucket_name)
     except Exception as e:
         logger.error(f"Failed to initialize GCS: {e}. Falling back to LocalStorage.")
         storage = LocalStorage()
@@ -99,6 +108,7 @@ else:
 
 # Check auth if needed
 from auth import verify_token
+from uploads import spool_upload
 from fastapi import Depends
 
 # ----------------------------------------------------------------------
@@ -157,8 +167,9 @@ async def image_to_video_endpoint(
     user_id: str = Form(None)
 ):
     try:
-        image_bytes = await image.read()
-        result = generate_image_to_video(prompt, image_bytes, model, resolution=resolution, aspect_ratio=aspect_ratio, duration_seconds=duration_seconds)
+        # The helper encodes the spooled file in chunks
+        with await spool_upload(image) as upload:
+            result = generate_image_to_video(prompt, None, model, resolution=resolution, aspect_ratio=aspect_ratio, duration_seconds=duration_seconds, image_upload=upload)
         
         # Persistence: Save Initial Job
         operation_name = result.get("operation_name")
@@ -179,6 +190,8 @@ async def image_to_video_endpoint(
             db.save_job(job)
 
         return {"ok": True, **result}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("image_to_video failed")
         raise HTTPException(status_code=500, detail=str(e))
@@ -193,19 +206,20 @@ async def video_from_reference_images_endpoint(
     aspect_ratio: str = Form("16:9"),
     user_id: str = Form(None)
 ):
+    spooled_images = []
     try:
-        # Read all images
-        image_bytes_list = []
+        # Spool all images to disk; the SDK reads them from there
         for img in images:
-            image_bytes_list.append(await img.read())
+            spooled_images.append(await spool_upload(img))
             
         result = generate_video_from_reference_images(
             prompt, 
-            image_bytes_list, 
+            None, 
             model, 
             resolution=resolution, 
             aspect_ratio=aspect_ratio, 
-            duration_seconds=duration_seconds
+            duration_seconds=duration_seconds,
+            image_uploads=spooled_images
         )
         
         # Persistence: Save Initial Job
@@ -232,6 +246,9 @@ async def video_from_reference_images_endpoint(
     except Exception as e:
         logger.exception("video_from_reference_images failed")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        for upload in spooled_images:
+            upload.close()
 
 @app.post("/video_from_first_last_frames")
 async def video_from_first_last_frames_endpoint(
@@ -245,18 +262,19 @@ async def video_from_first_last_frames_endpoint(
     user_id: str = Form(None)
 ):
     try:
-        first_bytes = await first_frame.read()
-        last_bytes = await last_frame.read()
-        
-        result = generate_video_from_first_last_frames(
-            prompt, 
-            first_bytes, 
-            last_bytes, 
-            model, 
-            resolution=resolution, 
-            aspect_ratio=aspect_ratio, 
-            duration_seconds=duration_seconds
-        )
+        # Spooled to disk; the helper encodes both frames in chunks
+        with await spool_upload(first_frame) as first_upload, await spool_upload(last_frame) as last_upload:
+            result = generate_video_from_first_last_frames(
+                prompt, 
+                None, 
+                None, 
+                model, 
+                resolution=resolution, 
+                aspect_ratio=aspect_ratio, 
+                duration_seconds=duration_seconds,
+                first_upload=first_upload,
+                last_upload=last_upload
+            )
         
         # Persistence: Save Initial Job
         operation_name = result.get("operation_name")
@@ -295,6 +313,7 @@ async def extend_veo_video_endpoint(
     aspect_ratio: str = Form("16:9"),
     user_id: str = Form(None)
 ):
+    spooled_video = None
     try:
         prior_video_obj = None
         video_bytes = None
@@ -314,13 +333,13 @@ async def extend_veo_video_endpoint(
             except Exception as e:
                 logger.warning(f"Could not download bytes for previous operation: {e}")
 
-        # Scenario 2: Extend from Upload
+        # Scenario 2: Extend from Upload (spooled to disk; the helper reads it by path)
         elif base_video:
-            video_bytes = await base_video.read()
+            spooled_video = await spool_upload(base_video)
         else:
             raise HTTPException(status_code=400, detail="Either base_video or previous_operation_name must be provided")
 
-        if not video_bytes and not prior_video_obj:
+        if not video_bytes and not prior_video_obj and not (spooled_video and spooled_video.size):
              raise HTTPException(status_code=400, detail="Failed to get video content for extension")
 
         if video_bytes is None:
@@ -333,7 +352,8 @@ async def extend_veo_video_endpoint(
             prior_generated_video_obj=prior_video_obj,
             resolution=resolution, 
             aspect_ratio=aspect_ratio, 
-            duration_seconds=duration_seconds
+            duration_seconds=duration_seconds,
+            video_path=spooled_video.path if spooled_video else None
         )
         
         # Save base video for later stitching ONLY if we uploaded a file (Scenario 2).
@@ -341,12 +361,15 @@ async def extend_veo_video_endpoint(
         print(f"DEBUG: extend_veo_video payload: {payload}")
         if payload.get("ok", True) and base_video: 
             op_name = payload.get("operation_name")
-            if op_name and video_bytes:
+            if op_name and (spooled_video or video_bytes):
                 safe_op_name = op_name.replace("/", "_")
                 base_path = f"temp_base_{safe_op_name}.mp4"
-                with open(base_path, "wb") as f:
-                    f.write(video_bytes)
-                print(f"DEBUG: Saved base video to {base_path} (size: {len(video_bytes)})")
+                if spooled_video:
+                    shutil.move(spooled_video.path, base_path)
+                else:
+                    with open(base_path, "wb") as f:
+                        f.write(video_bytes)
+                print(f"DEBUG: Saved base video to {base_path} (size: {os.path.getsize(base_path)})")
                 logger.info(f"Saved base video for stitching: {base_path}")
         
         # Persistence: Save Initial Job
@@ -373,6 +396,9 @@ async def extend_veo_video_endpoint(
     except Exception as e:
         logger.exception("extend_veo_video failed")
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if spooled_video:
+            spooled_video.close()
 
 # ----------------------------------------------------------------------
 # ASYNC OPERATIONS
@@ -420,8 +446,7 @@ def status(operation_name: str):
                          if job.status != "completed":
                              job.status = "completed"
                              job.video_path = final_path
-                             job.progress = 100
-                             db.save_job(job)
+                             db.update_job_fields(job.job_id, {"status": "completed", "video_path": final_path})
                              logger.info(f"Updated job {job.job_id} to completed with path {final_path}")
                          else:
                              # Should we update anyway? Maybe path changed?
@@ -487,9 +512,41 @@ def download(operation_name: str):
     return StreamingResponse(io.BytesIO(data), media_type="video/mp4",
                              headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
+@app.get("/gcs/{filename}")
+def serve_gcs_video(filename: str):
+    """Read-through for write-behind uploads: serves a video still queued for GCS, otherwise redirects to it."""
+    if not isinstance(storage, GoogleCloudStorage):
+        raise HTTPException(status_code=400, detail="GCS storage not configured")
+
+    if isinstance(storage, WriteBehindGoogleCloudStorage):
+        pending = storage.get_pending_video(filename)
+        if pending is not None:
+            return Response(content=pending, media_type="video/mp4")
+
+    # Upload finished: send the client to the object itself (skipping the pending-aware override)
+    return RedirectResponse(GoogleCloudStorage.get_video_url(storage, filename))
+
 @app.get("/my_jobs/{user_id}")
-def get_my_jobs(user_id: str):
-    return db.get_user_jobs(user_id)
+def get_my_jobs(user_id: str, response: Response, limit: Optional[int] = None, cursor: Optional[str] = None):
+    if limit is None and cursor is None:
+        return db.get_user_jobs(user_id)
+    try:
+        jobs, next_cursor = db.get_user_jobs_page(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
+
+@app.get("/my_jobs/{user_id}/summary")
+def get_my_job_summaries(user_id: str, response: Response, limit: Optional[int] = None, cursor: Optional[str] = None):
+    try:
+        summaries, next_cursor = db.get_user_job_summaries(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return summaries
 
 @app.get("/save_local/{operation_name:path}")
 def save_local(operation_name: str):
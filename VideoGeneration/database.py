@@ -1,21 +1,44 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from abc import ABC, abstractmethod
 import json
 import os
 import logging
 from google.cloud import firestore
 from google.api_core.exceptions import NotFound
+from pagination import UserJobIndex, firestore_page, clamp_limit
+from firestore_batch import FirestoreWriteBatcher
 
 # Import extracted components
 from .models import VideoJob
 
 logger = logging.getLogger("Database")
 
+# Fields needed by listing views
+SUMMARY_FIELDS = ["job_id", "type", "prompt", "status", "progress", "video_path", "created_at"]
+
+def summarize_job(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Projects a raw job document onto the listing summary without Pydantic validation."""
+    status = data.get("status")
+    return {
+        "job_id": data.get("job_id"),
+        "type": data.get("type"),
+        "topic": data.get("prompt"),
+        "status": status,
+        "progress": 100 if status == "completed" else data.get("progress", 0),
+        "thumbnail": data.get("video_path"),
+        "created_at": data.get("created_at"),
+    }
+
 class DatabaseProvider(ABC):
     @abstractmethod
     def save_job(self, job: VideoJob):
         pass
 
+    @abstractmethod
+    def update_job_fields(self, job_id: str, fields: Dict[str, Any]):
+        """Persists only the given top-level fields of a job (e.g. status, video_path)."""
+        pass
+
     @abstractmethod
     def get_job_by_operation(self, operation_name: str) -> Optional[VideoJob]:
         pass
@@ -24,9 +47,24 @@ class DatabaseProvider(ABC):
     def get_user_jobs(self, user_id: str) -> List[Dict[str, Any]]:
         pass
 
+    @abstractmethod
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Returns one page of the user's jobs (newest first) and the cursor for the next page."""
+        pass
+
+    @abstractmethod
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Like get_user_jobs_page, but returns lightweight summary dicts (see summarize_job)."""
+        pass
+
 class JsonDatabase(DatabaseProvider):
     def __init__(self, db_file: str = "jobs.json"):
         self.db_file = db_file
+        self.index = UserJobIndex(
+            get_key=lambda j: (j.get('created_at', ''), j.get('job_id', '')),
+            get_user=lambda j: j.get('user_id')
+        )
+        self.index_mtime = None
         self.jobs = self._load_db()
 
     def _load_db(self):
@@ -38,21 +76,43 @@ class JsonDatabase(DatabaseProvider):
         except Exception:
             return []
 
+    def _refresh_index(self):
+        # Other processes may write jobs.json; rebuild the index only when the file changed
+        mtime = os.path.getmtime(self.db_file) if os.path.exists(self.db_file) else None
+        if mtime != self.index_mtime:
+            self.jobs = self._load_db()
+            self.index.rebuild(self.jobs)
+            self.index_mtime = mtime
+
     def _save_db(self):
         with open(self.db_file, 'w') as f:
             json.dump(self.jobs, f, indent=4)
 
     def save_job(self, job: VideoJob):
+        self._refresh_index()
         # Determine if update or insert
         job_dict = job.model_dump()
         existing_idx = next((i for i, j in enumerate(self.jobs) if j["job_id"] == job.job_id), -1)
         
         if existing_idx >= 0:
+            self.index.remove(self.jobs[existing_idx])
             self.jobs[existing_idx] = job_dict
         else:
             self.jobs.insert(0, job_dict) # Newest first
+        self.index.add(job_dict)
             
         self._save_db()
+        self.index_mtime = os.path.getmtime(self.db_file)
+
+    def update_job_fields(self, job_id: str, fields: Dict[str, Any]):
+        self._refresh_index()
+        job_dict = next((j for j in self.jobs if j["job_id"] == job_id), None)
+        if job_dict is None:
+            logger.warning(f"Cannot update missing job {job_id}")
+            return
+        job_dict.update(fields)
+        self._save_db()
+        self.index_mtime = os.path.getmtime(self.db_file)
 
     def get_job(self, job_id: str) -> Optional[VideoJob]:
         self.jobs = self._load_db() # Reload to get latest state
@@ -74,33 +134,57 @@ class JsonDatabase(DatabaseProvider):
             return self.jobs
         return [job for job in self.jobs if job.get('user_id') == user_id]
 
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        self._refresh_index()
+        return self.index.page(user_id, clamp_limit(limit), cursor)
+
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        jobs, next_cursor = self.get_user_jobs_page(user_id, limit=limit, cursor=cursor)
+        return [summarize_job(j) for j in jobs], next_cursor
+
 class FirestoreDatabase(DatabaseProvider):
-    def __init__(self, project_id: str, collection: str = "video_jobs"):
+    def __init__(self, project_id: str, collection: str = "video_jobs", batch_window: float = 0.5):
         self.client = firestore.Client(project=project_id)
         self.collection_ref = self.client.collection(collection)
+        self.batcher = FirestoreWriteBatcher(self.client, window=batch_window)
         logger.info(f"Initialized FirestoreDatabase with collection: {collection}")
 
     def save_job(self, job: VideoJob):
         job_dict = job.model_dump()
         doc_ref = self.collection_ref.document(job.job_id)
+        # The full document supersedes any batched field updates still queued for it
+        self.batcher.discard(doc_ref)
         doc_ref.set(job_dict)
         logger.info(f"Saved job {job.job_id} to Firestore")
 
+    def update_job_fields(self, job_id: str, fields: Dict[str, Any]):
+        """Queues a Firestore update() of just these fields; rapid updates are merged into one WriteBatch."""
+        self.batcher.update(self.collection_ref.document(job_id), fields)
+
     def get_job(self, job_id: str) -> Optional[VideoJob]:
         doc_ref = self.collection_ref.document(job_id)
         doc = doc_ref.get()
         if doc.exists:
-            return VideoJob(**doc.to_dict())
+            return VideoJob(**{**doc.to_dict(), **self.batcher.pending_fields(doc_ref)})
         return None
 
     def get_job_by_operation(self, operation_name: str) -> Optional[VideoJob]:
         query = self.collection_ref.where("operation_name", "==", operation_name).limit(1)
         docs = query.stream()
         for doc in docs:
-            return VideoJob(**doc.to_dict())
+            return VideoJob(**{**doc.to_dict(), **self.batcher.pending_fields(doc.reference)})
         return None
 
     def get_user_jobs(self, user_id: str) -> List[Dict[str, Any]]:
         query = self.collection_ref.where("user_id", "==", user_id).order_by("created_at", direction=firestore.Query.DESCENDING)
         docs = query.stream()
         return [doc.to_dict() for doc in docs]
+
+    def get_user_jobs_page(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = self.collection_ref.where("user_id", "==", user_id)
+        return firestore_page(query, "created_at", clamp_limit(limit), cursor)
+
+    def get_user_job_summaries(self, user_id: str, limit: int = None, cursor: str = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = self.collection_ref.where("user_id", "==", user_id)
+        docs, next_cursor = firestore_page(query, "created_at", clamp_limit(limit), cursor, fields=SUMMARY_FIELDS)
+        return [summarize_job(d) for d in docs], next_cursor
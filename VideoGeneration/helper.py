@@ -13,6 +13,8 @@ from typing import Optional, Dict, Any, List, Tuple, Union
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
+from uploads import SpooledUpload, sniff_mime
+
 # Try importing moviepy, handle if missing
 try:
     from moviepy import VideoFileClip, concatenate_videoclips
@@ -123,17 +125,18 @@ def _guess_mime_type(path: str, fallback_image: str = "image/jpeg") -> str:
         return "image/webp"
     return fallback_image
 
+def _encode_image(image_bytes: Optional[bytes], upload: Optional[SpooledUpload] = None) -> Tuple[str, str]:
+    """
+    Returns (base64, mime type) for an image given as bytes or as a spooled upload.
+    An upload is encoded in chunks, so the raw bytes are never read whole.
+    """
+    if upload:
+        return upload.b64encode(), upload.mime_type
+    return base64.b64encode(image_bytes).decode("ascii"), sniff_mime(image_bytes[:16], declared="image/jpeg")
+
 # --------------------------------------------------------------
 # ADAPTIVE UPLOAD HELPER (inspects SDK signature and tries compatible shapes)
 # --------------------------------------------------------------
-class UploadFileError(RuntimeError):
-    pass
-
-# Replace existing upload_file with this function in helper.py
-import io
-import inspect
-from typing import Any
-
 class UploadFileError(RuntimeError):
     pass
 
@@ -310,10 +313,13 @@ def generate_text_to_video(prompt: str, model: str, resolution: str, aspect_rati
     logger.info(f"Operation started: {operation_name} ({type(op)})")
     return {"operation_name": operation_name, "message": "text-to-video operation started"}
 
-def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8) -> Dict[str, Any]:
+def generate_image_to_video(prompt: str, image_bytes: Optional[bytes], model: str, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8, image_upload: Optional[SpooledUpload] = None) -> Dict[str, Any]:
     """
     Introspection-guided image->video generation. Tries direct base64 payloads and typed constructors,
     then falls back to upload-then-generate. If all fail, dumps SDK schema via dump_generate_videos_schema().
+
+    If image_upload is given, the image is read from the spooled file and image_bytes may be None.
+    The caller owns the upload; it is not closed.
     """
     client = create_genai_client()
     logger.info("Starting image-to-video generation (introspection-guided)")
@@ -324,21 +330,10 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
     except Exception:
         cfg = {"resolution": resolution, "aspect_ratio": aspect_ratio, "duration_seconds": str(duration_seconds)}
 
-    # guess mime
+    # base64 encode once and guess mime
     mime_type = "image/jpeg"
     try:
-        if image_bytes[:8].startswith(b'\x89PNG\r\n\x1a\n'):
-            mime_type = "image/png"
-        elif image_bytes[:2] == b'\xff\xd8':
-            mime_type = "image/jpeg"
-        elif image_bytes[:4] in (b'RIFF',):
-            mime_type = "image/webp"
-    except Exception:
-        pass
-
-    # base64 encode once
-    try:
-        b64 = base64.b64encode(image_bytes).decode("ascii")
+        b64, mime_type = _encode_image(image_bytes, image_upload)
     except Exception as e:
         logger.exception("Failed to base64-encode image bytes: %s", e)
         b64 = None
@@ -412,10 +407,11 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
         attempt_errors.append(("introspection", e))
 
     # 3) Fallback to upload-based approach (we already know upload_file works)
-    tmp_path = f"temp_input_image_{uuid.uuid4().hex}.jpg"
+    tmp_path = image_upload.path if image_upload else f"temp_input_image_{uuid.uuid4().hex}.jpg"
     try:
-        with open(tmp_path, "wb") as f:
-            f.write(image_bytes)
+        if not image_upload:
+            with open(tmp_path, "wb") as f:
+                f.write(image_bytes)
         logger.info("generate_image_to_video: wrote temp file %s (%d bytes)", tmp_path, os.path.getsize(tmp_path))
 
         uploaded = try_call("upload_file(temp_path)", lambda: upload_file(client, tmp_path))
@@ -445,14 +441,14 @@ def generate_image_to_video(prompt: str, image_bytes: bytes, model: str, resolut
 
     finally:
         try:
-            if os.path.exists(tmp_path):
+            if not image_upload and os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
             pass
     # inside generate_image_to_video, when all earlier attempts fail:
     try:
         logger.info("generate_image_to_video: all SDK attempts failed; trying REST fallback")
-        return generate_image_to_video_rest(prompt, image_bytes, model)
+        return generate_image_to_video_rest(prompt, image_bytes, model, image_upload=image_upload)
     except Exception as e_rest:
         logger.exception("REST fallback failed too")
         # finally raise the original error or combined error for debugging
@@ -552,11 +548,12 @@ def dump_generate_videos_schema() -> Dict[str, Any]:
 
 def generate_video_from_reference_images(
     prompt: str,
-    images: List[bytes],
+    images: Optional[List[bytes]],
     model: str,
     resolution: str = "1080p",
     aspect_ratio: str = "16:9",
     duration_seconds: int = 8,
+    image_uploads: Optional[List[SpooledUpload]] = None,
 ) -> Dict[str, Any]:
     """
     Fallback: call the Generative Language REST long-running endpoint directly
@@ -574,6 +571,8 @@ def generate_video_from_reference_images(
           }
         ]
 
+    image_uploads (spooled uploads) may be given instead of images; the caller owns them.
+
     Returns: {"operation_name": "<op>", "message": "..."}
     Raises RuntimeError on any non-2xx response with helpful message.
     """
@@ -588,25 +587,22 @@ def generate_video_from_reference_images(
             "for REST reference-images call"
         )
 
-    if not images:
+    if not images and not image_uploads:
         raise RuntimeError("generate_video_from_reference_images_rest: no images provided")
 
     client = create_genai_client()
     
-    # helper to guess mime type
-    def get_mime(b):
-        if b[:8].startswith(b"\x89PNG\r\n\x1a\n"): return "image/png"
-        if b[:2] == b"\xff\xd8": return "image/jpeg"
-        if b[:4] == b"RIFF": return "image/webp"
-        return "image/jpeg"
-
     ref_images = []
-    for img_bytes in images:
-        # SDK expects Image object with 'image_bytes' (raw bytes)
-        image_part = types.Image(
-            image_bytes=img_bytes,
-            mime_type=get_mime(img_bytes)
-        )
+    for img in image_uploads or images:
+        if isinstance(img, SpooledUpload):
+            # The SDK reads the file into the request itself
+            image_part = types.Image.from_file(location=img.path, mime_type=img.mime_type)
+        else:
+            # SDK expects Image object with 'image_bytes' (raw bytes)
+            image_part = types.Image(
+                image_bytes=img,
+                mime_type=sniff_mime(img[:16], declared="image/jpeg")
+            )
         # Wrap in VideoGenerationReferenceImage
         ref_img = types.VideoGenerationReferenceImage(image=image_part)
         ref_images.append(ref_img)
@@ -642,12 +638,14 @@ def generate_video_from_reference_images(
 
 def generate_video_from_first_last_frames(
     prompt: str,
-    first: bytes,
-    last: bytes,
+    first: Optional[bytes],
+    last: Optional[bytes],
     model: str,
     resolution: str = "1080p",
     aspect_ratio: str = "16:9",
     duration_seconds: int = 8,
+    first_upload: Optional[SpooledUpload] = None,
+    last_upload: Optional[SpooledUpload] = None,
 ) -> Dict[str, Any]:
     """
     Call the Generative Language REST long-running endpoint directly
@@ -663,6 +661,8 @@ def generate_video_from_first_last_frames(
           }
         ]
 
+    first_upload/last_upload (spooled uploads) may be given instead of the bytes; the caller owns them.
+
     Returns: {"operation_name": "<op>", "message": "..."}
     Raises RuntimeError on any non-2xx response with helpful message.
     """
@@ -677,32 +677,15 @@ def generate_video_from_first_last_frames(
             "for REST first+last-frames call"
         )
 
-    if not first or not last:
+    if not (first or first_upload) or not (last or last_upload):
         raise RuntimeError("generate_video_from_first_last_frames_rest: both first and last images are required")
 
     url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:predictLongRunning"
     params = {"key": api_key}
     headers = {"Content-Type": "application/json"}
 
-    # Small helper to guess mime type
-    def _guess_mime(img: bytes) -> str:
-        m = "image/jpeg"
-        try:
-            if img[:8].startswith(b"\x89PNG\r\n\x1a\n"):
-                m = "image/png"
-            elif img[:2] == b"\xff\xd8":
-                m = "image/jpeg"
-            elif img[:4] == b"RIFF":
-                m = "image/webp"
-        except Exception:
-            pass
-        return m
-
-    first_mime = _guess_mime(first)
-    last_mime = _guess_mime(last)
-
-    first_b64 = base64.b64encode(first).decode("ascii")
-    last_b64 = base64.b64encode(last).decode("ascii")
+    first_b64, first_mime = _encode_image(first, first_upload)
+    last_b64, last_mime = _encode_image(last, last_upload)
 
     # Build instance as the REST API expects
     instance = {
@@ -840,7 +823,7 @@ def _try_construct_typed_video(candidate_cls, uploaded_or_file_obj):
     # If we arrive here, we could not construct
     raise RuntimeError(f"_try_construct_typed_video failed for {candidate_cls} last_exc={last_exc}")
 
-def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generated_video_obj: Optional[Any] = None, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8) -> Dict[str, Any]:
+def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generated_video_obj: Optional[Any] = None, resolution: str = "1080p", aspect_ratio: str = "16:9", duration_seconds: int = 8, video_path: Optional[str] = None) -> Dict[str, Any]:
     """
     Attempt to extend a video.
 
@@ -852,6 +835,9 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
       3) If we cannot construct a typed instance, we raise a clear error instructing the user to provide a
          prior generated video object (per docs) or show how to produce one (generate a short dummy video first).
 
+    If video_path is given (e.g. a spooled upload), that file is used instead of writing video_bytes to disk.
+    The caller owns the file; it is not deleted.
+
     Returns: {"operation_name": "...", "message": "..."}
     """
 
@@ -875,10 +861,11 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
             raise RuntimeError(f"extend_veo_video: SDK generate_videos with provided prior_generated_video_obj failed: {e}")
 
     # 2) No prior generated-video object: upload the local file and then attempt to construct a typed object
-    tmp_path = f"temp_video_input_{uuid.uuid4().hex}.mp4"
+    tmp_path = video_path or f"temp_video_input_{uuid.uuid4().hex}.mp4"
     try:
-        with open(tmp_path, "wb") as fh:
-            fh.write(video_bytes)
+        if not video_path:
+            with open(tmp_path, "wb") as fh:
+                fh.write(video_bytes)
         logger.info("extend_veo_video: wrote temp video %s (%d bytes)", tmp_path, os.path.getsize(tmp_path))
 
         # FORCE Fallback Strategy: Extract Last Frame and use Image-to-Video.
@@ -965,7 +952,7 @@ def extend_veo_video(prompt: str, video_bytes: bytes, model: str, prior_generate
 
     finally:
         try:
-            if os.path.exists(tmp_path):
+            if not video_path and os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
             pass
@@ -1237,7 +1224,7 @@ def download_video_bytes(operation_name: str) -> Tuple[Optional[bytes], Optional
     filename = f"video_{ist_time.strftime('%Y_%m_%d_%H_%M_%S')}.mp4"
     return data, filename
 
-def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) -> Dict[str, Any]:
+def generate_image_to_video_rest(prompt: str, image_bytes: Optional[bytes], model: str, image_upload: Optional[SpooledUpload] = None) -> Dict[str, Any]:
     """
     Fallback: call the Generative Language REST long-running endpoint directly
     to start a Veo job using a single image + a text prompt.
@@ -1253,7 +1240,7 @@ def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) ->
             "for REST image-to-video call"
         )
 
-    if not image_bytes:
+    if not image_bytes and not image_upload:
         raise RuntimeError("generate_image_to_video_rest: no image provided")
 
     # Build URL for predictLongRunning
@@ -1261,19 +1248,7 @@ def generate_image_to_video_rest(prompt: str, image_bytes: bytes, model: str) ->
     params = {"key": api_key}
     headers = {"Content-Type": "application/json"}
 
-    # minimal mime type guessing
-    mime_type = "image/jpeg"
-    try:
-        if image_bytes[:8].startswith(b"\x89PNG\r\n\x1a\n"):
-            mime_type = "image/png"
-        elif image_bytes[:2] == b"\xff\xd8":
-            mime_type = "image/jpeg"
-        elif image_bytes[:4] == b"RIFF":
-            mime_type = "image/webp"
-    except Exception:
-        pass
-
-    b64 = base64.b64encode(image_bytes).decode("ascii")
+    b64, mime_type = _encode_image(image_bytes, image_upload)
 
     # Build instance
     instance = {
@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 import os
 import shutil
 import logging
+import tempfile
+from typing import Optional
+from gcs_uploader import BackgroundUploader
 
 logger = logging.getLogger("Storage")
 
@@ -78,3 +81,41 @@ class GoogleCloudStorage(StorageProvider):
 
     def get_video_url(self, filename: str) -> str:
         return f"https://storage.googleapis.com/{self.bucket_name}/videos/{filename}"
+
+class WriteBehindGoogleCloudStorage(GoogleCloudStorage):
+    """
+    GoogleCloudStorage that uploads in the background. While an upload is pending, URLs point at
+    the /video/gcs read-through route, which serves the queued bytes and redirects to GCS afterwards.
+    """
+    def __init__(self, bucket_name: str, max_pending: int = 16, workers: int = 2):
+        super().__init__(bucket_name)
+        self.uploader = BackgroundUploader(self.bucket, max_pending=max_pending, workers=workers)
+
+    def save_video(self, source_data: bytes, filename: str) -> str:
+        if not self.uploader.submit(f"videos/{filename}", data=source_data, content_type="video/mp4"):
+            logger.warning("Upload queue full. Uploading video inline.")
+            return super().save_video(source_data, filename)
+        return self.get_video_url(filename)
+
+    def save_video_from_path(self, source_path: str, filename: str) -> str:
+        blob_name = f"videos/{filename}"
+        if self.uploader.is_pending(blob_name):
+            return self.get_video_url(filename)
+        # Spool a private copy so the caller may move or delete the source right away
+        fd, spool_path = tempfile.mkstemp(suffix=".mp4")
+        os.close(fd)
+        shutil.copyfile(source_path, spool_path)
+        if not self.uploader.submit(blob_name, path=spool_path, content_type="video/mp4"):
+            os.remove(spool_path)
+            logger.warning("Upload queue full. Uploading video inline.")
+            return super().save_video_from_path(source_path, filename)
+        return self.get_video_url(filename)
+
+    def get_video_url(self, filename: str) -> str:
+        if self.uploader.is_pending(f"videos/{filename}"):
+            return f"/video/gcs/{filename}"
+        return super().get_video_url(filename)
+
+    def get_pending_video(self, filename: str) -> Optional[bytes]:
+        """Returns video bytes that are still waiting to be uploaded, if any."""
+        return self.uploader.get_pending(f"videos/{filename}")
@@ -2,13 +2,21 @@ import os
 import uvicorn
 from fastapi import FastAPI, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from youtube_transcript_api import YouTubeTranscriptApi
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import youtube_transcript_api
+from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable, InvalidVideoId
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import google.generativeai as genai
 from dotenv import load_dotenv
+import asyncio
+import json
 import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional, Tuple
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -33,6 +41,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure Gemini
@@ -47,6 +56,41 @@ youtube_api_key = os.getenv("YOUTUBE_API_KEY")
 if not youtube_api_key:
     logger.warning("YOUTUBE_API_KEY not found. YouTube Data API features will be limited.")
 
+# Transcript cache (memory LRU + SQLite). TRANSCRIPT_CACHE_TTL=0 disables it.
+from .cache import TranscriptCache
+from .transcript import Transcript
+from .summarizer import ChapteredSummarizer, MAP_PROMPT_VERSION, MAP_PROMPT, REDUCE_PROMPT
+from llm_usage import estimate_tokens, response_usage
+transcript_cache = TranscriptCache(
+    db_path=os.getenv("TRANSCRIPT_CACHE_DB", "transcript_cache.sqlite3"),
+    ttl=float(os.getenv("TRANSCRIPT_CACHE_TTL", str(24 * 3600))),
+    negative_ttl=float(os.getenv("TRANSCRIPT_NEGATIVE_TTL", "3600")),
+    max_items=int(os.getenv("TRANSCRIPT_CACHE_ITEMS", "256"))
+)
+
+# Transcripts above this many (estimated) tokens are summarized by map-reduce over timestamp windows
+TRANSCRIPT_SINGLE_SHOT_TOKENS = int(os.getenv("TRANSCRIPT_SINGLE_SHOT_TOKENS", "32000"))
+TRANSCRIPT_WINDOW_SECONDS = float(os.getenv("TRANSCRIPT_WINDOW_SECONDS", "600"))
+TRANSCRIPT_WINDOW_TOKENS = int(os.getenv("TRANSCRIPT_WINDOW_TOKENS", "20000"))
+TRANSCRIPT_MAP_CONCURRENCY = int(os.getenv("TRANSCRIPT_MAP_CONCURRENCY", "4"))
+# Model for the per-window summaries; defaults to the requested model
+TRANSCRIPT_MAP_MODEL = os.getenv("TRANSCRIPT_MAP_MODEL")
+
+# Batch endpoint limits
+BATCH_MAX_VIDEOS = int(os.getenv("BATCH_MAX_VIDEOS", "50"))
+BATCH_FETCH_CONCURRENCY = int(os.getenv("BATCH_FETCH_CONCURRENCY", "4"))
+BATCH_SUMMARY_CONCURRENCY = int(os.getenv("BATCH_SUMMARY_CONCURRENCY", "2"))
+
+SUMMARY_PROMPT = """You are a YouTube video summarizer. You will be taking the transcript text
+and summarizing the entire video and providing the important summary in points
+within 250 words. Please provide the summary of the text given here: """
+
+# NoTranscriptAvailable only exists in youtube-transcript-api < 1.0
+NoTranscriptAvailable = getattr(youtube_transcript_api, "NoTranscriptAvailable", NoTranscriptFound)
+
+# Errors meaning the video has no usable captions (worth caching), as opposed to transient failures
+NO_CAPTIONS_ERRORS = (TranscriptsDisabled, NoTranscriptFound, NoTranscriptAvailable, VideoUnavailable, InvalidVideoId)
+
 def extract_video_id(youtube_video_url):
     """Extract video ID from YouTube URL"""
     try:
@@ -61,39 +105,50 @@ def extract_video_id(youtube_video_url):
         logger.error(f"Error extracting video ID: {str(e)}")
         raise ValueError("Invalid YouTube URL format")
 
-def get_transcript_via_youtube_api(video_id, api_key):
+# Checking caption tracks with captions().list before downloading costs a Data API call (and
+# quota) per video. It is opt-in, and its result is cached per video when enabled.
+CAPTIONS_PREFLIGHT = os.getenv("YOUTUBE_CAPTIONS_PREFLIGHT", "false").lower() == "true"
+CAPTIONS_PREFLIGHT_TTL = float(os.getenv("YOUTUBE_CAPTIONS_PREFLIGHT_TTL", "3600"))
+caption_checks: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()
+youtube_client_lock = threading.Lock()
+
+@lru_cache(maxsize=4)
+def get_youtube_client(api_key):
     """
-    Fetch transcript using official YouTube Data API v3
-    This is more reliable and not blocked by YouTube
+    YouTube Data API client, built once per process and key. Uses the discovery document bundled
+    with google-api-python-client, so no discovery fetch happens at request time.
     """
-    try:
-        logger.info(f"Fetching transcript via YouTube Data API for video: {video_id}")
-        
-        # Build YouTube API client
-        youtube = build('youtube', 'v3', developerKey=api_key)
-        
-        # Get captions list
-        captions_response = youtube.captions().list(
+    return build('youtube', 'v3', developerKey=api_key, static_discovery=True, cache_discovery=False)
+
+def captions_available(video_id, api_key):
+    """Pre-flight: asks the Data API whether the video has any caption track. Cached per video."""
+    now = time.time()
+    with youtube_client_lock:
+        checked = caption_checks.get(video_id)
+        if checked and checked[0] > now:
+            return checked[1]
+        # The client's HTTP transport is not thread-safe, so calls are serialized
+        captions_response = get_youtube_client(api_key).captions().list(
             part='snippet',
             videoId=video_id
         ).execute()
+        available = bool(captions_response.get('items'))
+        caption_checks[video_id] = (now + CAPTIONS_PREFLIGHT_TTL, available)
+        caption_checks.move_to_end(video_id)
+        while len(caption_checks) > 1024:
+            caption_checks.popitem(last=False)
+        return available
+
+def get_transcript_via_youtube_api(video_id, api_key, language="en"):
+    """
+    Fetch transcript after confirming via the official YouTube Data API v3 that captions exist
+    """
+    try:
+        logger.info(f"Checking captions via YouTube Data API for video: {video_id}")
         
-        if not captions_response.get('items'):
+        if not captions_available(video_id, api_key):
             raise ValueError("No captions available for this video")
         
-        # Find English caption track (or first available)
-        caption_id = None
-        for item in captions_response['items']:
-            if item['snippet']['language'] == 'en':
-                caption_id = item['id']
-                break
-        
-        if not caption_id and captions_response['items']:
-            caption_id = captions_response['items'][0]['id']
-        
-        if not caption_id:
-            raise ValueError("No suitable caption track found")
-        
         # Download caption
         # Note: YouTube Data API v3 doesn't directly support caption download
         # We need to fall back to youtube-transcript-api for actual download
@@ -101,16 +156,11 @@ def get_transcript_via_youtube_api(video_id, api_key):
         logger.info(f"Captions available. Attempting download via transcript API...")
         
         # Try youtube-transcript-api as fallback for actual download
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
         
-        transcript = ""
-        for entry in transcript_list:
-            if isinstance(entry, dict):
-                transcript += " " + entry.get('text', '')
-            else:
-                transcript += " " + getattr(entry, 'text', '')
+        transcript = Transcript.from_entries(transcript_list)
         
-        logger.info(f"Successfully fetched transcript. Length: {len(transcript)} characters")
+        logger.info(f"Successfully fetched transcript. Length: {len(transcript.text)} characters, {len(transcript)} segments")
         return transcript
         
     except HttpError as e:
@@ -125,44 +175,50 @@ def get_transcript_via_youtube_api(video_id, api_key):
         logger.error(f"Error fetching transcript via API: {str(e)}")
         raise e
 
-def get_transcript_fallback(video_id):
+def get_transcript_fallback(video_id, language="en"):
     """
     Fallback method using youtube-transcript-api
     May be blocked in Cloud Run but worth trying
     """
     try:
         logger.info(f"Attempting fallback transcript fetch for video: {video_id}")
-        transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
+        transcript_list = YouTubeTranscriptApi.get_transcript(video_id, languages=[language])
         
-        transcript = ""
-        for entry in transcript_list:
-            if isinstance(entry, dict):
-                transcript += " " + entry.get('text', '')
-            else:
-                transcript += " " + getattr(entry, 'text', '')
+        transcript = Transcript.from_entries(transcript_list)
         
-        logger.info(f"Fallback successful. Transcript length: {len(transcript)} characters")
+        logger.info(f"Fallback successful. Transcript length: {len(transcript.text)} characters")
         return transcript
     except Exception as e:
         logger.error(f"Fallback method failed: {str(e)}")
         raise e
 
-def extract_transcript_details(youtube_video_url):
+def extract_transcript_details(youtube_video_url, language="en", timed=False):
     """
     Main function to extract transcript
-    Tries YouTube Data API first, then falls back to youtube-transcript-api
+    Serves from the transcript cache when possible, otherwise tries YouTube Data API first,
+    then falls back to youtube-transcript-api.
+    Returns (text, video_id), or (Transcript, video_id) with segment timings when timed=True.
     """
     try:
         # Extract video ID
         video_id = extract_video_id(youtube_video_url)
         logger.info(f"Extracted video ID: {video_id}")
         
+        cached = transcript_cache.get(video_id, language)
+        if cached:
+            if cached.error:
+                logger.info(f"Transcript cache: {video_id} is known to have no captions")
+                raise ValueError(cached.error)
+            logger.info(f"Transcript cache hit for {video_id} ({language})")
+            return (cached.segments if timed else cached.transcript), video_id
+        
         transcript = None
         
-        # Method 1: Try YouTube Data API v3 (if API key available)
-        if youtube_api_key:
+        # Method 1: Try YouTube Data API v3 (if API key available and the pre-flight is enabled).
+        # Otherwise the common path is a single fetch through youtube-transcript-api.
+        if youtube_api_key and CAPTIONS_PREFLIGHT:
             try:
-                transcript = get_transcript_via_youtube_api(video_id, youtube_api_key)
+                transcript = get_transcript_via_youtube_api(video_id, youtube_api_key, language)
                 logger.info("Successfully fetched transcript via YouTube Data API")
             except Exception as api_error:
                 logger.warning(f"YouTube Data API failed: {str(api_error)}")
@@ -171,22 +227,26 @@ def extract_transcript_details(youtube_video_url):
         # Method 2: Fallback to youtube-transcript-api
         if not transcript:
             try:
-                transcript = get_transcript_fallback(video_id)
+                transcript = get_transcript_fallback(video_id, language)
                 logger.info("Successfully fetched transcript via fallback method")
             except Exception as fallback_error:
                 logger.error(f"All methods failed. Last error: {str(fallback_error)}")
                 # Provide user-friendly error message
                 error_msg = str(fallback_error)
                 if "Subtitles are disabled" in error_msg or "Could not retrieve" in error_msg:
-                    raise ValueError(
+                    message = (
                         "This video doesn't have captions/subtitles available. "
                         "Please try a different video with captions enabled (look for the [CC] badge on YouTube). "
                         "Note: Some videos may have captions but are blocked from automated access."
                     )
                 else:
-                    raise ValueError(f"Failed to fetch transcript: {error_msg}")
+                    message = f"Failed to fetch transcript: {error_msg}"
+                if isinstance(fallback_error, NO_CAPTIONS_ERRORS):
+                    transcript_cache.put_negative(video_id, language, message)
+                raise ValueError(message)
         
-        return transcript, video_id
+        transcript_cache.put(video_id, language, transcript)
+        return (transcript if timed else transcript.text), video_id
         
     except ValueError as ve:
         # Re-raise ValueError with user-friendly message
@@ -202,6 +262,7 @@ from datetime import datetime
 # Database Initialization
 from .database import JsonDatabase, FirestoreDatabase
 from auth import verify_token
+from langsmith_config import token_tracker
 from fastapi import Depends, HTTPException
 
 project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -218,53 +279,98 @@ else:
     logger.info("Running locally. Using JsonDatabase.")
     db = JsonDatabase()
 
+# Summary result cache, shared across instances through Firestore on Cloud Run. SUMMARY_CACHE_TTL=0 disables it.
+from .summary_cache import SummaryCache, SqliteSummaryStore, FirestoreSummaryStore, prompt_hash
+SUMMARY_PROMPT_VERSION = prompt_hash(SUMMARY_PROMPT, MAP_PROMPT_VERSION, MAP_PROMPT, REDUCE_PROMPT)
+summary_cache_ttl = float(os.getenv("SUMMARY_CACHE_TTL", str(24 * 3600)))
+summary_store = None
+if summary_cache_ttl > 0:
+    try:
+        if is_cloud_run and project_id:
+            summary_store = FirestoreSummaryStore(project_id)
+        else:
+            summary_store = SqliteSummaryStore(os.getenv("SUMMARY_CACHE_DB", "summary_cache.sqlite3"))
+    except Exception as e:
+        logger.error(f"Failed to initialize summary cache: {e}. Summaries will not be cached.")
+summary_cache = SummaryCache(summary_store, ttl=summary_cache_ttl)
+
+async def summarize_transcript(transcript, video_id, model, language):
+    """
+    Summarizes a fetched transcript, serving from the summary cache when possible.
+    Returns (summary fields, (input, output, total) tokens, cache_hit).
+    """
+    cache_key = SummaryCache.key(video_id, language, model, SUMMARY_PROMPT_VERSION)
+    # Cache lookups hit SQLite or Firestore, so they run in a worker thread
+    cached = await asyncio.to_thread(summary_cache.get, cache_key)
+    if cached:
+        logger.info(f"Summary cache hit for {video_id} ({model})")
+        return {k: v for k, v in cached.items() if k in ("summary", "chapters")}, (0, 0, 0), True
+    
+    gen_model = genai.GenerativeModel(model)
+    if estimate_tokens(transcript.text) > TRANSCRIPT_SINGLE_SHOT_TOKENS:
+        # Long videos: summarize timestamp windows concurrently, then merge into chapters
+        map_model = genai.GenerativeModel(TRANSCRIPT_MAP_MODEL) if TRANSCRIPT_MAP_MODEL else gen_model
+        summarizer = ChapteredSummarizer(
+            gen_model, map_model, cache=transcript_cache,
+            window_seconds=TRANSCRIPT_WINDOW_SECONDS,
+            max_window_tokens=TRANSCRIPT_WINDOW_TOKENS,
+            concurrency=TRANSCRIPT_MAP_CONCURRENCY
+        )
+        result = {"summary": await summarizer.summarize(transcript), "chapters": summarizer.chapters}
+        usage = (summarizer.input_tokens, summarizer.output_tokens, summarizer.total_tokens)
+    else:
+        response = await asyncio.to_thread(gen_model.generate_content, SUMMARY_PROMPT + transcript.text)
+        result = {"summary": response.text}
+        usage = response_usage(response)
+    
+    await asyncio.to_thread(summary_cache.put, cache_key, result)
+    return result, usage, False
+
+def log_token_usage(model, usage, user_id, job_id):
+    # Track token usage with LangSmith
+    input_tokens, output_tokens, total_tokens = usage
+    if total_tokens and user_id:
+        try:
+            token_tracker.log_usage(
+                service="YoutubeTranscript",
+                operation="transcript_summary",
+                model=model,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                user_id=user_id,
+                job_id=job_id or str(uuid.uuid4())
+            )
+        except Exception as e:
+            logger.warning(f"Failed to log token usage: {e}")
+
 @app.post("/transcript")
 async def get_transcript_summary(
     url: str = Form(...), 
     model: str = Form("gemini-2.0-flash-exp"),
-    user_id: str = Form(None)
+    user_id: str = Form(None),
+    language: str = Form("en")
 ):
     job_id = str(uuid.uuid4())[:8]
     start_time = datetime.now()
     status = "Failed"
-    response = None
+    total_tokens = 0
+    cache_hit = False
     
     try:
         logger.info(f"Processing URL: {url} with model: {model}")
         
         # 1. Get Transcript
-        transcript_text, video_id = extract_transcript_details(url)
+        transcript, video_id = extract_transcript_details(url, language, timed=True)
+        transcript = Transcript.coerce(transcript)
         
         # 2. Generate Summary
-        prompt = """You are a YouTube video summarizer. You will be taking the transcript text
-and summarizing the entire video and providing the important summary in points
-within 250 words. Please provide the summary of the text given here: """
-
-        gen_model = genai.GenerativeModel(model)
-        response = gen_model.generate_content(prompt + transcript_text)
-        
-        # Track token usage with LangSmith
-        if response.usage_metadata and user_id:
-            try:
-                token_tracker.log_usage(
-                    service="YoutubeTranscript",
-                    operation="transcript_summary",
-                    model=model,
-                    input_tokens=response.usage_metadata.prompt_token_count,
-                    output_tokens=response.usage_metadata.candidates_token_count,
-                    user_id=user_id,
-                    job_id=job_id or str(uuid.uuid4())
-                )
-            except Exception as e:
-                logger.warning(f"Failed to log token usage: {e}")
+        summary, usage, cache_hit = await summarize_transcript(transcript, video_id, model, language)
+        total_tokens = usage[2]
+        log_token_usage(model, usage, user_id, job_id)
         
         status = "Success"
         
-        return JSONResponse({
-            "transcript": transcript_text,
-            "summary": response.text,
-            "video_id": video_id
-        })
+        return JSONResponse({"transcript": transcript.text, **summary, "video_id": video_id})
 
     except ValueError as ve:
         # User-friendly errors
@@ -283,9 +389,7 @@ within 250 words. Please provide the summary of the text given here: """
         now = datetime.now()
         
         # TPM (Tokens Per Minute)
-        current_tokens = 0
-        if response and hasattr(response, 'usage_metadata'):
-            current_tokens = response.usage_metadata.total_token_count
+        current_tokens = total_tokens
         
         # Record Job
         job_data = {
@@ -298,16 +402,141 @@ within 250 words. Please provide the summary of the text given here: """
             "rpd": 1,
             "tokens": current_tokens,
             "status": status,
+            "cache_hit": cache_hit,
             "time": start_time.strftime("%Y-%m-%d %H:%M:%S")
         }
         
         db.save_job(job_data)
 
+def list_playlist_video_urls(playlist_id, api_key, max_videos):
+    """Video URLs of a playlist, in playlist order, via the YouTube Data API."""
+    urls = []
+    page_token = None
+    with youtube_client_lock:
+        playlist_items = get_youtube_client(api_key).playlistItems()
+        while len(urls) < max_videos:
+            response = playlist_items.list(
+                part='contentDetails',
+                playlistId=playlist_id,
+                maxResults=min(50, max_videos - len(urls)),
+                pageToken=page_token
+            ).execute()
+            for item in response.get('items', []):
+                urls.append(f"https://www.youtube.com/watch?v={item['contentDetails']['videoId']}")
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+    return urls[:max_videos]
+
+@app.post("/transcript/batch")
+async def batch_transcript_summary(
+    urls: List[str] = Form(None),
+    playlist_id: str = Form(None),
+    model: str = Form("gemini-2.0-flash-exp"),
+    user_id: str = Form(None),
+    language: str = Form("en"),
+    include_transcript: bool = Form(False)
+):
+    """
+    Summarizes several videos (a list of URLs and/or a playlist) in one request.
+    Transcripts are fetched concurrently up to BATCH_FETCH_CONCURRENCY and summarized by at
+    most BATCH_SUMMARY_CONCURRENCY workers. Results stream as NDJSON in completion order:
+    one {"type": "video"} line per video, then a {"type": "done"} line with the totals.
+    The whole batch is recorded as a single job.
+    """
+    video_urls = [u.strip() for u in (urls or []) if u and u.strip()]
+    if playlist_id:
+        if not youtube_api_key:
+            raise HTTPException(status_code=400, detail="Playlist expansion requires YOUTUBE_API_KEY.")
+        try:
+            video_urls += await asyncio.to_thread(list_playlist_video_urls, playlist_id, youtube_api_key, BATCH_MAX_VIDEOS)
+        except HttpError as e:
+            raise HTTPException(status_code=400, detail=f"Could not list playlist: {e}")
+    if not video_urls:
+        raise HTTPException(status_code=400, detail="Provide at least one URL or a playlist_id.")
+    if len(video_urls) > BATCH_MAX_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"A batch is limited to {BATCH_MAX_VIDEOS} videos.")
+    
+    job_id = str(uuid.uuid4())[:8]
+    start_time = datetime.now()
+    fetch_slots = asyncio.Semaphore(BATCH_FETCH_CONCURRENCY)
+    summary_slots = asyncio.Semaphore(BATCH_SUMMARY_CONCURRENCY)
+    
+    async def process(index, url):
+        line = {"type": "video", "index": index, "url": url}
+        try:
+            async with fetch_slots:
+                transcript, video_id = await asyncio.to_thread(extract_transcript_details, url, language, True)
+            transcript = Transcript.coerce(transcript)
+            line["video_id"] = video_id
+            async with summary_slots:
+                summary, usage, cache_hit = await summarize_transcript(transcript, video_id, model, language)
+            log_token_usage(model, usage, user_id, job_id)
+            line.update(status="Success", cache_hit=cache_hit, tokens=usage[2], **summary)
+            if include_transcript:
+                line["transcript"] = transcript.text
+        except ValueError as ve:
+            line.update(status="Failed", detail=str(ve))
+        except Exception as e:
+            logger.error(f"Batch item {url} failed: {e}")
+            line.update(status="Failed", detail=f"Backend Error: {str(e)}")
+        return line
+    
+    async def stream():
+        tasks = [asyncio.create_task(process(i, url)) for i, url in enumerate(video_urls)]
+        succeeded = failed = cache_hits = total_tokens = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                line = await next_done
+                if line["status"] == "Success":
+                    succeeded += 1
+                    cache_hits += line["cache_hit"]
+                    total_tokens += line["tokens"]
+                else:
+                    failed += 1
+                yield json.dumps(line) + "\n"
+            yield json.dumps({"type": "done", "videos": len(video_urls), "succeeded": succeeded, "failed": failed, "cache_hits": cache_hits, "tokens": total_tokens}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            status = "Success" if succeeded == len(video_urls) else ("Partial" if succeeded else "Failed")
+            db.save_job({
+                "job_id": job_id,
+                "user_id": user_id,
+                "type": "TranscriptBatch",
+                "model": model,
+                "rpm": 1,
+                "tpm": total_tokens,
+                "rpd": 1,
+                "tokens": total_tokens,
+                "status": status,
+                "videos": len(video_urls),
+                "succeeded": succeeded,
+                "cache_hits": cache_hits,
+                "time": start_time.strftime("%Y-%m-%d %H:%M:%S")
+            })
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.get("/analytics")
-def get_analytics(user_id: str, token_uid: str = Depends(verify_token)):
+def get_analytics(
+    user_id: str,
+    response: Response,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    token_uid: str = Depends(verify_token)
+):
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="User ID mismatch.")
-    return db.get_user_jobs(user_id)
+    if limit is None and cursor is None:
+        return db.get_user_jobs(user_id)
+    try:
+        jobs, next_cursor = db.get_user_jobs_page(user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return jobs
 
 @app.get("/")
 def health_check():
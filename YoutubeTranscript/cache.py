@@ -0,0 +1,182 @@
+"""
+Transcript cache keyed by (video_id, language).
+A memory LRU with TTL sits in front of a SQLite file, so popular videos are fetched from
+YouTube once per TTL instead of once per request. Videos known to have no captions are
+cached negatively (with a shorter TTL) so repeated attempts fail fast. Segment timings are
+kept alongside the text as packed arrays. The same store holds the per-window summaries of
+long videos (see summarizer.py).
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+from .transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+
+class CachedTranscript:
+    def __init__(self, transcript: Union[Transcript, str, None] = None, error: Optional[str] = None, expires_at: float = 0.0):
+        self.segments = Transcript.coerce(transcript) if transcript is not None else None
+        self.error = error  # Set for negative entries
+        self.expires_at = expires_at
+
+    @property
+    def transcript(self) -> Optional[str]:
+        return self.segments.text if self.segments is not None else None
+
+
+class TranscriptCache:
+    def __init__(self, db_path: Optional[str] = None, ttl: float = 24 * 3600, negative_ttl: float = 3600, max_items: int = 256):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_items = max_items
+        self.memory: "OrderedDict[Tuple[str, str], CachedTranscript]" = OrderedDict()
+        self.summaries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # Window summaries of long videos
+        self.lock = threading.Lock()
+        self.conn = None
+        if db_path and ttl > 0:
+            try:
+                self.conn = sqlite3.connect(db_path, check_same_thread=False)
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS transcripts ("
+                    "video_id TEXT, language TEXT, transcript TEXT, error TEXT, expires_at REAL, timing BLOB, "
+                    "PRIMARY KEY (video_id, language))"
+                )
+                # Files written before timings were stored lack the column
+                columns = {row[1] for row in self.conn.execute("PRAGMA table_info(transcripts)")}
+                if "timing" not in columns:
+                    self.conn.execute("ALTER TABLE transcripts ADD COLUMN timing BLOB")
+                self.conn.execute(
+                    "CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT, expires_at REAL)"
+                )
+                self.conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Transcript cache database unavailable, using memory only: {e}")
+                self.conn = None
+            self.purge_expired()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def _remember(self, key, entry: CachedTranscript):
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def get(self, video_id: str, language: str = "en") -> Optional[CachedTranscript]:
+        if not self.enabled:
+            return None
+        key = (video_id, language)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry and entry.expires_at > now:
+                self.memory.move_to_end(key)
+                return entry
+            self.memory.pop(key, None)
+            if not self.conn:
+                return None
+            try:
+                row = self.conn.execute(
+                    "SELECT transcript, error, expires_at, timing FROM transcripts WHERE video_id = ? AND language = ?", key
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Transcript cache read failed: {e}")
+                return None
+            if not row or row[2] <= now:
+                return None
+            segments = Transcript.from_storage(row[0], row[3]) if row[0] is not None else None
+            entry = CachedTranscript(transcript=segments, error=row[1], expires_at=row[2])
+            self._remember(key, entry)
+            return entry
+
+    def _store(self, video_id: str, language: str, entry: CachedTranscript):
+        key = (video_id, language)
+        with self.lock:
+            self._remember(key, entry)
+            if not self.conn:
+                return
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO transcripts (video_id, language, transcript, error, expires_at, timing) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (video_id, language, entry.transcript, entry.error, entry.expires_at,
+                     entry.segments.timing_bytes() if entry.segments is not None else None)
+                )
+                self.conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Transcript cache write failed: {e}")
+
+    def put(self, video_id: str, language: str, transcript: Union[Transcript, str]):
+        if self.enabled:
+            self._store(video_id, language, CachedTranscript(transcript=transcript, expires_at=time.time() + self.ttl))
+
+    def put_negative(self, video_id: str, language: str, error: str):
+        """Remembers that a video has no captions in this language."""
+        if self.enabled and self.negative_ttl > 0:
+            self._store(video_id, language, CachedTranscript(error=error, expires_at=time.time() + self.negative_ttl))
+
+    def get_summary(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self.lock:
+            entry = self.summaries.get(key)
+            if entry and entry[1] > now:
+                self.summaries.move_to_end(key)
+                return entry[0]
+            self.summaries.pop(key, None)
+            if not self.conn:
+                return None
+            try:
+                row = self.conn.execute("SELECT summary, expires_at FROM summaries WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Summary cache read failed: {e}")
+                return None
+            if not row or row[1] <= now:
+                return None
+            self._remember_summary(key, row[0], row[1])
+            return row[0]
+
+    def _remember_summary(self, key: str, summary: str, expires_at: float):
+        self.summaries[key] = (summary, expires_at)
+        self.summaries.move_to_end(key)
+        while len(self.summaries) > self.max_items:
+            self.summaries.popitem(last=False)
+
+    def put_summary(self, key: str, summary: str):
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._remember_summary(key, summary, expires_at)
+            if not self.conn:
+                return
+            try:
+                self.conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)", (key, summary, expires_at))
+                self.conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Summary cache write failed: {e}")
+
+    def purge_expired(self):
+        with self.lock:
+            now = time.time()
+            for key in [k for k, e in self.memory.items() if e.expires_at <= now]:
+                del self.memory[key]
+            for key in [k for k, e in self.summaries.items() if e[1] <= now]:
+                del self.summaries[key]
+            if self.conn:
+                try:
+                    self.conn.execute("DELETE FROM transcripts WHERE expires_at <= ?", (now,))
+                    self.conn.execute("DELETE FROM summaries WHERE expires_at <= ?", (now,))
+                    self.conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Transcript cache purge failed: {e}")
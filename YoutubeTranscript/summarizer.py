@@ -0,0 +1,80 @@
+"""
+Map-reduce summarization for long transcripts.
+The transcript is cut into timestamp windows on segment boundaries, each window is summarized
+concurrently, and the window summaries are merged into a chaptered summary with timestamps.
+Window summaries are cached by content (not by model), so re-summarizing a video with another
+model only repeats the reduce step.
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Optional
+
+from llm_usage import CHARS_PER_TOKEN, response_usage
+from .transcript import Transcript, format_timestamp
+
+logger = logging.getLogger(__name__)
+
+# Bump when MAP_PROMPT changes so cached window summaries are not reused
+MAP_PROMPT_VERSION = "1"
+MAP_PROMPT = (
+    "You are summarizing one section ({start} - {end}) of a YouTube video transcript. "
+    "Give a short chapter title on the first line, then the key points of this section as 2-5 bullet points."
+)
+REDUCE_PROMPT = (
+    "You are a YouTube video summarizer. Below are summaries of consecutive sections of one video, "
+    "each labelled with its timestamp range. Write a chaptered summary: one line per chapter in the form "
+    "'[start] Chapter title' followed by its key points, merging adjacent sections on the same topic. "
+    "End with an overall summary of the entire video within 250 words."
+)
+
+
+class ChapteredSummarizer:
+    def __init__(self, gen_model, map_model=None, cache=None, window_seconds: float = 600, max_window_tokens: int = 20000, concurrency: int = 4):
+        self.gen_model = gen_model
+        self.map_model = map_model or gen_model
+        self.cache = cache  # TranscriptCache; window summaries live next to the transcripts
+        self.window_seconds = window_seconds
+        self.max_window_tokens = max_window_tokens
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_tokens = 0
+        self.cache_hits = 0
+        self.chapters: List[Dict[str, str]] = []
+
+    async def _generate(self, model, parts: List[str]) -> str:
+        async with self.semaphore:
+            response = await asyncio.to_thread(model.generate_content, parts)
+        input_tokens, output_tokens, total_tokens = response_usage(response)
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        self.total_tokens += total_tokens
+        return response.text
+
+    async def _map(self, window: Transcript) -> str:
+        instruction = MAP_PROMPT.format(start=format_timestamp(window.starts[0]), end=format_timestamp(window.duration))
+        key = "window:" + hashlib.sha256(f"{MAP_PROMPT_VERSION}\n{instruction}\n{window.text}".encode("utf-8")).hexdigest()
+        if self.cache:
+            cached = self.cache.get_summary(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+        summary = await self._generate(self.map_model, [instruction, window.text])
+        if self.cache:
+            self.cache.put_summary(key, summary)
+        return summary
+
+    async def summarize(self, transcript: Transcript, prompt: Optional[str] = None) -> str:
+        windows = list(transcript.windows(self.window_seconds, max_chars=self.max_window_tokens * CHARS_PER_TOKEN))
+        logger.info(f"Map-reduce transcript summarization over {len(windows)} window(s)")
+        partials = await asyncio.gather(*(self._map(window) for window in windows))
+
+        self.chapters = [
+            {"start": format_timestamp(window.starts[0]), "end": format_timestamp(window.duration), "summary": partial}
+            for window, partial in zip(windows, partials)
+        ]
+        sections = "\n\n".join(f"[{c['start']} - {c['end']}]\n{c['summary']}" for c in self.chapters)
+        final_prompt = f"{prompt}\n\n{REDUCE_PROMPT}" if prompt else REDUCE_PROMPT
+        return await self._generate(self.gen_model, [final_prompt, sections])
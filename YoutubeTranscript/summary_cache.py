@@ -0,0 +1,132 @@
+"""
+Summary result cache keyed by (video_id, language, model, prompt-template hash).
+A repeated summary of the same video with the same model and prompts is served without a
+Gemini call. The store is SQLite locally and Firestore on Cloud Run, so all instances share it.
+Expired entries are deleted when read. Firestore documents also carry an expire_at timestamp,
+and the TTL policy on that field (see fieldOverrides in firestore.indexes.json) removes
+entries that are never read again.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_hash(*templates: str) -> str:
+    """Short fingerprint of the prompt templates; changing any prompt invalidates cached summaries."""
+    return hashlib.sha256("\x00".join(templates).encode("utf-8")).hexdigest()[:16]
+
+
+class SummaryStore(ABC):
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Returns the stored entry, including its expires_at, or None."""
+        pass
+
+    @abstractmethod
+    def put(self, key: str, entry: Dict[str, Any]):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+
+class SqliteSummaryStore(SummaryStore):
+    def __init__(self, db_path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS summary_results (key TEXT PRIMARY KEY, entry TEXT, expires_at REAL)")
+        self.conn.execute("DELETE FROM summary_results WHERE expires_at <= ?", (time.time(),))
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("SELECT entry FROM summary_results WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO summary_results VALUES (?, ?, ?)",
+                (key, json.dumps(entry), entry["expires_at"])
+            )
+            self.conn.commit()
+
+    def delete(self, key: str):
+        with self.lock:
+            self.conn.execute("DELETE FROM summary_results WHERE key = ?", (key,))
+            self.conn.commit()
+
+
+class FirestoreSummaryStore(SummaryStore):
+    def __init__(self, project_id: str, collection_name: str = "youtube_summary_cache"):
+        from google.cloud import firestore
+        self.db = firestore.Client(project=project_id)
+        self.collection = collection_name
+        logger.info(f"Initialized FirestoreSummaryStore (Project: {project_id}, Collection: {collection_name})")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        doc = self.db.collection(self.collection).document(key).get()
+        if not doc.exists:
+            return None
+        entry = doc.to_dict()
+        entry.pop("expire_at", None)
+        return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        # expire_at is the field the collection's TTL policy deletes on
+        expire_at = datetime.fromtimestamp(entry["expires_at"], tz=timezone.utc)
+        self.db.collection(self.collection).document(key).set({**entry, "expire_at": expire_at})
+
+    def delete(self, key: str):
+        self.db.collection(self.collection).document(key).delete()
+
+
+class SummaryCache:
+    def __init__(self, store: Optional[SummaryStore], ttl: float = 24 * 3600):
+        self.store = store
+        self.ttl = ttl
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None and self.ttl > 0
+
+    @staticmethod
+    def key(video_id: str, language: str, model: str, prompt_version: str) -> str:
+        # Usable as a Firestore document id (no slashes)
+        return hashlib.sha256(f"{video_id}\x00{language}\x00{model}\x00{prompt_version}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            entry = self.store.get(key)
+        except Exception as e:
+            logger.warning(f"Summary cache read failed: {e}")
+            return None
+        if not entry:
+            return None
+        if entry.get("expires_at", 0) <= time.time():
+            try:
+                self.store.delete(key)
+            except Exception as e:
+                logger.warning(f"Summary cache cleanup failed: {e}")
+            return None
+        return entry
+
+    def put(self, key: str, result: Dict[str, Any]):
+        if not self.enabled:
+            return
+        try:
+            self.store.put(key, {**result, "expires_at": time.time() + self.ttl})
+        except Exception as e:
+            logger.warning(f"Summary cache write failed: {e}")
@@ -0,0 +1,123 @@
+"""
+Compact transcript representation.
+Segments are stored as parallel start/duration arrays plus one text buffer with per-segment
+offsets, instead of a list of dicts. The text is assembled with a single join, so building
+a transcript is linear in its length even for multi-hour videos.
+"""
+
+import bisect
+from array import array
+from typing import Any, Iterable, Iterator, Optional, Union
+
+
+class Transcript:
+    __slots__ = ("text", "starts", "durations", "offsets")
+
+    def __init__(self, text: str = "", starts: Optional[array] = None, durations: Optional[array] = None, offsets: Optional[array] = None):
+        self.text = text
+        self.starts = starts if starts is not None else array("d")
+        self.durations = durations if durations is not None else array("d")
+        self.offsets = offsets if offsets is not None else array("q")  # Start of each segment in text
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Any]) -> "Transcript":
+        """Builds a transcript from youtube-transcript-api entries (dicts or objects with text/start/duration)."""
+        parts = []
+        starts, durations, offsets = array("d"), array("d"), array("q")
+        pos = 0
+        for entry in entries:
+            if isinstance(entry, dict):
+                text, start, duration = entry.get('text', ''), entry.get('start'), entry.get('duration')
+            else:
+                text, start, duration = getattr(entry, 'text', ''), getattr(entry, 'start', None), getattr(entry, 'duration', None)
+            text = text or ''
+            offsets.append(pos)
+            starts.append(float(start or 0.0))
+            durations.append(float(duration or 0.0))
+            parts.append(text)
+            pos += len(text) + 1  # Segments are joined with one space
+        return cls(" ".join(parts), starts, durations, offsets)
+
+    @classmethod
+    def from_text(cls, text: str) -> "Transcript":
+        """Wraps untimed text as a single segment starting at 0."""
+        return cls(text, array("d", [0.0]), array("d", [0.0]), array("q", [0]))
+
+    @classmethod
+    def coerce(cls, value: Union["Transcript", str]) -> "Transcript":
+        return value if isinstance(value, cls) else cls.from_text(value or "")
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __str__(self) -> str:
+        return self.text
+
+    @property
+    def duration(self) -> float:
+        if not self.starts:
+            return 0.0
+        return self.starts[-1] + self.durations[-1]
+
+    def _text_end(self, i: int) -> int:
+        """End offset (exclusive) of segments [..i), i.e. where segment i's text starts minus the separator."""
+        return self.offsets[i] - 1 if i < len(self) else len(self.text)
+
+    def segment(self, i: int):
+        """Returns (start, duration, text) of segment i."""
+        return self.starts[i], self.durations[i], self.text[self.offsets[i]:self._text_end(i + 1)]
+
+    def index_at(self, seconds: float) -> int:
+        """Index of the segment playing at the given time."""
+        return max(0, bisect.bisect_right(self.starts, seconds) - 1)
+
+    def slice_segments(self, i: int, j: int) -> "Transcript":
+        """Segments [i, j) as a new transcript sharing no state with this one."""
+        j = min(j, len(self))
+        if i >= j:
+            return Transcript()
+        base = self.offsets[i]
+        offsets = array("q", (o - base for o in self.offsets[i:j]))
+        return Transcript(self.text[base:self._text_end(j)], self.starts[i:j], self.durations[i:j], offsets)
+
+    def slice(self, start_seconds: float, end_seconds: Optional[float] = None) -> "Transcript":
+        """Segments starting within [start_seconds, end_seconds)."""
+        i = bisect.bisect_left(self.starts, start_seconds)
+        j = len(self) if end_seconds is None else bisect.bisect_left(self.starts, end_seconds)
+        return self.slice_segments(i, j)
+
+    def windows(self, seconds: float, max_chars: Optional[int] = None) -> Iterator["Transcript"]:
+        """
+        Splits the transcript into consecutive windows of about `seconds` each, on segment
+        boundaries. With max_chars, a window is cut early once its text would exceed that size.
+        """
+        n = len(self)
+        i = 0
+        while i < n:
+            j = bisect.bisect_left(self.starts, self.starts[i] + seconds, lo=i + 1)
+            if max_chars:
+                j = min(j, bisect.bisect_right(self.offsets, self.offsets[i] + max_chars, lo=i + 1))
+            yield self.slice_segments(i, max(j, i + 1))
+            i = max(j, i + 1)
+
+    def timing_bytes(self) -> bytes:
+        """Packs the timing arrays for storage; see from_storage."""
+        return self.starts.tobytes() + self.durations.tobytes() + self.offsets.tobytes()
+
+    @classmethod
+    def from_storage(cls, text: str, timing: Optional[bytes]) -> "Transcript":
+        if not timing:
+            return cls.from_text(text)
+        n = len(timing) // 24  # 8 bytes each for start, duration and offset
+        starts, durations, offsets = array("d"), array("d"), array("q")
+        starts.frombytes(timing[:8 * n])
+        durations.frombytes(timing[8 * n:16 * n])
+        offsets.frombytes(timing[16 * n:])
+        return cls(text, starts, durations, offsets)
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
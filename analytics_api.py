@@ -3,13 +3,18 @@ Analytics API for LangSmith Integration
 Provides endpoints to view token usage, costs, and LangSmith traces.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import Optional, List
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 from auth import verify_token
-from langsmith_config import token_tracker, langsmith_client, get_langsmith_url
+from langsmith_config import token_tracker, langsmith_client, trace_cache
+from pagination import MAX_PAGE_SIZE, clamp_limit
+from usage_store import COLUMNS as USAGE_COLUMNS
+import asyncio
+import csv
+import io
 import logging
 
 logger = logging.getLogger(__name__)
@@ -56,35 +61,86 @@ async def get_token_usage(
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized access")
     
-    summary = token_tracker.get_summary(user_id=user_id)
+    # Store reads are blocking SQLite queries, so they run in a worker thread
+    summary = await asyncio.to_thread(token_tracker.get_summary, user_id=user_id)
     return summary
 
 
+def parse_time_bound(name: str, value: Optional[str]) -> Optional[str]:
+    """Validates an ISO date/datetime query bound and normalizes it to the stored timestamp format."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO date or datetime")
+
+
 @router.get("/usage-history", response_model=List[UsageEntry])
 async def get_usage_history(
+    response: Response,
     user_id: str = Query(..., description="User ID to filter usage"),
-    limit: int = Query(100, description="Maximum number of entries to return"),
+    limit: int = Query(100, description=f"Maximum number of entries to return (at most {MAX_PAGE_SIZE})"),
+    since: Optional[str] = Query(None, description="Only entries at or after this ISO date/datetime"),
+    until: Optional[str] = Query(None, description="Only entries before this ISO date/datetime"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
     token_uid: str = Depends(verify_token)
 ):
     """
-    Get detailed usage history for a user.
+    Get detailed usage history for a user, newest first.
     
-    Returns list of all operations with token usage and costs.
+    Returns one page of operations with token usage and costs; the cursor for the next
+    page is sent in the X-Next-Cursor header.
+    """
+    if token_uid != user_id:
+        raise HTTPException(status_code=403, detail="Unauthorized access")
+    
+    try:
+        entries, next_cursor = await asyncio.to_thread(
+            token_tracker.page, user_id, clamp_limit(limit), cursor,
+            since=parse_time_bound("since", since),
+            until=parse_time_bound("until", until)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return entries
+
+
+@router.get("/usage-export")
+async def export_usage(
+    user_id: str = Query(..., description="User ID to export usage for"),
+    since: Optional[str] = Query(None, description="Only entries at or after this ISO date/datetime"),
+    until: Optional[str] = Query(None, description="Only entries before this ISO date/datetime"),
+    token_uid: str = Depends(verify_token)
+):
+    """
+    Download a user's usage history as CSV, newest first.
+    Rows are read from the store in batches and streamed, so exports of any size use constant memory.
     """
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized access")
     
-    # Filter by user_id
-    user_usage = [
-        entry for entry in token_tracker.usage_data
-        if entry.get("user_id") == user_id
-    ]
+    since, until = parse_time_bound("since", since), parse_time_bound("until", until)
     
-    # Sort by timestamp (newest first)
-    user_usage.sort(key=lambda x: x["timestamp"], reverse=True)
+    def rows():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=USAGE_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for i, entry in enumerate(token_tracker.iter_entries(user_id, since, until), 1):
+            writer.writerow(entry)
+            if i % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
     
-    # Limit results
-    return user_usage[:limit]
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="usage_{user_id}.csv"'}
+    )
 
 
 @router.get("/cost-breakdown")
@@ -99,41 +155,35 @@ async def get_cost_breakdown(
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized access")
     
-    # Calculate cutoff date
-    cutoff_date = datetime.now() - timedelta(days=days)
-    
-    # Filter usage data
-    filtered_usage = [
-        entry for entry in token_tracker.usage_data
-        if entry.get("user_id") == user_id
-        and datetime.fromisoformat(entry["timestamp"]) >= cutoff_date
-    ]
+    # Calculate cutoff date (rollups are per day, so whole days are counted)
+    cutoff_day = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
     
     # Breakdown by service
     by_service = {}
     by_model = {}
     daily_costs = {}
     
-    for entry in filtered_usage:
-        service = entry["service"]
-        model = entry["model"]
-        date = entry["timestamp"][:10]  # YYYY-MM-DD
-        cost = entry["cost_usd"]
-        tokens = entry["total_tokens"]
+    for bucket in await asyncio.to_thread(token_tracker.rollups, user_id, since_day=cutoff_day):
+        service = bucket["service"]
+        model = bucket["model"]
+        date = bucket["day"]  # YYYY-MM-DD
+        cost = bucket["cost_usd"]
+        tokens = bucket["total_tokens"]
+        operations = bucket["operations"]
         
         # By service
         if service not in by_service:
             by_service[service] = {"cost": 0.0, "tokens": 0, "operations": 0}
         by_service[service]["cost"] += cost
         by_service[service]["tokens"] += tokens
-        by_service[service]["operations"] += 1
+        by_service[service]["operations"] += operations
         
         # By model
         if model not in by_model:
             by_model[model] = {"cost": 0.0, "tokens": 0, "operations": 0}
         by_model[model]["cost"] += cost
         by_model[model]["tokens"] += tokens
-        by_model[model]["operations"] += 1
+        by_model[model]["operations"] += operations
         
         # Daily costs
         if date not in daily_costs:
@@ -179,26 +229,8 @@ async def get_langsmith_traces(
         }
     
     try:
-        # Get recent runs from LangSmith
-        # Filter by user_id in metadata
-        runs = langsmith_client.list_runs(
-            project_name="NexusAI",
-            limit=limit,
-            filter=f'eq(metadata.user_id, "{user_id}")'
-        )
-        
-        traces = []
-        for run in runs:
-            traces.append({
-                "run_id": str(run.id),
-                "name": run.name,
-                "run_type": run.run_type,
-                "start_time": run.start_time.isoformat() if run.start_time else None,
-                "end_time": run.end_time.isoformat() if run.end_time else None,
-                "status": run.status,
-                "trace_url": get_langsmith_url(str(run.id)),
-                "metadata": run.extra.get("metadata", {}) if run.extra else {}
-            })
+        # Served from the per-user trace cache; LangSmith is queried in a worker thread
+        traces = await trace_cache.get(user_id, limit)
         
         return {
             "enabled": True,
@@ -231,16 +263,10 @@ async def get_model_performance(
     if token_uid != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized access")
     
-    # Filter by user
-    user_usage = [
-        entry for entry in token_tracker.usage_data
-        if entry.get("user_id") == user_id
-    ]
-    
     # Group by model
     model_stats = {}
-    for entry in user_usage:
-        model = entry["model"]
+    for bucket in await asyncio.to_thread(token_tracker.rollups, user_id):
+        model = bucket["model"]
         if model not in model_stats:
             model_stats[model] = {
                 "total_tokens": 0,
@@ -250,11 +276,11 @@ async def get_model_performance(
                 "output_tokens": 0
             }
         
-        model_stats[model]["total_tokens"] += entry["total_tokens"]
-        model_stats[model]["total_cost"] += entry["cost_usd"]
-        model_stats[model]["request_count"] += 1
-        model_stats[model]["input_tokens"] += entry["input_tokens"]
-        model_stats[model]["output_tokens"] += entry["output_tokens"]
+        model_stats[model]["total_tokens"] += bucket["total_tokens"]
+        model_stats[model]["total_cost"] += bucket["cost_usd"]
+        model_stats[model]["request_count"] += bucket["operations"]
+        model_stats[model]["input_tokens"] += bucket["input_tokens"]
+        model_stats[model]["output_tokens"] += bucket["output_tokens"]
     
     # Calculate averages
     for model, stats in model_stats.items():
@@ -279,7 +305,7 @@ async def analytics_health():
     return {
         "status": "healthy",
         "langsmith_enabled": langsmith_client is not None,
-        "total_tracked_operations": len(token_tracker.usage_data)
+        "total_tracked_operations": await asyncio.to_thread(token_tracker.count)
     }
 
 
@@ -1,9 +1,19 @@
 import os
+import asyncio
+import hashlib
+import json
 import logging
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
 from fastapi import HTTPException, Security, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import firebase_admin
 from firebase_admin import credentials, auth
+from google.auth import jwt as google_jwt
 
 # Initialize Logging
 logger = logging.getLogger("Auth")
@@ -37,6 +47,150 @@ def initialize_firebase():
 # Initialize immediately on import attempt (optional, or call in startup)
 initialize_firebase()
 
+class VerifiedTokenCache:
+    """
+    Decoded ID tokens keyed by a SHA-256 of the raw token, kept until the token's own exp.
+    Clients poll with the same token many times, so repeat requests skip signature verification.
+    """
+    def __init__(self, max_items: int = 4096):
+        self.max_items = max_items
+        self.entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        with self.lock:
+            decoded = self.entries.get(key)
+            if decoded is None:
+                return None
+            if decoded.get("exp", 0) <= time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return decoded
+
+    def put(self, token: str, decoded: Dict[str, Any]):
+        if self.max_items <= 0 or decoded.get("exp", 0) <= time.time():
+            return
+        key = self._key(token)
+        with self.lock:
+            self.entries[key] = decoded
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_items:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+# AUTH_TOKEN_CACHE_SIZE=0 disables the cache
+verified_tokens = VerifiedTokenCache(max_items=int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "4096")))
+
+# x509 certificates Google signs Firebase ID tokens with
+GOOGLE_CERTS_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+class KeySetManager:
+    """
+    Keeps Google's token-signing certificates in memory and verifies ID tokens locally.
+    The certs are fetched once at startup and refreshed by a background timer shortly before
+    their Cache-Control max-age runs out, so requests never wait on the cert endpoint unless
+    every refresh has failed and the keys have expired. That inline refresh is single-flight:
+    concurrent requests wait for one fetch instead of each hitting the endpoint.
+    """
+    def __init__(self, certs_url: str = GOOGLE_CERTS_URL, refresh_margin: float = 300, retry_interval: float = 60,
+                 fetch: Optional[Callable[[str], Tuple[Dict[str, str], float]]] = None):
+        self.certs_url = certs_url
+        self.refresh_margin = refresh_margin
+        self.retry_interval = retry_interval
+        self.fetch = fetch or self.fetch_certs
+        self.certs: Dict[str, str] = {}
+        self.expires_at = 0.0
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.timer: Optional[threading.Timer] = None
+
+    @staticmethod
+    def fetch_certs(url: str) -> Tuple[Dict[str, str], float]:
+        """Returns ({kid: PEM certificate}, max-age seconds)."""
+        with urllib.request.urlopen(url, timeout=10) as response:
+            certs = json.loads(response.read())
+            match = re.search(r"max-age=(\d+)", response.headers.get("Cache-Control", ""))
+        return certs, float(match.group(1)) if match else 3600.0
+
+    def refresh(self):
+        certs, max_age = self.fetch(self.certs_url)
+        with self.lock:
+            self.certs = certs
+            self.expires_at = time.time() + max_age
+        logger.info(f"Loaded {len(certs)} token signing keys (valid for {int(max_age)}s)")
+        return max_age
+
+    def _scheduled_refresh(self):
+        try:
+            delay = max(self.retry_interval, self.refresh() - self.refresh_margin)
+        except Exception as e:
+            logger.warning(f"Token signing key refresh failed: {e}")
+            delay = self.retry_interval
+        self.timer = threading.Timer(delay, self._scheduled_refresh)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def start(self):
+        """Prefetches the keys in the background and keeps them refreshed."""
+        if self.timer is None:
+            self.timer = threading.Timer(0, self._scheduled_refresh)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def stop(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+
+    def _fresh_certs(self) -> Optional[Dict[str, str]]:
+        with self.lock:
+            if self.certs and self.expires_at > time.time():
+                return self.certs
+        return None
+
+    def get_certs(self) -> Dict[str, str]:
+        certs = self._fresh_certs()
+        if certs is not None:
+            return certs
+        # Background refresh has not kept up; fetch inline, once for all waiting requests
+        with self.refresh_lock:
+            certs = self._fresh_certs()
+            if certs is not None:
+                return certs
+            self.refresh()
+            return self.certs
+
+    def verify(self, id_token: str, project_id: str) -> Dict[str, Any]:
+        """Checks the signature and the claims Firebase requires of an ID token; raises ValueError if invalid."""
+        header = google_jwt.decode_header(id_token)
+        if header.get("alg") != "RS256" or not header.get("kid"):
+            raise ValueError("ID token has an invalid algorithm or no key id")
+        # Checks signature, exp/iat (with clock skew) and audience
+        decoded = google_jwt.decode(id_token, certs=self.get_certs(), audience=project_id, clock_skew_in_seconds=5)
+        if decoded.get("iss") != f"https://securetoken.google.com/{project_id}":
+            raise ValueError("ID token has an invalid issuer")
+        sub = decoded.get("sub")
+        if not isinstance(sub, str) or not sub or len(sub) > 128:
+            raise ValueError("ID token has an invalid subject")
+        decoded["uid"] = sub
+        return decoded
+
+# Local verification needs the Firebase project id. AUTH_LOCAL_VERIFY=false uses firebase_admin for every check.
+firebase_project_id = os.getenv("FIREBASE_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+local_verify = os.getenv("AUTH_LOCAL_VERIFY", "true").lower() == "true" and bool(firebase_project_id)
+key_set = KeySetManager(certs_url=os.getenv("AUTH_CERTS_URL", GOOGLE_CERTS_URL))
+if local_verify:
+    key_set.start()
+
 async def verify_token(request: Request, token: HTTPAuthorizationCredentials = Security(security)):
     """
     Verifies the Firebase ID token.
@@ -50,8 +204,15 @@ async def verify_token(request: Request, token: HTTPAuthorizationCredentials = S
         raise HTTPException(status_code=500, detail="Authentication configuration error.")
 
     try:
-        # Verify the ID token
-        decoded_token = auth.verify_id_token(token.credentials)
+        # Verify the ID token, unless this exact token was already verified and has not expired
+        decoded_token = verified_tokens.get(token.credentials)
+        if decoded_token is None:
+            # Both may fetch signing keys over the network, so they run in a worker thread
+            if local_verify:
+                decoded_token = await asyncio.to_thread(key_set.verify, token.credentials, firebase_project_id)
+            else:
+                decoded_token = await asyncio.to_thread(auth.verify_id_token, token.credentials)
+            verified_tokens.put(token.credentials, decoded_token)
         
         # Check if the user_id in request matches the token (Strict Isolation)
         # This requires reading form data or query params, which consumes the stream.
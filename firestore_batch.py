@@ -0,0 +1,111 @@
+"""
+Write batching for Firestore partial updates.
+Field updates to the same document within a short window are merged and committed
+together in a single WriteBatch, instead of one write per progress tick. If a batch
+fails, its documents are retried one by one and any that still fail are re-queued.
+"""
+
+import atexit
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from google.api_core.exceptions import NotFound
+
+logger = logging.getLogger("FirestoreBatch")
+
+# Firestore limit on writes per batch
+MAX_BATCH_WRITES = 500
+# Flushes a document may fail before its queued fields are dropped
+MAX_ATTEMPTS = 5
+
+
+class FirestoreWriteBatcher:
+    def __init__(self, client, window: float = 0.5):
+        self.client = client
+        self.window = window
+        self.pending: Dict[str, Tuple[Any, Dict[str, Any]]] = {}  # doc path -> (doc_ref, merged fields)
+        self.attempts: Dict[str, int] = {}  # doc path -> failed flushes so far
+        self.lock = threading.Lock()
+        self.timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+
+    def update(self, doc_ref, fields: Dict[str, Any]):
+        """Queues a partial update. Later values for the same field win."""
+        with self.lock:
+            _, merged = self.pending.setdefault(doc_ref.path, (doc_ref, {}))
+            merged.update(fields)
+            if self.window > 0 and not self.timer:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+        if self.window <= 0:
+            self.flush()
+
+    def pending_fields(self, doc_ref) -> Dict[str, Any]:
+        """Fields queued for a document but not yet committed (for read-your-writes)."""
+        with self.lock:
+            entry = self.pending.get(doc_ref.path)
+            return dict(entry[1]) if entry else {}
+
+    def discard(self, doc_ref):
+        """Drops queued updates for a document, e.g. because a full set() supersedes them."""
+        with self.lock:
+            self.pending.pop(doc_ref.path, None)
+            self.attempts.pop(doc_ref.path, None)
+
+    def flush(self):
+        """Commits all queued updates now."""
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+            entries = list(self.pending.values())
+            self.pending = {}
+        for i in range(0, len(entries), MAX_BATCH_WRITES):
+            chunk = entries[i:i + MAX_BATCH_WRITES]
+            try:
+                batch = self.client.batch()
+                for doc_ref, fields in chunk:
+                    batch.update(doc_ref, fields)
+                batch.commit()
+                logger.info(f"Committed batched update of {len(chunk)} document(s)")
+                self._succeeded(chunk)
+            except Exception as e:
+                # One bad document (e.g. deleted) fails the whole batch; isolate it
+                logger.warning(f"Batched Firestore update failed, retrying per document: {e}")
+                for doc_ref, fields in chunk:
+                    self._update_one(doc_ref, fields)
+
+    def _update_one(self, doc_ref, fields: Dict[str, Any]):
+        try:
+            doc_ref.update(fields)
+            self._succeeded([(doc_ref, fields)])
+        except NotFound:
+            logger.warning(f"Dropping queued update for missing document {doc_ref.path}")
+            self._succeeded([(doc_ref, fields)])
+        except Exception as e:
+            self._requeue(doc_ref, fields, e)
+
+    def _succeeded(self, entries):
+        with self.lock:
+            for doc_ref, _ in entries:
+                self.attempts.pop(doc_ref.path, None)
+
+    def _requeue(self, doc_ref, fields: Dict[str, Any], error: Exception):
+        """Puts failed fields back under any newer queued values and schedules another flush."""
+        with self.lock:
+            attempts = self.attempts.get(doc_ref.path, 0) + 1
+            if attempts >= MAX_ATTEMPTS:
+                self.attempts.pop(doc_ref.path, None)
+                logger.error(f"Giving up on update of {doc_ref.path} after {attempts} attempts: {error}")
+                return
+            self.attempts[doc_ref.path] = attempts
+            _, newer = self.pending.get(doc_ref.path, (doc_ref, {}))
+            self.pending[doc_ref.path] = (doc_ref, {**fields, **newer})
+            logger.warning(f"Re-queued update of {doc_ref.path} (attempt {attempts}): {error}")
+            if not self.timer:
+                # Back off with each failure; never retry inline
+                self.timer = threading.Timer(max(self.window, 0.5) * attempts, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
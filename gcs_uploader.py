@@ -0,0 +1,141 @@
+"""
+Write-behind uploads to Google Cloud Storage shared by the services.
+A bounded queue of uploads is drained by background workers with retries. Queued objects
+are either in-memory bytes or a spooled local file, and both stay readable through
+get_pending until their upload finishes, so callers can serve them before they reach GCS.
+An upload that still fails after its retries is never dropped: in-memory bytes are spilled to
+a temp file and the upload is queued again after a growing delay.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger("GCSUploader")
+
+# Upper bound on the wait before a failed upload is queued again
+MAX_REQUEUE_DELAY = 600.0
+
+
+class BackgroundUploader:
+    def __init__(self, bucket, max_pending: int = 16, workers: int = 2, retries: int = 3, backoff: float = 1.5, requeue_delay: float = 30.0):
+        self.bucket = bucket
+        self.retries = retries
+        self.backoff = backoff
+        self.requeue_delay = requeue_delay
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.pending = {}  # blob_name -> {"data": bytes or None, "path": str or None, "content_type": str}
+        self.lock = threading.Lock()
+        self.workers = []
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"gcs-uploader-{i}", daemon=True)
+            t.start()
+            self.workers.append(t)
+        atexit.register(self.flush)
+
+    def submit(self, blob_name: str, data: Optional[bytes] = None, path: Optional[str] = None, content_type: str = "application/octet-stream") -> bool:
+        """
+        Queues an upload of data or of the file at path; a queued path is deleted once uploaded.
+        Returns False if the queue is full (caller should upload inline).
+        """
+        with self.lock:
+            if blob_name in self.pending:
+                return True
+            self.pending[blob_name] = {"data": data, "path": path, "content_type": content_type}
+        try:
+            self.queue.put_nowait(blob_name)
+            return True
+        except queue.Full:
+            with self.lock:
+                self.pending.pop(blob_name, None)
+            return False
+
+    def is_pending(self, blob_name: str) -> bool:
+        with self.lock:
+            return blob_name in self.pending
+
+    def get_pending(self, blob_name: str) -> Optional[bytes]:
+        """Returns the content of an upload that has not finished yet, or None."""
+        with self.lock:
+            entry = self.pending.get(blob_name)
+            if not entry:
+                return None
+            data, path = entry["data"], entry["path"]
+        if data is not None:
+            return data
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            # The upload finished and removed the spooled file in the meantime
+            return None
+
+    def flush(self):
+        """Blocks until every queued upload has been attempted."""
+        self.queue.join()
+
+    def _worker(self):
+        while True:
+            blob_name = self.queue.get()
+            try:
+                with self.lock:
+                    entry = self.pending[blob_name]
+                try:
+                    self._upload(blob_name, entry)
+                except Exception as e:
+                    self._defer(blob_name, entry, e)
+                    continue
+                with self.lock:
+                    self.pending.pop(blob_name, None)
+                if entry["path"]:
+                    try:
+                        os.remove(entry["path"])
+                    except OSError:
+                        pass
+            finally:
+                self.queue.task_done()
+
+    def _defer(self, blob_name: str, entry: dict, error: Exception):
+        """Keeps a failed upload (and its only copy of the data) pending and queues it again later."""
+        failures = entry.get("failures", 0) + 1
+        if entry["data"] is not None:
+            try:
+                fd, path = tempfile.mkstemp(prefix="gcs_spill_")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(entry["data"])
+                with self.lock:
+                    entry["path"], entry["data"] = path, None
+            except OSError as e:
+                logger.warning(f"Could not spill {blob_name} to disk, keeping it in memory: {e}")
+        entry["failures"] = failures
+        delay = min(self.requeue_delay * 2 ** (failures - 1), MAX_REQUEUE_DELAY)
+        logger.error(
+            f"Background upload of {blob_name} failed after {self.retries} retries: {error}. "
+            f"Kept at {entry['path'] or 'memory'}; retrying in {delay:.0f}s"
+        )
+        timer = threading.Timer(delay, self.queue.put, args=(blob_name,))
+        timer.daemon = True
+        timer.start()
+
+    def _upload(self, blob_name: str, entry: dict):
+        attempt = 0
+        while True:
+            try:
+                blob = self.bucket.blob(blob_name)
+                if entry["data"] is not None:
+                    blob.upload_from_string(entry["data"], content_type=entry["content_type"])
+                else:
+                    blob.upload_from_filename(entry["path"], content_type=entry["content_type"])
+                logger.info(f"Uploaded gs://{self.bucket.name}/{blob_name} in background")
+                return
+            except Exception as e:
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"Upload of {blob_name} failed (attempt {attempt + 1}): {e}. Retrying...")
+                time.sleep(self.backoff ** attempt)
+                attempt += 1
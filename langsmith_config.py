@@ -4,8 +4,17 @@ Provides tracing, token tracking, and cost analysis for all LLM operations.
 """
 
 import os
+import asyncio
+import atexit
+import concurrent.futures
 import functools
-from typing import Optional, Dict, Any, Callable
+import json
+import queue
+import shutil
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
 from datetime import datetime
 import logging
 
@@ -13,6 +22,9 @@ import logging
 from langsmith import Client, traceable
 from langsmith.run_helpers import get_current_run_tree
 
+from pagination import encode_cursor, decode_cursor
+from usage_store import UsageStore
+
 logger = logging.getLogger(__name__)
 
 # Initialize LangSmith Client
@@ -228,12 +240,254 @@ def trace_async_llm_call(
     return decorator
 
 
+class FeedbackExporter:
+    """
+    Sends LangSmith feedback from a background thread so request handlers never wait on it.
+    Items are queued without blocking and sent in batches. When the queue is full they are
+    appended to a spill file (if configured) and replayed once the queue is idle, or dropped.
+    Pending items are flushed at interpreter exit.
+    
+    Args:
+        client: Anything with a create_feedback(**kwargs) method (a LangSmith Client or a test stub)
+        max_queue: Queue bound
+        batch_size: Maximum items sent per wake-up
+        flush_interval: Seconds the worker waits for more items before going idle
+        spill_path: JSONL file for overflow; None drops overflow instead
+    """
+    def __init__(
+        self,
+        client,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 2.0,
+        spill_path: Optional[str] = None
+    ):
+        self.client = client
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.lock = threading.Lock()
+        self.replay_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.worker: Optional[threading.Thread] = None
+        atexit.register(self.close)
+    
+    def submit(self, feedback: Dict[str, Any]) -> bool:
+        """Queues one create_feedback call. Returns False if it had to be dropped."""
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(feedback)
+            return True
+        except queue.Full:
+            pass
+        if self.spill_path:
+            try:
+                with self.lock, open(self.spill_path, "a") as f:
+                    f.write(json.dumps(feedback, default=str) + "\n")
+                self.spilled += 1
+                return True
+            except OSError as e:
+                logger.warning(f"Failed to spill LangSmith feedback: {e}")
+        self.dropped += 1
+        return False
+    
+    def _ensure_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            with self.lock:
+                if self.worker is None or not self.worker.is_alive():
+                    self.stopping.clear()
+                    self.worker = threading.Thread(target=self._run, name="langsmith-feedback", daemon=True)
+                    self.worker.start()
+    
+    def _take_batch(self, timeout: Optional[float]) -> List[Dict[str, Any]]:
+        try:
+            batch = [self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait()]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _send(self, batch: List[Dict[str, Any]]):
+        for feedback in batch:
+            try:
+                self.client.create_feedback(**feedback)
+                self.sent += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Failed to send feedback to LangSmith: {e}")
+    
+    def _replay_spill(self):
+        """
+        Sends spilled items once the queue has room to spare. The spill is appended to the replay
+        file, so a replay left behind by a crash is sent too; unparseable lines are skipped.
+        """
+        if not self.spill_path:
+            return
+        replay_path = self.spill_path + ".replay"
+        if not os.path.exists(self.spill_path) and not os.path.exists(replay_path):
+            return
+        with self.replay_lock:  # The worker and flush() must not replay the same file twice
+            with self.lock:
+                try:
+                    if os.path.exists(self.spill_path):
+                        with open(self.spill_path, "rb") as src, open(replay_path, "ab") as dst:
+                            shutil.copyfileobj(src, dst)
+                        os.remove(self.spill_path)
+                except OSError as e:
+                    logger.warning(f"Failed to read spilled LangSmith feedback: {e}")
+                    return
+            if not os.path.exists(replay_path):
+                return
+            batch = []
+            with open(replay_path) as f:
+                for n, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        batch.append(json.loads(line))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Skipping corrupt spilled feedback at {replay_path}:{n}: {e}")
+                        continue
+                    if len(batch) >= self.batch_size:
+                        self._send(batch)
+                        batch = []
+            if batch:
+                self._send(batch)
+            os.remove(replay_path)
+    
+    def _run(self):
+        while not self.stopping.is_set():
+            batch = self._take_batch(self.flush_interval)
+            if batch:
+                self._send(batch)
+            else:
+                self._replay_spill()
+    
+    def flush(self):
+        """Sends everything queued (and spilled) now, from the calling thread."""
+        while batch := self._take_batch(None):
+            self._send(batch)
+        self._replay_spill()
+    
+    def close(self, timeout: float = 5.0):
+        self.stopping.set()
+        self.flush()
+        if self.worker is not None:
+            self.worker.join(timeout)
+
+
+def create_feedback_exporter(client) -> Optional[FeedbackExporter]:
+    if not client:
+        return None
+    return FeedbackExporter(
+        client,
+        max_queue=int(os.getenv("LANGSMITH_FEEDBACK_QUEUE", "1000")),
+        batch_size=int(os.getenv("LANGSMITH_FEEDBACK_BATCH", "50")),
+        flush_interval=float(os.getenv("LANGSMITH_FEEDBACK_INTERVAL", "2.0")),
+        spill_path=os.getenv("LANGSMITH_FEEDBACK_SPILL") or None
+    )
+
+feedback_exporter = create_feedback_exporter(langsmith_client)
+
+
 class TokenTracker:
     """
     Track token usage and costs across all services.
+    Usage is persisted to the shared UsageStore, so every service process and restart sees the
+    same history; only a bounded ring buffer of recent entries is kept in memory.
+    Store writes and LangSmith feedback are both handed to background workers, so log_usage
+    never blocks on SQLite or the network; reads wait for this process's queued writes first.
     """
-    def __init__(self):
-        self.usage_data = []
+    def __init__(
+        self,
+        exporter: Optional[FeedbackExporter] = None,
+        store: Optional[UsageStore] = None,
+        recent_items: int = 1000
+    ):
+        self.recent = deque(maxlen=recent_items)
+        self.exporter = exporter
+        self.store = store
+    
+    @property
+    def usage_data(self) -> List[Dict[str, Any]]:
+        """All retained usage entries, oldest first."""
+        return self.entries()
+    
+    def entries(
+        self,
+        user_id: Optional[str] = None,
+        newest_first: bool = False,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Usage entries in time order, optionally for one user."""
+        if self.store:
+            self.store.flush()
+            return self.store.query(user_id=user_id, newest_first=newest_first, limit=limit)
+        data = [d for d in self.recent if user_id is None or d.get("user_id") == user_id]
+        if newest_first:
+            data.reverse()
+        return data[:limit] if limit is not None else data
+    
+    def page(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of a user's entries, newest first, and the cursor for the next page."""
+        if self.store:
+            self.store.flush()
+            return self.store.page(user_id, limit, cursor, since, until)
+        # The ring buffer is small and already in time order. The cursor holds the last timestamp
+        # returned and how many entries with that timestamp were returned.
+        entries = [
+            d for d in reversed(self.recent)
+            if d.get("user_id") == user_id
+            and (not since or d["timestamp"] >= since)
+            and (not until or d["timestamp"] < until)
+        ]
+        start = 0
+        after = decode_cursor(cursor)
+        if after:
+            while start < len(entries) and entries[start]["timestamp"] > after[0]:
+                start += 1
+            start += int(after[1] or 0)
+        end = start + limit
+        page = entries[start:end]
+        next_cursor = None
+        if end < len(entries) and page:
+            last = page[-1]["timestamp"]
+            next_cursor = encode_cursor(last, str(sum(1 for d in entries[:end] if d["timestamp"] == last)))
+        return page, next_cursor
+    
+    def iter_entries(
+        self,
+        user_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """A user's entries in range, newest first, without loading them all at once."""
+        if self.store:
+            self.store.flush()
+            return self.store.iter_events(user_id, since, until)
+        return iter(self.page(user_id, len(self.recent) + 1, None, since, until)[0])
+    
+    def count(self) -> int:
+        if self.store:
+            self.store.flush()
+            return self.store.count()
+        return len(self.recent)
     
     def log_usage(
         self,
@@ -264,68 +518,102 @@ class TokenTracker:
             "job_id": job_id
         }
         
-        self.usage_data.append(usage_entry)
-        
-        # Also send to LangSmith if available
-        if langsmith_client:
+        self.recent.append(usage_entry)
+        if self.store:
             try:
-                langsmith_client.create_feedback(
-                    run_id=job_id or "unknown",
-                    key="token_usage",
-                    score=total_tokens,
-                    value={
-                        "input_tokens": input_tokens,
-                        "output_tokens": output_tokens,
-                        "cost_usd": cost
-                    }
-                )
+                self.store.submit(usage_entry)
             except Exception as e:
-                logger.warning(f"Failed to send feedback to LangSmith: {e}")
+                logger.warning(f"Failed to persist token usage: {e}")
+        
+        # Also send to LangSmith if available (queued, sent by the exporter thread)
+        if self.exporter:
+            self.exporter.submit({
+                "run_id": job_id or "unknown",
+                "key": "token_usage",
+                "score": total_tokens,
+                "value": {
+                    "input_tokens": input_tokens,
+                    "output_tokens": output_tokens,
+                    "cost_usd": cost
+                }
+            })
         
         return usage_entry
     
+    def rollups(self, user_id: Optional[str] = None, since_day: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Usage aggregated per user x service x model x day (see UsageStore.rollups).
+        Without a store they are computed from the in-memory ring buffer.
+        """
+        if self.store:
+            self.store.flush()
+            return self.store.rollups(user_id=user_id, since_day=since_day)
+        buckets: Dict[tuple, Dict[str, Any]] = {}
+        for entry in self.entries(user_id):
+            day = entry["timestamp"][:10]
+            if since_day and day < since_day:
+                continue
+            key = (entry.get("user_id") or "", entry["service"], entry["model"], day)
+            bucket = buckets.setdefault(key, {
+                "user_id": key[0], "service": key[1], "model": key[2], "day": day,
+                "operations": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cost_usd": 0.0
+            })
+            bucket["operations"] += 1
+            for counter in ("input_tokens", "output_tokens", "total_tokens", "cost_usd"):
+                bucket[counter] += entry[counter]
+        return sorted(buckets.values(), key=lambda b: b["day"])
+    
     def get_summary(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Get usage summary, optionally filtered by user.
         """
-        filtered_data = self.usage_data
-        if user_id:
-            filtered_data = [d for d in self.usage_data if d.get("user_id") == user_id]
-        
-        if not filtered_data:
-            return {
-                "total_tokens": 0,
-                "total_cost_usd": 0.0,
-                "operations_count": 0
-            }
-        
-        total_tokens = sum(d["total_tokens"] for d in filtered_data)
-        total_cost = sum(d["cost_usd"] for d in filtered_data)
+        total_tokens = 0
+        total_cost = 0.0
+        operations = 0
         
         # Group by service
         by_service = {}
-        for entry in filtered_data:
-            service = entry["service"]
+        for bucket in self.rollups(user_id or None):
+            service = bucket["service"]
             if service not in by_service:
                 by_service[service] = {
                     "tokens": 0,
                     "cost": 0.0,
                     "count": 0
                 }
-            by_service[service]["tokens"] += entry["total_tokens"]
-            by_service[service]["cost"] += entry["cost_usd"]
-            by_service[service]["count"] += 1
+            by_service[service]["tokens"] += bucket["total_tokens"]
+            by_service[service]["cost"] += bucket["cost_usd"]
+            by_service[service]["count"] += bucket["operations"]
+            total_tokens += bucket["total_tokens"]
+            total_cost += bucket["cost_usd"]
+            operations += bucket["operations"]
         
         return {
             "total_tokens": total_tokens,
             "total_cost_usd": round(total_cost, 4),
-            "operations_count": len(filtered_data),
+            "operations_count": operations,
             "by_service": by_service
         }
 
 
+def create_usage_store() -> Optional[UsageStore]:
+    """Shared usage database; USAGE_DB_PATH= (empty) keeps usage in memory only."""
+    db_path = os.getenv("USAGE_DB_PATH", "usage.sqlite3")
+    if not db_path:
+        return None
+    try:
+        return UsageStore(db_path, retention_days=int(os.getenv("USAGE_RETENTION_DAYS", "90")))
+    except Exception as e:
+        logger.error(f"Failed to open usage store {db_path}: {e}. Usage will be kept in memory only.")
+        return None
+
+
 # Global token tracker
-token_tracker = TokenTracker()
+token_tracker = TokenTracker(
+    exporter=feedback_exporter,
+    store=create_usage_store(),
+    recent_items=int(os.getenv("USAGE_RECENT_ITEMS", "1000"))
+)
 
 
 def get_langsmith_url(run_id: str) -> str:
@@ -342,6 +630,119 @@ def get_langsmith_url(run_id: str) -> str:
     return f"https://smith.langchain.com/o/default/projects/p/{project_name}/r/{run_id}"
 
 
+class TraceIndexCache:
+    """
+    Per-user cache of recent LangSmith runs for the analytics dashboard.
+    Entries younger than ttl are served as is. Entries younger than stale_ttl are served
+    immediately while a worker thread refetches them (stale-while-revalidate). Only a missing
+    or fully expired entry makes the caller wait, and concurrent misses for the same user
+    share one list_runs call if it asks for at least as many runs. Fetches run in a thread pool, never on the event loop.
+    
+    Args:
+        client: Anything with list_runs(project_name=..., limit=..., filter=...) (a LangSmith Client or a test stub)
+    """
+    def __init__(
+        self,
+        client,
+        project_name: str = "NexusAI",
+        ttl: float = 30.0,
+        stale_ttl: float = 600.0,
+        max_users: int = 1000
+    ):
+        self.client = client
+        self.project_name = project_name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_users = max_users
+        self.entries: "OrderedDict[str, Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()  # user -> (fetched_at, limit, traces)
+        self.inflight: Dict[str, Tuple[int, concurrent.futures.Future]] = {}  # user -> (limit, future)
+        self.lock = threading.RLock()  # Re-entered when a fetch finishes before its done-callback is attached
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="langsmith-traces")
+        self.fetches = 0
+    
+    def _fetch(self, user_id: str, limit: int) -> List[Dict[str, Any]]:
+        started = time.time()
+        # Filter by user_id in metadata
+        runs = self.client.list_runs(
+            project_name=self.project_name,
+            limit=limit,
+            filter=f'eq(metadata.user_id, "{user_id}")'
+        )
+        traces = []
+        for run in runs:
+            traces.append({
+                "run_id": str(run.id),
+                "name": run.name,
+                "run_type": run.run_type,
+                "start_time": run.start_time.isoformat() if run.start_time else None,
+                "end_time": run.end_time.isoformat() if run.end_time else None,
+                "status": run.status,
+                "trace_url": get_langsmith_url(str(run.id)),
+                "metadata": run.extra.get("metadata", {}) if run.extra else {}
+            })
+        with self.lock:
+            self.fetches += 1
+            current = self.entries.get(user_id)
+            if current and current[0] > started and current[1] > limit:
+                # A larger fetch finished while this one ran; keep its fuller listing
+                return traces
+            self.entries[user_id] = (time.time(), limit, traces)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_users:
+                self.entries.popitem(last=False)
+        return traces
+    
+    def _start_fetch(self, user_id: str, limit: int) -> concurrent.futures.Future:
+        """
+        Starts a fetch for the user unless one with at least this limit is already running.
+        Call with the lock held.
+        """
+        running = self.inflight.get(user_id)
+        if running and running[0] >= limit:
+            return running[1]
+        future = self.executor.submit(self._fetch, user_id, limit)
+        self.inflight[user_id] = (limit, future)
+        future.add_done_callback(lambda f: self._finish_fetch(user_id, f))
+        return future
+    
+    def _finish_fetch(self, user_id: str, future: concurrent.futures.Future):
+        with self.lock:
+            running = self.inflight.get(user_id)
+            if running and running[1] is future:
+                del self.inflight[user_id]
+        if future.exception():
+            logger.warning(f"Failed to refresh LangSmith traces for {user_id}: {future.exception()}")
+    
+    async def get(self, user_id: str, limit: int) -> List[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry and entry[1] >= limit:
+                age = time.time() - entry[0]
+                if age < self.ttl:
+                    return entry[2][:limit]
+                if age < self.stale_ttl:
+                    self._start_fetch(user_id, max(limit, entry[1]))
+                    return entry[2][:limit]
+            future = self._start_fetch(user_id, limit)
+        traces = await asyncio.wrap_future(future)
+        return traces[:limit]
+    
+    def invalidate(self, user_id: Optional[str] = None):
+        with self.lock:
+            if user_id is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(user_id, None)
+
+
+trace_cache = TraceIndexCache(
+    langsmith_client,
+    project_name="NexusAI",
+    ttl=float(os.getenv("LANGSMITH_TRACE_TTL", "30")),
+    stale_ttl=float(os.getenv("LANGSMITH_TRACE_STALE_TTL", "600"))
+) if langsmith_client else None
+
+
 # Export main utilities
 __all__ = [
     "init_langsmith",
@@ -350,6 +751,9 @@ __all__ = [
     "calculate_cost",
     "token_tracker",
     "TokenTracker",
+    "FeedbackExporter",
     "get_langsmith_url",
-    "langsmith_client"
+    "langsmith_client",
+    "trace_cache",
+    "TraceIndexCache"
 ]
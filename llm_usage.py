@@ -0,0 +1,23 @@
+"""
+Token accounting helpers shared by the summarization services.
+Local token estimates (for chunking and single-shot vs map-reduce decisions) and the
+usage counts reported on generate_content responses.
+"""
+
+from typing import Tuple
+
+# Rough heuristic for Gemini text; use the model's count_tokens where accuracy matters
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def response_usage(response) -> Tuple[int, int, int]:
+    """Returns (input, output, total) token counts of a generate_content response, 0 if unavailable."""
+    try:
+        meta = response.usage_metadata
+        return int(meta.prompt_token_count or 0), int(meta.candidates_token_count or 0), int(meta.total_token_count or 0)
+    except Exception:
+        return 0, 0, 0
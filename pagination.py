@@ -0,0 +1,110 @@
+"""
+Cursor pagination helpers shared by the service databases.
+Jobs are listed newest first, ordered by (timestamp, job_id). The cursor is an
+opaque token holding the sort key of the last job on the previous page.
+"""
+
+import base64
+import bisect
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("Pagination")
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(timestamp: str, job_id: str) -> str:
+    """Encodes a (timestamp, job_id) sort key as an opaque, URL-safe cursor."""
+    raw = json.dumps([timestamp or "", job_id or ""]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Decodes a cursor produced by encode_cursor. Raises ValueError if it is malformed."""
+    if not cursor:
+        return None
+    try:
+        timestamp, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(timestamp), str(job_id)
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+class UserJobIndex:
+    """
+    Secondary index for the JSON databases: user_id -> jobs sorted by (timestamp, job_id).
+    Pages are served with a bisect on the cursor instead of a scan over every job.
+    """
+    def __init__(self, get_key: Callable[[Any], Tuple[str, str]], get_user: Callable[[Any], Optional[str]]):
+        self.get_key = get_key
+        self.get_user = get_user
+        self.keys: Dict[str, List[Tuple[str, str]]] = {}
+        self.items: Dict[str, List[Any]] = {}
+
+    def rebuild(self, jobs):
+        self.keys = {}
+        self.items = {}
+        for job in jobs:
+            self.add(job)
+
+    def add(self, job):
+        user_id = self.get_user(job)
+        key = self.get_key(job)
+        keys = self.keys.setdefault(user_id, [])
+        items = self.items.setdefault(user_id, [])
+        idx = bisect.bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            items[idx] = job  # Update in place
+        else:
+            keys.insert(idx, key)
+            items.insert(idx, job)
+
+    def remove(self, job):
+        user_id = self.get_user(job)
+        keys = self.keys.get(user_id, [])
+        key = self.get_key(job)
+        idx = bisect.bisect_left(keys, key)
+        if idx < len(keys) and keys[idx] == key:
+            del keys[idx]
+            del self.items[user_id][idx]
+
+    def page(self, user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+        """Returns (jobs newest first, next_cursor). next_cursor is None on the last page."""
+        keys = self.keys.get(user_id, [])
+        items = self.items.get(user_id, [])
+        after = decode_cursor(cursor)
+        end = bisect.bisect_left(keys, after) if after else len(keys)
+        start = max(0, end - limit)
+        page = items[start:end][::-1]
+        next_cursor = encode_cursor(*keys[start]) if start > 0 else None
+        return page, next_cursor
+
+
+def firestore_page(query, timestamp_field: str, limit: int, cursor: Optional[str] = None, fields: Optional[List[str]] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Runs a keyset-paginated Firestore query ordered by (timestamp_field, job_id) descending.
+    Needs a composite index on (user_id ASC, timestamp_field DESC, job_id DESC), see firestore.indexes.json.
+    If fields is given, only those fields are fetched (Firestore field mask).
+    """
+    after = decode_cursor(cursor)
+    if fields:
+        query = query.select(list(dict.fromkeys([*fields, timestamp_field, "job_id"])))
+    query = query.order_by(timestamp_field, direction="DESCENDING").order_by("job_id", direction="DESCENDING")
+    if after:
+        query = query.start_after({timestamp_field: after[0], "job_id": after[1]})
+    # Fetch one extra document to learn whether another page exists
+    docs = [doc.to_dict() for doc in query.limit(limit + 1).stream()]
+    if len(docs) <= limit:
+        return docs, None
+    docs = docs[:limit]
+    last = docs[-1]
+    return docs, encode_cursor(last.get(timestamp_field, ""), last.get("job_id", ""))
@@ -10,4 +10,11 @@ sys.modules["google.generativeai"] = MagicMock()
 # Set dummy env vars
 import os
 os.environ["GEMINI_API_KEY"] = "fake_key"
-os.environ["GOOGLE_CLOUD_PROJECT"] = "test-project"
\ No newline at end of file
+os.environ["GOOGLE_CLOUD_PROJECT"] = "test-project"
+# Response caches would carry results across tests that mock different upstream behaviour
+os.environ["TRANSCRIPT_CACHE_TTL"] = "0"
+os.environ["SUMMARY_CACHE_TTL"] = "0"
+# Token checks go through firebase_admin (patched in tests) instead of fetching Google's certs
+os.environ["AUTH_LOCAL_VERIFY"] = "false"
+# Keep token usage from tests out of the shared usage database
+os.environ["USAGE_DB_PATH"] = ":memory:"
@@ -0,0 +1,179 @@
+import pytest
+from unittest.mock import patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from auth import verify_token
+from analytics_api import router
+from langsmith_config import TokenTracker
+from usage_store import UsageStore
+
+app = FastAPI()
+app.include_router(router)
+app.dependency_overrides[verify_token] = lambda: "u1"
+client = TestClient(app)
+
+@pytest.fixture
+def tracker(tmp_path):
+    tracker = TokenTracker(store=UsageStore(str(tmp_path / "usage.sqlite3")))
+    with patch("analytics_api.token_tracker", tracker):
+        yield tracker
+
+def test_cost_breakdown_and_model_performance_from_rollups(tracker):
+    tracker.log_usage("Chat", "chat", "gemini-pro", 1_000_000, 0, user_id="u1")
+    tracker.log_usage("Chat", "chat", "gemini-pro", 0, 1_000_000, user_id="u1")
+    tracker.log_usage("ImageGeneration", "generate", "gemini-2.5-flash", 10, 10, user_id="u1")
+    tracker.log_usage("Chat", "chat", "gemini-pro", 5, 5, user_id="someone-else")
+
+    breakdown = client.get("/analytics/cost-breakdown", params={"user_id": "u1"}).json()
+    assert breakdown["total_operations"] == 3
+    assert breakdown["by_service"]["Chat"] == {"cost": 2.0, "tokens": 2_000_000, "operations": 2}
+    assert sum(breakdown["daily_costs"].values()) == breakdown["total_cost_usd"]
+
+    models = client.get("/analytics/model-performance", params={"user_id": "u1"}).json()["models"]
+    assert models["gemini-pro"]["request_count"] == 2
+    assert models["gemini-pro"]["avg_input_tokens"] == 500_000
+
+    usage = client.get("/analytics/token-usage", params={"user_id": "u1"}).json()
+    assert (usage["operations_count"], usage["total_cost_usd"]) == (3, 2.0)
+
+def test_usage_history_is_newest_first_and_limited(tracker):
+    for i in range(5):
+        tracker.log_usage("Chat", "chat", "gemini-pro", i, 0, user_id="u1", job_id=f"job{i}")
+    history = client.get("/analytics/usage-history", params={"user_id": "u1", "limit": 2}).json()
+    assert [e["job_id"] for e in history] == ["job4", "job3"]
+
+def test_analytics_rejects_other_users(tracker):
+    assert client.get("/analytics/token-usage", params={"user_id": "u2"}).status_code == 403
+
+def test_usage_history_range_and_cursor_pagination(tracker):
+    for day in range(1, 8):
+        tracker.store.append({"timestamp": f"2026-10-0{day}T12:00:00", "service": "Chat", "operation": "chat",
+                              "model": "gemini-pro", "input_tokens": day, "output_tokens": 0, "total_tokens": day,
+                              "cost_usd": 0.0, "user_id": "u1", "job_id": f"d{day}"})
+
+    params = {"user_id": "u1", "since": "2026-10-02", "until": "2026-10-07", "limit": 2}
+    seen = []
+    while True:
+        response = client.get("/analytics/usage-history", params=params)
+        assert response.status_code == 200
+        seen += [e["job_id"] for e in response.json()]
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert seen == ["d6", "d5", "d4", "d3", "d2"]
+
+    assert client.get("/analytics/usage-history", params={"user_id": "u1", "since": "yesterday"}).status_code == 400
+    assert client.get("/analytics/usage-history", params={"user_id": "u1", "cursor": "garbage"}).status_code == 400
+
+def test_usage_export_streams_csv(tracker):
+    import csv
+    import io
+
+    for i in range(2500):
+        tracker.log_usage("Chat", "chat", "gemini-pro", i, 0, user_id="u1", job_id=f"job{i}")
+    response = client.get("/analytics/usage-export", params={"user_id": "u1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 2500
+    assert rows[0]["job_id"] == "job2499" and rows[-1]["job_id"] == "job0"
+
+def test_in_memory_tracker_pages_the_ring_buffer():
+    tracker = TokenTracker(recent_items=10)
+    for i in range(5):
+        tracker.log_usage("Chat", "chat", "gemini-pro", i, 0, user_id="u1", job_id=f"job{i}")
+    first, cursor = tracker.page("u1", 3)
+    second, last_cursor = tracker.page("u1", 3, cursor)
+    assert [e["job_id"] for e in first + second] == ["job4", "job3", "job2", "job1", "job0"]
+    assert last_cursor is None
+
+def test_in_memory_cursor_handles_equal_timestamps():
+    tracker = TokenTracker(recent_items=10)
+    for i in range(5):
+        tracker.recent.append({"timestamp": "2026-10-01T00:00:00", "user_id": "u1", "job_id": f"job{i}"})
+    first, cursor = tracker.page("u1", 2)
+    second, cursor = tracker.page("u1", 2, cursor)
+    third, cursor = tracker.page("u1", 2, cursor)
+    assert [e["job_id"] for e in first + second + third] == ["job4", "job3", "job2", "job1", "job0"]
+    assert cursor is None
+
+class StubRunsClient:
+    """Stands in for the LangSmith client's list_runs."""
+    def __init__(self):
+        self.calls = 0
+        self.release = None
+
+    def list_runs(self, project_name, limit, filter):
+        from types import SimpleNamespace
+        if self.release:
+            self.release.wait(5)
+        self.calls += 1
+        return [SimpleNamespace(id=f"run{self.calls}-{i}", name="chat", run_type="llm", start_time=None, end_time=None,
+                                status="success", extra={"metadata": {"user_id": "u1"}}) for i in range(limit)]
+
+def test_langsmith_traces_are_cached_per_user():
+    from langsmith_config import TraceIndexCache
+
+    stub = StubRunsClient()
+    cache = TraceIndexCache(stub, ttl=60)
+    with patch("analytics_api.langsmith_client", stub), patch("analytics_api.trace_cache", cache):
+        first = client.get("/analytics/langsmith-traces", params={"user_id": "u1", "limit": 5}).json()
+        second = client.get("/analytics/langsmith-traces", params={"user_id": "u1", "limit": 3}).json()
+        larger = client.get("/analytics/langsmith-traces", params={"user_id": "u1", "limit": 10}).json()
+
+    assert first["count"] == 5 and second["count"] == 3
+    assert second["traces"][0]["run_id"] == first["traces"][0]["run_id"]
+    assert larger["count"] == 10
+    assert stub.calls == 2  # The larger page needed a refetch
+
+def test_trace_cache_serves_stale_while_revalidating():
+    import asyncio
+    import threading
+    import time
+    from langsmith_config import TraceIndexCache
+
+    stub = StubRunsClient()
+    cache = TraceIndexCache(stub, ttl=0.01, stale_ttl=60)
+    assert asyncio.run(cache.get("u1", 2))[0]["run_id"] == "run1-0"
+    time.sleep(0.02)
+
+    stub.release = threading.Event()
+    started = time.time()
+    stale = asyncio.run(cache.get("u1", 2))
+    assert stale[0]["run_id"] == "run1-0" and time.time() - started < 1  # Did not wait for the refresh
+    _, refresh = cache.inflight["u1"]
+    stub.release.set()
+    refresh.result(5)
+    cache.ttl = 60
+    assert asyncio.run(cache.get("u1", 2))[0]["run_id"] == "run2-0"
+    assert stub.calls == 2
+
+def test_trace_cache_does_not_share_smaller_inflight_fetch():
+    import asyncio
+    import threading
+    from langsmith_config import TraceIndexCache
+
+    stub = StubRunsClient()
+    stub.release = threading.Event()
+    cache = TraceIndexCache(stub, ttl=60)
+
+    async def scenario():
+        small = asyncio.ensure_future(cache.get("u1", 2))
+        await asyncio.sleep(0)
+        shared = asyncio.ensure_future(cache.get("u1", 1))
+        large = asyncio.ensure_future(cache.get("u1", 10))
+        await asyncio.sleep(0)
+        stub.release.set()
+        return await small, await shared, await large
+
+    small, shared, large = asyncio.run(scenario())
+    assert len(small) == 2 and len(shared) == 1
+    assert len(large) == 10  # Started its own fetch instead of waiting on the 2-run one
+    assert stub.calls == 2
+    assert cache.entries["u1"][1] == 10  # The larger listing stays cached
@@ -0,0 +1,154 @@
+import pytest
+from unittest.mock import MagicMock, patch
+import asyncio
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+import auth
+
+@pytest.fixture
+def firebase_ready():
+    auth.verified_tokens.clear()
+    with patch.object(auth.firebase_admin, "_apps", {"[DEFAULT]": MagicMock()}):
+        yield
+    auth.verified_tokens.clear()
+
+def call_verify(token):
+    return asyncio.run(auth.verify_token(MagicMock(), HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)))
+
+def test_verify_token_caches_until_exp(firebase_ready):
+    decoded = {"uid": "user1", "exp": time.time() + 3600}
+    with patch.object(auth.auth, "verify_id_token", return_value=decoded) as mock_verify:
+        assert call_verify("token-a") == "user1"
+        assert call_verify("token-a") == "user1"
+        assert call_verify("token-b") == "user1"
+    assert mock_verify.call_count == 2
+
+def test_verify_token_does_not_cache_expired_or_failed_tokens(firebase_ready):
+    with patch.object(auth.auth, "verify_id_token", return_value={"uid": "user1", "exp": time.time() - 1}) as mock_verify:
+        call_verify("old")
+        call_verify("old")
+    assert mock_verify.call_count == 2
+
+    with patch.object(auth.auth, "verify_id_token", side_effect=ValueError("bad signature")):
+        with pytest.raises(HTTPException) as exc:
+            call_verify("forged")
+    assert exc.value.status_code == 401
+
+def test_verified_token_cache_is_lru_bounded():
+    cache = auth.VerifiedTokenCache(max_items=2)
+    exp = time.time() + 60
+    for token in ("t1", "t2"):
+        cache.put(token, {"uid": token, "exp": exp})
+    cache.get("t1")
+    cache.put("t3", {"uid": "t3", "exp": exp})
+    assert cache.get("t2") is None
+    assert cache.get("t1")["uid"] == "t1"
+    assert "t1" not in "".join(cache.entries)  # keyed by hash, not the raw token
+
+@pytest.fixture(scope="module")
+def signing_key():
+    import datetime
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "test-signer")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+            .serial_number(1).not_valid_before(now - datetime.timedelta(days=1)).not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+    key_pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption())
+    return key_pem.decode(), cert.public_bytes(serialization.Encoding.PEM).decode()
+
+@pytest.fixture
+def certs_server(signing_key):
+    """Local stand-in for Google's cert endpoint."""
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            body = json.dumps({"kid1": signing_key[1]}).encode()
+            self.send_response(200)
+            self.send_header("Cache-Control", "public, max-age=1200, must-revalidate")
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/certs", hits
+    server.shutdown()
+
+def make_token(signing_key, **claims):
+    from google.auth import crypt, jwt
+
+    now = int(time.time())
+    payload = {"iss": "https://securetoken.google.com/proj", "aud": "proj", "sub": "user1", "iat": now, "exp": now + 3600}
+    payload.update(claims)
+    return jwt.encode(crypt.RSASigner.from_string(signing_key[0], key_id="kid1"), payload).decode()
+
+def test_key_set_verifies_locally_with_prefetched_keys(signing_key, certs_server):
+    url, hits = certs_server
+    key_set = auth.KeySetManager(certs_url=url)
+    key_set.start()
+    deadline = time.time() + 5
+    while not key_set.certs and time.time() < deadline:
+        time.sleep(0.01)
+    key_set.stop()
+
+    assert key_set.expires_at > time.time() + 1100
+    assert key_set.verify(make_token(signing_key), "proj")["uid"] == "user1"
+    assert key_set.verify(make_token(signing_key, sub="user2"), "proj")["uid"] == "user2"
+    assert len(hits) == 1  # Verification itself never went to the network
+
+    for bad in (make_token(signing_key, aud="other"), make_token(signing_key, iss="https://evil"), make_token(signing_key, sub="")):
+        with pytest.raises(ValueError):
+            key_set.verify(bad, "proj")
+
+def test_key_set_refetches_inline_when_keys_expired(signing_key):
+    fetch = MagicMock(return_value=({"kid1": signing_key[1]}, 0))
+    key_set = auth.KeySetManager(fetch=fetch)
+    key_set.verify(make_token(signing_key), "proj")
+    key_set.verify(make_token(signing_key), "proj")
+    assert fetch.call_count == 2
+
+def test_key_set_inline_refresh_is_single_flight(signing_key):
+    import threading
+
+    def fetch(url):
+        time.sleep(0.2)
+        return {"kid1": signing_key[1]}, 3600
+    key_set = auth.KeySetManager(fetch=MagicMock(side_effect=fetch))
+    token = make_token(signing_key)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(key_set.verify(token, "proj")["uid"])) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == ["user1"] * 5
+    assert key_set.fetch.call_count == 1
+
+def test_verify_token_uses_local_key_set(firebase_ready, signing_key):
+    key_set = auth.KeySetManager(fetch=MagicMock(return_value=({"kid1": signing_key[1]}, 3600)))
+    with patch.object(auth, "local_verify", True), patch.object(auth, "firebase_project_id", "proj"), \
+         patch.object(auth, "key_set", key_set), patch.object(auth.auth, "verify_id_token") as mock_remote:
+        assert call_verify(make_token(signing_key)) == "user1"
+    mock_remote.assert_not_called()
@@ -230,3 +230,219 @@ def test_approve_script_not_found(mock_db):
 def test_health_check_director():
     response = client.get("/health")
     assert response.status_code == 200
+
+def test_json_database_user_jobs_pagination(tmp_path):
+    from Director.database import JsonDatabase
+    from Director.models import MovieJob
+
+    db = JsonDatabase(str(tmp_path / "jobs.json"))
+    for i in range(5):
+        db.save_job(MovieJob(
+            job_id=f"job{i}", topic="t", status="completed", progress=100,
+            created_at=f"2025-01-0{i + 1}T00:00:00", user_id="u1",
+            model="veo", resolution="1080p", aspect_ratio="16:9"
+        ))
+    db.save_job(MovieJob(
+        job_id="other", topic="t", status="completed", progress=100,
+        created_at="2025-01-09T00:00:00", user_id="u2",
+        model="veo", resolution="1080p", aspect_ratio="16:9"
+    ))
+
+    page1, cursor = db.get_user_jobs_page("u1", limit=2)
+    assert [j.job_id for j in page1] == ["job4", "job3"]
+    page2, cursor = db.get_user_jobs_page("u1", limit=2, cursor=cursor)
+    assert [j.job_id for j in page2] == ["job2", "job1"]
+    page3, cursor = db.get_user_jobs_page("u1", limit=2, cursor=cursor)
+    assert [j.job_id for j in page3] == ["job0"]
+    assert cursor is None
+
+def test_my_jobs_paginated_sets_next_cursor(mock_db):
+    mock_db.get_user_jobs_page.return_value = ([], "next-token")
+    response = client.get("/my_jobs/u1?limit=10")
+    assert response.status_code == 200
+    assert response.headers["X-Next-Cursor"] == "next-token"
+    mock_db.get_user_jobs_page.assert_called_with("u1", limit=10, cursor=None)
+
+def test_my_jobs_invalid_cursor(mock_db):
+    mock_db.get_user_jobs_page.side_effect = ValueError("Invalid pagination cursor")
+    response = client.get("/my_jobs/u1?limit=10&cursor=garbage")
+    assert response.status_code == 400
+
+def test_job_summaries_skip_scenes(tmp_path):
+    from Director.database import JsonDatabase
+    from Director.models import MovieJob
+
+    db = JsonDatabase(str(tmp_path / "jobs.json"))
+    db.save_job(MovieJob(
+        job_id="j1", topic="Space", status="filming", progress=40,
+        created_at="2025-01-01T00:00:00", user_id="u1",
+        model="veo", resolution="1080p", aspect_ratio="16:9"
+    ))
+
+    summaries, cursor = db.get_user_job_summaries("u1")
+    assert cursor is None
+    assert summaries == [{
+        "job_id": "j1", "type": "director_movie", "topic": "Space", "status": "filming",
+        "progress": 40, "thumbnail": None, "created_at": "2025-01-01T00:00:00"
+    }]
+
+def test_firestore_summaries_use_field_mask():
+    from Director.database import FirestoreDatabase, SUMMARY_FIELDS
+
+    db = FirestoreDatabase.__new__(FirestoreDatabase)
+    db.collection = MagicMock()
+    query = db.collection.where.return_value
+    chained = query.select.return_value.order_by.return_value.order_by.return_value
+    doc = MagicMock()
+    doc.to_dict.return_value = {"job_id": "j1", "topic": "Space", "status": "completed", "progress": 100, "created_at": "2025"}
+    chained.limit.return_value.stream.return_value = [doc]
+
+    summaries, cursor = db.get_user_job_summaries("u1", limit=10)
+
+    selected = query.select.call_args[0][0]
+    assert set(selected) == set(SUMMARY_FIELDS)
+    assert "scenes" not in selected
+    assert summaries[0]["topic"] == "Space"
+    assert cursor is None
+
+def _movie_job(job_id, **kwargs):
+    from Director.models import MovieJob
+    fields = dict(
+        job_id=job_id, topic="t", status="filming", progress=0,
+        created_at="2025-01-01T00:00:00", user_id="u1",
+        model="veo", resolution="1080p", aspect_ratio="16:9"
+    )
+    fields.update(kwargs)
+    return MovieJob(**fields)
+
+def test_json_database_writes_one_file_per_job(tmp_path):
+    from Director.database import JsonDatabase
+
+    db = JsonDatabase(str(tmp_path / "jobs.json"))
+    db.save_job(_movie_job("a"))
+    db.save_job(_movie_job("b"))
+
+    assert sorted(os.listdir(tmp_path / "director_jobs.d")) == ["a.json", "b.json"]
+    reloaded = JsonDatabase(str(tmp_path / "jobs.json"))
+    assert set(reloaded.get_all_jobs()) == {"a", "b"}
+
+def test_json_database_debounces_progress_only_updates(tmp_path):
+    from Director.database import JsonDatabase
+
+    db = JsonDatabase(str(tmp_path / "jobs.json"), progress_debounce=60)
+    job = _movie_job("a")
+    db.save_job(job)
+
+    with patch.object(db, "_write_job", wraps=db._write_job) as write:
+        for p in (10, 20, 30):
+            job.progress = p
+            db.save_job(job)
+        write.assert_not_called()
+
+        db.flush()
+        write.assert_called_once()
+
+        job.status = "completed"
+        db.save_job(job)
+        assert write.call_count == 2
+
+    with open(tmp_path / "director_jobs.d" / "a.json") as f:
+        saved = json.load(f)
+    assert saved["progress"] == 30
+    assert saved["status"] == "completed"
+
+def test_json_database_migrates_legacy_file(tmp_path):
+    from Director.database import JsonDatabase
+
+    legacy = tmp_path / "jobs.json"
+    legacy.write_text(json.dumps({"old": _movie_job("old").model_dump()}))
+
+    db = JsonDatabase(str(legacy))
+
+    assert db.get_job("old") is not None
+    assert (tmp_path / "director_jobs.d" / "old.json").exists()
+    assert not legacy.exists()
+
+def test_json_database_keeps_unreadable_legacy_file(tmp_path):
+    from Director.database import JsonDatabase
+
+    # VideoGeneration's jobs.json is a list, not a Director job map
+    legacy = tmp_path / "jobs.json"
+    legacy.write_text(json.dumps([{"job_id": "video"}]))
+
+    db = JsonDatabase(str(legacy))
+
+    assert db.get_all_jobs() == {}
+    assert legacy.exists()
+    assert not (tmp_path / "jobs.json.migrated").exists()
+
+def test_json_database_debounced_write_uses_copy(tmp_path):
+    from Director.database import JsonDatabase
+
+    db = JsonDatabase(str(tmp_path / "jobs.json"), progress_debounce=60)
+    job = _movie_job("a")
+    db.save_job(job)
+
+    job.progress = 50
+    db.save_job(job)
+    # Later in-place changes that were never saved must not leak into the pending write
+    job.progress = 70
+    job.status = "failed"
+    db.flush()
+
+    with open(tmp_path / "director_jobs.d" / "a.json") as f:
+        saved = json.load(f)
+    assert saved["progress"] == 50
+    assert saved["status"] == "filming"
+
+def test_firestore_progress_updates_are_batched():
+    from Director.database import FirestoreDatabase
+    from firestore_batch import FirestoreWriteBatcher
+
+    db = FirestoreDatabase.__new__(FirestoreDatabase)
+    db.db = MagicMock()
+    db.collection = MagicMock()
+    doc_ref = db.collection.document.return_value
+    doc_ref.path = "nexus_director_jobs/j1"
+    db.batcher = FirestoreWriteBatcher(db.db, window=60)
+
+    db.update_job_fields("j1", {"status": "filming", "progress": 20})
+    db.update_job_fields("j1", {"progress": 30})
+
+    # Reads see queued updates before they are committed
+    doc_ref.get.return_value.exists = True
+    doc_ref.get.return_value.to_dict.return_value = _movie_job("j1", status="scripting").model_dump(mode="json")
+    assert db.get_job("j1").progress == 30
+    db.db.batch.assert_not_called()
+
+    db.batcher.flush()
+
+    batch = db.db.batch.return_value
+    batch.update.assert_called_once_with(doc_ref, {"status": "filming", "progress": 30})
+    batch.commit.assert_called_once()
+    doc_ref.set.assert_not_called()
+
+def test_firestore_batch_failure_retries_per_document():
+    from google.api_core.exceptions import NotFound
+    from firestore_batch import FirestoreWriteBatcher
+
+    client = MagicMock()
+    client.batch.return_value.commit.side_effect = RuntimeError("batch failed")
+    ok, gone, flaky = MagicMock(path="jobs/ok"), MagicMock(path="jobs/gone"), MagicMock(path="jobs/flaky")
+    gone.update.side_effect = NotFound("deleted")
+    flaky.update.side_effect = RuntimeError("unavailable")
+    batcher = FirestoreWriteBatcher(client, window=60)
+
+    batcher.update(ok, {"progress": 10})
+    batcher.update(gone, {"progress": 10})
+    batcher.update(flaky, {"status": "filming", "progress": 10})
+    batcher.flush()
+    batcher.timer.cancel()
+
+    ok.update.assert_called_once_with({"progress": 10})
+    # Missing documents are dropped; other failures are re-queued under newer values
+    batcher.update(flaky, {"progress": 20})
+    assert batcher.pending_fields(gone) == {}
+    assert batcher.pending_fields(flaky) == {"status": "filming", "progress": 20}
+    batcher.discard(flaky)
+
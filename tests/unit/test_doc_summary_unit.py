@@ -108,3 +108,371 @@ def test_analytics_auth_failure(mock_db):
     response = client.get("/analytics?user_id=u1")
     assert response.status_code in [401, 403] 
 
+
+def test_extraction_pool_preserves_order_across_processes():
+    import asyncio
+    from DocumentsSummarization.extraction import ExtractionPool
+    from DocumentsSummarization.extractors import extract_text_from_html
+
+    pool = ExtractionPool(max_workers=2, inline_max_bytes=0)
+    try:
+        docs = [f"<html><body><p>doc {i}</p></body></html>".encode() for i in range(4)]
+        results = asyncio.run(pool.map([(extract_text_from_html, d) for d in docs]))
+    finally:
+        pool.shutdown()
+
+    assert [r.strip() for r in results] == ["doc 0", "doc 1", "doc 2", "doc 3"]
+
+def test_extraction_pool_timeout_is_per_file():
+    import asyncio
+    import time
+    from DocumentsSummarization.extraction import ExtractionPool
+
+    def slow(data):
+        time.sleep(0.5)
+        return "late"
+
+    pool = ExtractionPool(timeout=0.1)
+    results = asyncio.run(pool.map([(slow, b"a"), (lambda data: data.decode(), b"fast")]))
+
+    assert isinstance(results[0], asyncio.TimeoutError)
+    assert results[1] == "fast"
+
+def test_extraction_pool_timeout_excludes_queue_time():
+    import asyncio
+    import concurrent.futures
+    import time
+    from DocumentsSummarization.extraction import ExtractionPool
+
+    def parse(data):
+        time.sleep(0.2)
+        return data.decode()
+
+    pool = ExtractionPool(max_workers=1, timeout=0.3, inline_max_bytes=0)
+    workers = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    with patch.object(pool, "_get_executor", return_value=workers):
+        results = asyncio.run(pool.map([(parse, f"doc{i}".encode()) for i in range(3)]))
+    workers.shutdown()
+
+    # Each file waits ~0.2s per file ahead of it, but only its own parse counts against the timeout
+    assert results == ["doc0", "doc1", "doc2"]
+
+def test_extraction_pool_recycle_terminates_workers():
+    import concurrent.futures
+    import time
+    from DocumentsSummarization.extraction import ExtractionPool
+
+    pool = ExtractionPool(max_workers=1)
+    executor = pool._get_executor()
+    hung = executor.submit(time.sleep, 60)
+    deadline = time.time() + 30
+    while not executor._processes and time.time() < deadline:
+        time.sleep(0.05)
+    workers = list(executor._processes.values())
+
+    pool._recycle(executor)
+
+    for process in workers:
+        process.join(10)
+        assert not process.is_alive()
+    with pytest.raises(concurrent.futures.process.BrokenProcessPool):
+        hung.result(10)
+    assert pool.executor is None
+
+def test_summarize_skips_timed_out_file(mock_genai, mock_db):
+    import asyncio
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value.text = "Summary"
+    mock_genai.GenerativeModel.return_value = mock_model
+
+    async def fake_run(func, source):
+        raise asyncio.TimeoutError()
+
+    with patch("DocumentsSummarization.backend.extraction_pool.run", side_effect=fake_run):
+        response = client.post(
+            "/summarize",
+            files=[
+                ('files', ('slow.docx', b'docx bytes', 'application/octet-stream')),
+                ('files', ('notes.txt', b'plain notes', 'text/plain')),
+            ]
+        )
+
+    assert response.status_code == 200
+    parts = mock_model.generate_content.call_args[0][0]
+    assert "plain notes" in parts
+    assert not any("slow.docx" in str(p) for p in parts)
+
+def test_text_cache_lru_and_disk_tier(tmp_path):
+    from DocumentsSummarization.cache import TextCache
+
+    cache = TextCache(cache_dir=str(tmp_path), max_memory_chars=10)
+    cache.put("a", "12345")
+    cache.put("b", "67890")
+    cache.put("c", "xyz")  # evicts "a" from memory
+
+    assert "a" not in cache.memory
+    # Still served from disk, then promoted back into memory
+    assert cache.get("a") == "12345"
+    assert "a" in cache.memory
+    assert TextCache(cache_dir=str(tmp_path)).get("b") == "67890"
+    assert cache.get("missing") is None
+
+def test_summarize_reuses_cached_extraction(mock_genai, mock_db, tmp_path):
+    from DocumentsSummarization.cache import TextCache
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value.text = "Summary"
+    mock_genai.GenerativeModel.return_value = mock_model
+
+    with patch("DocumentsSummarization.backend.extraction_cache", TextCache(cache_dir=str(tmp_path))), \
+         patch("DocumentsSummarization.backend.extract_text_from_xlsx", return_value="--- Sheet: S ---\n1, 2") as mock_extract:
+        for prompt in ("first", "second"):
+            response = client.post(
+                "/summarize",
+                files={'files': ('book.xlsx', b'xlsx bytes', 'application/octet-stream')},
+                data={"prompt": prompt}
+            )
+            assert response.status_code == 200
+
+    mock_extract.assert_called_once()
+    first_job, second_job = [c[0][0] for c in mock_db.save_job.call_args_list]
+    assert first_job["cache_hits"] == 0
+    assert second_job["cache_hits"] == 1
+    assert "--- Sheet: S ---\n1, 2" in mock_model.generate_content.call_args[0][0]
+
+def test_chunk_text_splits_on_sheet_boundaries():
+    from DocumentsSummarization.mapreduce import chunk_text, CHARS_PER_TOKEN
+
+    sheet = "--- Sheet: {} ---\n" + "\n".join(["a, b, c"] * 20)
+    text = "\n".join(sheet.format(name) for name in ("One", "Two", "Three"))
+    chunks = chunk_text(text, max_tokens=len(sheet) // CHARS_PER_TOKEN + 5)
+
+    assert len(chunks) == 3
+    assert [c.splitlines()[0] for c in chunks] == ["--- Sheet: One ---", "--- Sheet: Two ---", "--- Sheet: Three ---"]
+    # Oversized sections are still bounded
+    assert all(len(c) <= 20 * CHARS_PER_TOKEN for c in chunk_text("x" * 1000, max_tokens=20))
+
+def test_summarize_uses_map_reduce_for_large_input(mock_genai, mock_db, tmp_path):
+    from DocumentsSummarization.cache import TextCache
+
+    def fake_generate(parts):
+        result = MagicMock()
+        result.text = "partial" if parts[0].startswith("Summarize the following part") else "final"
+        result.usage_metadata.prompt_token_count = 10
+        result.usage_metadata.candidates_token_count = 2
+        result.usage_metadata.total_token_count = 12
+        return result
+
+    mock_model = MagicMock()
+    mock_model.generate_content.side_effect = fake_generate
+    mock_model.count_tokens.return_value.total_tokens = 5000
+    mock_genai.GenerativeModel.return_value = mock_model
+    body = "\n\n".join(f"Section {i}: " + "word " * 50 for i in range(10)).encode()
+
+    with patch("DocumentsSummarization.backend.SINGLE_SHOT_MAX_TOKENS", 100), \
+         patch("DocumentsSummarization.backend.CHUNK_TOKENS", 100), \
+         patch("DocumentsSummarization.backend.summary_cache", TextCache(cache_dir=str(tmp_path))):
+        for _ in range(2):
+            response = client.post("/summarize", files={'files': ('big.txt', body, 'text/plain')})
+            assert response.status_code == 200
+            assert response.json()["summary"] == "final"
+
+    first_job, second_job = [c[0][0] for c in mock_db.save_job.call_args_list]
+    assert first_job["strategy"] == "map_reduce"
+    assert first_job["chunks"] > 1
+    assert first_job["tokens"] == 12 * (first_job["chunks"] + 1)
+    # Partial summaries are reused; only the final reduce runs again
+    assert second_job["cache_hits"] == first_job["chunks"]
+    assert second_job["tokens"] == 12
+
+def _workbook_bytes(sheets):
+    import io
+    import openpyxl
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for title, rows in sheets.items():
+        ws = wb.create_sheet(title)
+        for row in rows:
+            ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+def test_extract_xlsx_streams_rows():
+    from DocumentsSummarization.extractors import extract_text_from_xlsx
+
+    data = _workbook_bytes({"Sales": [["region", "total"], ["north", 10], [None, None], ["south", 7]], "Empty": []})
+
+    assert extract_text_from_xlsx(data) == "--- Sheet: Sales ---\nregion, total\nnorth, 10\nsouth, 7\n--- Sheet: Empty ---"
+
+def test_extract_xlsx_samples_and_truncates_large_sheets():
+    from DocumentsSummarization.extractors import extract_text_from_xlsx, XLSX_HEAD_ROWS
+
+    data = _workbook_bytes({"Big": [[i, "value"] for i in range(1000)]})
+
+    sampled = extract_text_from_xlsx(data, max_rows_per_sheet=XLSX_HEAD_ROWS + 10).splitlines()
+    assert sampled[1].startswith("[Sampled:")
+    rows = sampled[2:]
+    assert len(rows) <= XLSX_HEAD_ROWS + 10
+    assert rows[:XLSX_HEAD_ROWS] == [f"{i}, value" for i in range(XLSX_HEAD_ROWS)]
+
+    truncated = extract_text_from_xlsx(data, max_cells=50)
+    assert truncated.endswith("[Truncated: workbook exceeds the extraction budget]")
+    assert len(truncated.splitlines()) == 27
+
+def test_spool_file_hashes_and_sniffs_while_streaming(tmp_path):
+    import base64
+    import hashlib
+    import io
+    from fastapi import HTTPException
+    from uploads import spool_file, CHUNK_SIZE
+
+    data = b"%PDF-1.4\n" + b"x" * (CHUNK_SIZE * 2 + 5)
+    with spool_file(io.BytesIO(data), "report.bin", "application/octet-stream", spool_dir=str(tmp_path)) as upload:
+        assert upload.size == len(data)
+        assert upload.sha256 == hashlib.sha256(data).hexdigest()
+        assert upload.mime_type == "application/pdf"
+        assert bytes(upload.memoryview()[:5]) == b"%PDF-"
+        assert upload.b64encode() == base64.b64encode(data).decode("ascii")
+        path = upload.path
+    assert not os.path.exists(path)
+
+    with pytest.raises(HTTPException) as exc:
+        spool_file(io.BytesIO(data), "big.pdf", max_bytes=CHUNK_SIZE, spool_dir=str(tmp_path))
+    assert exc.value.status_code == 413
+    assert os.listdir(tmp_path) == []
+
+def _pdf_bytes(pages, images=None):
+    import io
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+    for n, text in enumerate(pages):
+        page = writer.add_blank_page(612, 792)
+        resources = DictionaryObject()
+        content = b""
+        if text:  # None leaves the page without a text layer, like a scan
+            resources[NameObject("/Font")] = DictionaryObject({NameObject("/F1"): font})
+            content += f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        side = (images or {}).get(n)
+        if side:  # Gray image of side x side pixels
+            image = DecodedStreamObject()
+            image.set_data(b"\x80" * side * side)
+            image.update({
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Image"),
+                NameObject("/Width"): NumberObject(side),
+                NameObject("/Height"): NumberObject(side),
+                NameObject("/ColorSpace"): NameObject("/DeviceGray"),
+                NameObject("/BitsPerComponent"): NumberObject(8),
+            })
+            resources[NameObject("/XObject")] = DictionaryObject({NameObject("/Im1"): writer._add_object(image)})
+            content += b" q 400 0 0 400 100 100 cm /Im1 Do Q"
+        if content:
+            page[NameObject("/Resources")] = resources
+            stream = DecodedStreamObject()
+            stream.set_data(content)
+            page[NameObject("/Contents")] = writer._add_object(stream)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+def test_extract_pdf_segments_per_page():
+    from DocumentsSummarization.extractors import extract_pdf_segments
+
+    data = _pdf_bytes(["intro " * 50, "methods " * 40, None, "results " * 40])
+    segments = extract_pdf_segments(data)
+
+    assert [(s["kind"], s["pages"]) for s in segments] == [("text", [1, 2]), ("pdf", [3, 3]), ("text", [4, 4])]
+    assert segments[0]["text"].startswith("[Page 1]\nintro")
+    assert segments[1]["data"].startswith(b"%PDF")
+    assert extract_pdf_segments(_pdf_bytes([None, None])) == []
+
+def test_extract_pdf_segments_sends_image_heavy_pages_as_pdf():
+    from DocumentsSummarization.extractors import extract_pdf_segments
+
+    # Page 2 has a long caption but a large figure; page 3 only a small logo
+    data = _pdf_bytes(["intro " * 50, "caption " * 40, "results " * 40], images={1: 600, 2: 40})
+    segments = extract_pdf_segments(data)
+
+    assert [(s["kind"], s["pages"]) for s in segments] == [("text", [1, 1]), ("pdf", [2, 2]), ("text", [3, 3])]
+
+def test_summarize_pdf_sends_text_layer_and_reports_savings(mock_genai, mock_db, tmp_path):
+    from DocumentsSummarization.cache import TextCache
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value.text = "Summary"
+    mock_genai.GenerativeModel.return_value = mock_model
+
+    data = _pdf_bytes(["quarterly report " * 20, None])
+    with patch("DocumentsSummarization.backend.extraction_cache", TextCache(cache_dir=str(tmp_path))):
+        for _ in range(2):
+            response = client.post("/summarize", files={'files': ('report.pdf', data, 'application/pdf')})
+            assert response.status_code == 200
+
+    parts = mock_model.generate_content.call_args[0][0]
+    assert any(isinstance(p, str) and p.startswith("[Page 1]\nquarterly report") for p in parts)
+    native = [p for p in parts if isinstance(p, dict)]
+    assert len(native) == 1 and native[0]["data"] != data
+    first_job, second_job = [c[0][0] for c in mock_db.save_job.call_args_list]
+    assert (first_job["pdf_pages_text"], first_job["pdf_pages_native"]) == (1, 1)
+    assert first_job["pdf_tokens_saved"] == 258
+    # Segments, including the repacked native pages, come back from the cache
+    assert second_job["cache_hits"] == 1
+    assert second_job["pdf_pages_native"] == 1
+
+def test_summarize_stream_emits_progress_tokens_and_usage(mock_genai, mock_db):
+    import json
+
+    class FakeStream:
+        def __init__(self, texts):
+            self.chunks = [MagicMock(text=t) for t in texts]
+            self.usage_metadata = MagicMock(prompt_token_count=40, candidates_token_count=8, total_token_count=48)
+
+        def __iter__(self):
+            return iter(self.chunks)
+
+    mock_model = MagicMock()
+    mock_model.generate_content.return_value = FakeStream(["Part one. ", "Part two."])
+    mock_genai.GenerativeModel.return_value = mock_model
+
+    with patch("DocumentsSummarization.backend.extract_text_from_docx", return_value="docx text"):
+        response = client.post(
+            "/summarize/stream",
+            files=[
+                ('files', ('notes.txt', b'plain notes', 'text/plain')),
+                ('files', ('spec.docx', b'docx bytes for stream test', 'application/octet-stream')),
+                ('files', ('tool.exe', b'binary', 'application/octet-stream')),
+            ],
+            data={"user_id": "u1"}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    files = {f["filename"]: f["status"] for f in frames if f["event"] == "file"}
+    assert files["notes.txt"] == "ready"
+    assert files["tool.exe"] == "skipped"
+    assert files["spec.docx"] in ("extracted", "cached")
+    assert "".join(f["text"] for f in frames if f["event"] == "token") == "Part one. Part two."
+    assert frames[-1]["event"] == "usage"
+    assert frames[-1]["total_tokens"] == 48
+    assert mock_model.generate_content.call_args.kwargs["stream"] is True
+
+    saved_job = mock_db.save_job.call_args[0][0]
+    assert saved_job["status"] == "Success"
+    assert saved_job["tokens"] == 48
+
+def test_summarize_stream_sse_reports_errors(mock_genai, mock_db):
+    response = client.post(
+        "/summarize/stream",
+        files={'files': ('tool.exe', b'binary', 'application/octet-stream')},
+        data={"format": "sse"}
+    )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: error" in response.text
+    assert mock_db.save_job.call_args[0][0]["status"] == "Failed"
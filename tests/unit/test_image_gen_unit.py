@@ -334,3 +334,78 @@ def test_restore_old_image_success(mock_external_services):
     assert response.status_code == 200
     data = response.json()
     assert "image" in data
+
+
+# ========== WRITE-BEHIND STORAGE TESTS ==========
+
+def test_write_behind_storage_returns_url_before_upload():
+    """save_image returns immediately; bytes stay readable until the background upload completes."""
+    import base64
+    import threading
+    from ImageGeneration.storage import WriteBehindGoogleCloudStorage
+
+    release = threading.Event()
+    storage = WriteBehindGoogleCloudStorage("test-bucket", workers=1)
+    blob = MagicMock()
+    blob.upload_from_string.side_effect = lambda *a, **k: release.wait(5)
+    storage.uploader.bucket = MagicMock()
+    storage.uploader.bucket.blob.return_value = blob
+
+    path = storage.save_image(base64.b64encode(b"png-bytes").decode(), "job1")
+
+    assert path == "/image/gcs/job1.png"
+    assert storage.get_pending_image("job1.png") == b"png-bytes"
+
+    release.set()
+    storage.uploader.flush()
+    blob.upload_from_string.assert_called_once_with(b"png-bytes", content_type="image/png")
+    assert storage.get_pending_image("job1.png") is None
+
+
+def test_write_behind_storage_retries_failed_upload():
+    """Transient upload errors are retried in the background."""
+    import base64
+    from ImageGeneration.storage import WriteBehindGoogleCloudStorage
+
+    storage = WriteBehindGoogleCloudStorage("test-bucket", workers=1)
+    storage.uploader.backoff = 0
+    blob = MagicMock()
+    blob.upload_from_string.side_effect = [Exception("503"), None]
+    storage.uploader.bucket = MagicMock()
+    storage.uploader.bucket.blob.return_value = blob
+
+    storage.save_image(base64.b64encode(b"data").decode(), "job2")
+    storage.uploader.flush()
+
+    assert blob.upload_from_string.call_count == 2
+
+
+def test_write_behind_storage_keeps_upload_after_retries_exhausted():
+    """An upload that keeps failing is spilled to disk, stays readable and is queued again."""
+    import base64
+    import time
+    from ImageGeneration.storage import WriteBehindGoogleCloudStorage
+
+    storage = WriteBehindGoogleCloudStorage("test-bucket", workers=1)
+    storage.uploader.backoff = 0
+    storage.uploader.retries = 0
+    storage.uploader.requeue_delay = 0.5
+    blob = MagicMock()
+    blob.upload_from_string.side_effect = Exception("503")
+    storage.uploader.bucket = MagicMock()
+    storage.uploader.bucket.blob.return_value = blob
+
+    storage.save_image(base64.b64encode(b"data").decode(), "job3")
+    storage.uploader.flush()
+
+    assert storage.get_pending_image("job3.png") == b"data"
+    spilled = storage.uploader.pending["images/job3.png"]["path"]
+    assert spilled and os.path.exists(spilled)
+
+    for _ in range(100):
+        if not storage.uploader.is_pending("images/job3.png") and not os.path.exists(spilled):
+            break
+        time.sleep(0.05)
+    assert blob.upload_from_filename.called
+    assert not storage.uploader.is_pending("images/job3.png")
+    assert not os.path.exists(spilled)
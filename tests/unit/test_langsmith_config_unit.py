@@ -0,0 +1,156 @@
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+from langsmith_config import FeedbackExporter, TokenTracker
+
+class StubFeedbackClient:
+    """Stands in for the LangSmith API; create_feedback blocks until released."""
+    def __init__(self):
+        self.received = []
+        self.release = threading.Event()
+
+    def create_feedback(self, **kwargs):
+        self.release.wait(5)
+        self.received.append(kwargs)
+
+def test_log_usage_does_not_wait_for_langsmith():
+    stub = StubFeedbackClient()
+    exporter = FeedbackExporter(stub, flush_interval=0.05)
+    tracker = TokenTracker(exporter=exporter)
+
+    started = time.time()
+    for i in range(5):
+        tracker.log_usage("Chat", "chat", "gemini-pro", 10, 20, user_id="u1", job_id=f"job{i}")
+    assert time.time() - started < 1
+    assert stub.received == []
+
+    stub.release.set()
+    exporter.close()
+    assert sorted(f["run_id"] for f in stub.received) == [f"job{i}" for i in range(5)]
+    assert stub.received[0]["key"] == "token_usage"
+    assert stub.received[0]["value"]["input_tokens"] == 10
+    assert len(tracker.usage_data) == 5
+
+def test_exporter_drops_when_full_without_spill():
+    stub = StubFeedbackClient()
+    exporter = FeedbackExporter(stub, max_queue=1, batch_size=1, flush_interval=0.05)
+    results = [exporter.submit({"run_id": str(i), "key": "k", "score": i}) for i in range(10)]
+    assert results.count(False) == exporter.dropped > 0
+
+    stub.release.set()
+    exporter.close()
+    assert len(stub.received) == 10 - exporter.dropped
+
+def test_exporter_spills_overflow_and_replays_it(tmp_path):
+    stub = StubFeedbackClient()
+    spill_path = str(tmp_path / "feedback.jsonl")
+    exporter = FeedbackExporter(stub, max_queue=1, batch_size=1, flush_interval=0.05, spill_path=spill_path)
+    assert all(exporter.submit({"run_id": str(i), "key": "k", "score": i}) for i in range(10))
+    assert exporter.spilled > 0 and os.path.exists(spill_path)
+
+    stub.release.set()
+    exporter.close()
+    assert sorted(int(f["run_id"]) for f in stub.received) == list(range(10))
+    assert not os.path.exists(spill_path)
+
+def test_exporter_replay_skips_corrupt_lines_and_keeps_earlier_replay(tmp_path):
+    stub = StubFeedbackClient()
+    stub.release.set()
+    spill_path = str(tmp_path / "feedback.jsonl")
+    with open(spill_path + ".replay", "w") as f:  # Left behind by a crash mid-replay
+        f.write('{"run_id": "0", "key": "k", "score": 0}\n')
+    with open(spill_path, "w") as f:
+        f.write('{"run_id": "1", "key": "k", "score": 1}\n{"run_id": "2", "ke\n{"run_id": "3", "key": "k", "score": 3}\n')
+    exporter = FeedbackExporter(stub, batch_size=2, spill_path=spill_path)
+
+    exporter.flush()
+
+    assert sorted(f["run_id"] for f in stub.received) == ["0", "1", "3"]
+    assert not os.path.exists(spill_path) and not os.path.exists(spill_path + ".replay")
+
+def test_usage_is_shared_across_trackers_and_ring_buffer_is_bounded(tmp_path):
+    from usage_store import UsageStore
+
+    db_path = str(tmp_path / "usage.sqlite3")
+    chat = TokenTracker(store=UsageStore(db_path), recent_items=2)
+    images = TokenTracker(store=UsageStore(db_path), recent_items=2)
+    for i in range(3):
+        chat.log_usage("Chat", "chat", "gemini-pro", 10, 20, user_id="u1", job_id=f"c{i}")
+    images.log_usage("ImageGeneration", "generate", "gemini-pro", 5, 5, user_id="u2", job_id="i0")
+    chat.store.flush()  # Another process only sees chat's events once its writer has stored them
+
+    assert len(chat.recent) == 2
+    assert images.count() == 4
+    assert [e["job_id"] for e in images.entries("u1")] == ["c0", "c1", "c2"]
+    summary = TokenTracker(store=UsageStore(db_path)).get_summary(user_id="u1")
+    assert (summary["total_tokens"], summary["operations_count"]) == (90, 3)
+
+def test_usage_store_retention_and_range_query(tmp_path):
+    from usage_store import UsageStore
+
+    store = UsageStore(str(tmp_path / "usage.sqlite3"), retention_days=30)
+    base = {"service": "Chat", "operation": "chat", "model": "m", "input_tokens": 1, "output_tokens": 1,
+            "total_tokens": 2, "cost_usd": 0.0, "user_id": "u1", "job_id": None}
+    store.append({**base, "timestamp": "2000-01-01T10:00:00"})
+    store.append({**base, "timestamp": "2999-01-01T10:00:00"})
+    store.append({**base, "timestamp": "2999-01-02T10:00:00"})
+
+    assert [e["timestamp"][:10] for e in store.query("u1", since="2999-01-02")] == ["2999-01-02"]
+    assert store.query("u1", newest_first=True, limit=1)[0]["timestamp"].startswith("2999-01-02")
+    store.purge_expired()
+    assert store.count() == 2
+
+def test_rollups_are_maintained_per_user_service_model_day(tmp_path):
+    from usage_store import UsageStore
+
+    db_path = str(tmp_path / "usage.sqlite3")
+    tracker = TokenTracker(store=UsageStore(db_path))
+    tracker.log_usage("Chat", "chat", "gemini-pro", 100, 200, user_id="u1")
+    tracker.log_usage("Chat", "chat", "gemini-pro", 10, 20, user_id="u1")
+    tracker.log_usage("Chat", "chat", "gemini-3-pro-preview", 1, 1, user_id="u1")
+    tracker.log_usage("Chat", "chat", "gemini-pro", 5, 5)
+
+    buckets = tracker.rollups("u1")
+    assert len(buckets) == 2
+    pro = next(b for b in buckets if b["model"] == "gemini-pro")
+    assert (pro["operations"], pro["input_tokens"], pro["output_tokens"], pro["total_tokens"]) == (2, 110, 220, 330)
+    assert tracker.get_summary("u1")["by_service"]["Chat"]["count"] == 3
+
+    # Rollups for events written before they existed are rebuilt on open
+    store = UsageStore(db_path)
+    store.conn.execute("DELETE FROM usage_rollups")
+    store.conn.commit()
+    # Services starting side by side must not backfill twice
+    opened = []
+    threads = [threading.Thread(target=lambda: opened.append(UsageStore(db_path))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(opened) == 4
+    assert sum(b["operations"] for b in UsageStore(db_path).rollups()) == 4
+
+def test_log_usage_does_not_wait_for_the_store(tmp_path):
+    from usage_store import UsageStore
+
+    tracker = TokenTracker(store=UsageStore(str(tmp_path / "usage.sqlite3")))
+    with tracker.store.lock:  # Another writer holding the database
+        start = time.monotonic()
+        for i in range(5):
+            tracker.log_usage("Chat", "chat", "gemini-pro", 10, 20, user_id="u1", job_id=f"c{i}")
+        assert time.monotonic() - start < 0.5
+    assert [e["job_id"] for e in tracker.entries("u1")] == [f"c{i}" for i in range(5)]
+
+def test_in_memory_rollups_match_store(tmp_path):
+    from usage_store import UsageStore
+
+    memory, stored = TokenTracker(), TokenTracker(store=UsageStore(str(tmp_path / "usage.sqlite3")))
+    for tracker in (memory, stored):
+        tracker.log_usage("Chat", "chat", "gemini-pro", 100, 200, user_id="u1")
+        tracker.log_usage("ImageGeneration", "generate", "gemini-pro", 1, 2, user_id="u1")
+    assert memory.get_summary("u1") == stored.get_summary("u1")
+    assert memory.get_summary("nobody") == {"total_tokens": 0, "total_cost_usd": 0.0, "operations_count": 0, "by_service": {}}
@@ -4,6 +4,7 @@ from fastapi.testclient import TestClient
 from datetime import datetime
 import os
 import sys
+import threading
 
 # Ensure project root is in path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
@@ -134,7 +135,7 @@ def test_status_completed_and_persistence(mock_helpers):
     # Verify flow
     mock_helpers["download"].assert_called_with("op_success")
     mock_helpers["storage"].save_video.assert_called()
-    mock_helpers["db"].save_job.assert_called() # Should save updated status
+    mock_helpers["db"].update_job_fields.assert_called() # Should save updated status
     assert mock_job.status == "completed"
     assert mock_job.video_path == "gs://bucket/video.mp4"
 
@@ -147,3 +148,120 @@ def test_download_endpoint(mock_helpers):
     assert response.content == b"some_bytes"
     # It should also try to auto-save to storage as a backup
     mock_helpers["storage"].save_video.assert_called()
+
+def test_write_behind_storage_spools_path_uploads(tmp_path):
+    from VideoGeneration.storage import WriteBehindGoogleCloudStorage
+
+    storage = WriteBehindGoogleCloudStorage("test-bucket", workers=1)
+    storage.uploader.bucket = MagicMock()
+    source = tmp_path / "scene.mp4"
+    source.write_bytes(b"video_bytes")
+
+    release = threading.Event()
+    storage.uploader.bucket.blob.return_value.upload_from_filename.side_effect = lambda *a, **k: release.wait(5)
+
+    url = storage.save_video_from_path(str(source), "scene.mp4")
+    source.unlink()  # Caller may delete the source immediately
+
+    # Pending uploads are served through the read-through route
+    assert url == "/video/gcs/scene.mp4"
+    assert storage.get_pending_video("scene.mp4") == b"video_bytes"
+    release.set()
+    storage.uploader.flush()
+    storage.uploader.bucket.blob.assert_called_with("videos/scene.mp4")
+    storage.uploader.bucket.blob.return_value.upload_from_filename.assert_called_once()
+    assert storage.get_video_url("scene.mp4") == "https://storage.googleapis.com/test-bucket/videos/scene.mp4"
+
+def test_gcs_route_serves_pending_then_redirects():
+    from VideoGeneration.storage import WriteBehindGoogleCloudStorage
+
+    storage = WriteBehindGoogleCloudStorage.__new__(WriteBehindGoogleCloudStorage)
+    storage.bucket_name = "test-bucket"
+    storage.uploader = MagicMock()
+
+    with patch("VideoGeneration.backend.storage", storage):
+        storage.uploader.get_pending.return_value = b"queued_video"
+        response = client.get("/gcs/scene.mp4")
+        assert response.status_code == 200
+        assert response.content == b"queued_video"
+        storage.uploader.get_pending.assert_called_with("videos/scene.mp4")
+
+        storage.uploader.get_pending.return_value = None
+        response = client.get("/gcs/scene.mp4", follow_redirects=False)
+        assert response.status_code == 307
+        assert response.headers["location"] == "https://storage.googleapis.com/test-bucket/videos/scene.mp4"
+
+def test_image_to_video_passes_spooled_upload(mock_helpers):
+    seen = {}
+    def fake_i2v(prompt, image_bytes, model, image_upload=None, **kwargs):
+        seen["content"] = image_upload.read_bytes()
+        seen["path"] = image_upload.path
+        return {"operation_name": "op_image"}
+    mock_helpers["i2v"].side_effect = fake_i2v
+
+    files = {'image': ('test.jpg', b'fake_image_bytes', 'image/jpeg')}
+    response = client.post("/image_to_video", data={"prompt": "animate this"}, files=files)
+
+    assert response.status_code == 200
+    assert seen["content"] == b"fake_image_bytes"
+    assert not os.path.exists(seen["path"])  # Spooled file is removed after the call
+
+def test_image_to_video_rejects_oversized_upload(mock_helpers):
+    import functools
+    from uploads import spool_upload
+
+    with patch("VideoGeneration.backend.spool_upload", functools.partial(spool_upload, max_bytes=4)):
+        files = {'image': ('test.jpg', b'fake_image_bytes', 'image/jpeg')}
+        response = client.post("/image_to_video", data={"prompt": "animate this"}, files=files)
+
+    assert response.status_code == 413
+    mock_helpers["i2v"].assert_not_called()
+
+def test_encode_image_from_upload_matches_bytes(tmp_path):
+    import io
+    from uploads import spool_file
+    from VideoGeneration.helper import _encode_image
+
+    data = b"\x89PNG\r\n\x1a\n" + os.urandom(1024 * 1024)
+    with spool_file(io.BytesIO(data), "frame.png", spool_dir=str(tmp_path)) as upload:
+        assert _encode_image(None, upload) == _encode_image(data)
+    assert _encode_image(data)[1] == "image/png"
+    assert _encode_image(b"unknown")[1] == "image/jpeg"
+
+def test_firestore_summaries_select_progress():
+    from VideoGeneration.database import FirestoreDatabase, SUMMARY_FIELDS
+
+    db = FirestoreDatabase.__new__(FirestoreDatabase)
+    db.collection_ref = MagicMock()
+    query = db.collection_ref.where.return_value
+    chained = query.select.return_value.order_by.return_value.order_by.return_value
+    doc = MagicMock()
+    doc.to_dict.return_value = {"job_id": "j1", "prompt": "p", "status": "processing", "progress": 40, "created_at": "2025"}
+    chained.limit.return_value.stream.return_value = [doc]
+
+    summaries, _ = db.get_user_job_summaries("u1", limit=10)
+
+    assert set(query.select.call_args[0][0]) == set(SUMMARY_FIELDS)
+    assert "progress" in SUMMARY_FIELDS
+    assert summaries[0]["progress"] == 40
+
+def test_firestore_get_job_by_operation_sees_queued_fields():
+    from VideoGeneration.database import FirestoreDatabase
+    from firestore_batch import FirestoreWriteBatcher
+
+    db = FirestoreDatabase.__new__(FirestoreDatabase)
+    db.collection_ref = MagicMock()
+    db.batcher = FirestoreWriteBatcher(MagicMock(), window=60)
+    doc = MagicMock()
+    doc.reference.path = "video_jobs/j1"
+    doc.to_dict.return_value = {
+        "job_id": "j1", "user_id": "u1", "type": "text_to_video", "prompt": "p", "status": "pending",
+        "model": "veo", "created_at": "2025-01-01T00:00:00", "operation_name": "op1"
+    }
+    db.collection_ref.where.return_value.limit.return_value.stream.return_value = [doc]
+
+    db.batcher.update(doc.reference, {"status": "completed"})
+    db.batcher.timer.cancel()
+
+    assert db.get_job_by_operation("op1").status == "completed"
+
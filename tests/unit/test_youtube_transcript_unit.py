@@ -98,3 +98,248 @@ def test_health_check_transcript_endpoint():
     response = client.get("/transcript")
     assert response.status_code == 200
     assert "YouTube Transcript Service" in response.json()["status"]
+
+def test_transcript_cache_memory_and_sqlite_tiers(tmp_path):
+    from YoutubeTranscript.cache import TranscriptCache
+
+    db_path = str(tmp_path / "transcripts.sqlite3")
+    cache = TranscriptCache(db_path=db_path, max_items=1)
+    cache.put("vid1", "en", "first transcript")
+    cache.put("vid2", "en", "second transcript")  # evicts vid1 from memory
+
+    assert ("vid1", "en") not in cache.memory
+    assert cache.get("vid1", "en").transcript == "first transcript"
+    assert cache.get("vid1", "de") is None
+    # A new process sees the persisted entries
+    assert TranscriptCache(db_path=db_path).get("vid2", "en").transcript == "second transcript"
+
+    expired = TranscriptCache(db_path=str(tmp_path / "short.sqlite3"), ttl=0.01)
+    expired.put("vid1", "en", "stale")
+    import time
+    time.sleep(0.02)
+    assert expired.get("vid1", "en") is None
+
+def test_extract_transcript_details_uses_cache(mock_yt_api, tmp_path):
+    from YoutubeTranscript.backend import extract_transcript_details
+    from YoutubeTranscript.cache import TranscriptCache
+
+    mock_yt_api.get_transcript.return_value = [{"text": "cached words", "start": 0.0, "duration": 1.0}]
+    with patch("YoutubeTranscript.backend.transcript_cache", TranscriptCache(db_path=str(tmp_path / "t.sqlite3"))), \
+         patch("YoutubeTranscript.backend.youtube_api_key", None):
+        first = extract_transcript_details("https://www.youtube.com/watch?v=abc123")
+        second = extract_transcript_details("https://youtu.be/abc123")
+
+    assert first == second
+    assert "cached words" in first[0]
+    mock_yt_api.get_transcript.assert_called_once()
+
+def test_extract_transcript_details_negative_cache(mock_yt_api, tmp_path):
+    from youtube_transcript_api import TranscriptsDisabled
+    from YoutubeTranscript.backend import extract_transcript_details
+    from YoutubeTranscript.cache import TranscriptCache
+
+    mock_yt_api.get_transcript.side_effect = TranscriptsDisabled("nocaps")
+    with patch("YoutubeTranscript.backend.transcript_cache", TranscriptCache(db_path=str(tmp_path / "t.sqlite3"))), \
+         patch("YoutubeTranscript.backend.youtube_api_key", None):
+        for _ in range(2):
+            with pytest.raises(ValueError, match="captions"):
+                extract_transcript_details("https://www.youtube.com/watch?v=nocaps")
+
+    mock_yt_api.get_transcript.assert_called_once()
+
+def test_extract_transcript_details_does_not_cache_transient_errors(mock_yt_api, tmp_path):
+    from YoutubeTranscript.backend import extract_transcript_details
+    from YoutubeTranscript.cache import TranscriptCache
+
+    mock_yt_api.get_transcript.side_effect = [Exception("connection reset"), [{"text": "ok", "start": 0.0, "duration": 1.0}]]
+    with patch("YoutubeTranscript.backend.transcript_cache", TranscriptCache(db_path=str(tmp_path / "t.sqlite3"))), \
+         patch("YoutubeTranscript.backend.youtube_api_key", None):
+        with pytest.raises(ValueError):
+            extract_transcript_details("https://www.youtube.com/watch?v=flaky")
+        assert "ok" in extract_transcript_details("https://www.youtube.com/watch?v=flaky")[0]
+
+def test_transcript_from_entries_slicing_and_windows():
+    from YoutubeTranscript.transcript import Transcript, format_timestamp
+
+    entries = [{"text": f"line{i}", "start": i * 10.0, "duration": 10.0} for i in range(6)]
+    transcript = Transcript.from_entries(entries)
+
+    assert transcript.text == "line0 line1 line2 line3 line4 line5"
+    assert len(transcript) == 6 and transcript.duration == 60.0
+    assert transcript.segment(2) == (20.0, 10.0, "line2")
+    assert transcript.index_at(35.0) == 3
+    assert transcript.slice(20.0, 40.0).text == "line2 line3"
+    assert [w.text for w in transcript.windows(25.0)] == ["line0 line1 line2", "line3 line4 line5"]
+    assert [w.starts[0] for w in transcript.windows(60.0, max_chars=11)] == [0.0, 20.0, 40.0]
+    assert format_timestamp(3725) == "1:02:05"
+
+    restored = Transcript.from_storage(transcript.text, transcript.timing_bytes())
+    assert restored.segment(5) == transcript.segment(5)
+
+def test_transcript_cache_keeps_timings(tmp_path):
+    from YoutubeTranscript.cache import TranscriptCache
+    from YoutubeTranscript.transcript import Transcript
+
+    db_path = str(tmp_path / "transcripts.sqlite3")
+    transcript = Transcript.from_entries([{"text": "a", "start": 1.5, "duration": 2.0}, {"text": "b", "start": 4.0, "duration": 1.0}])
+    TranscriptCache(db_path=db_path).put("vid", "en", transcript)
+
+    cached = TranscriptCache(db_path=db_path).get("vid", "en")
+    assert cached.transcript == "a b"
+    assert list(cached.segments.starts) == [1.5, 4.0]
+
+def test_extract_transcript_details_timed(mock_yt_api):
+    from YoutubeTranscript.backend import extract_transcript_details
+
+    mock_yt_api.get_transcript.return_value = [{"text": "hello", "start": 0.0, "duration": 1.0}, {"text": "world", "start": 1.0, "duration": 1.0}]
+    with patch("YoutubeTranscript.backend.youtube_api_key", None):
+        transcript, video_id = extract_transcript_details("https://www.youtube.com/watch?v=timed1", timed=True)
+
+    assert video_id == "timed1"
+    assert transcript.text == "hello world"
+    assert list(transcript.starts) == [0.0, 1.0]
+
+def test_youtube_client_built_once_and_preflight_cached(mock_youtube_data_api):
+    from YoutubeTranscript.backend import captions_available, caption_checks, get_youtube_client
+
+    get_youtube_client.cache_clear()
+    caption_checks.clear()
+    captions = mock_youtube_data_api.return_value.captions.return_value
+    captions.list.return_value.execute.return_value = {"items": [{"id": "c1", "snippet": {"language": "en"}}]}
+
+    assert captions_available("vid1", "key") is True
+    assert captions_available("vid1", "key") is True
+    assert get_youtube_client("key") is get_youtube_client("key")
+
+    mock_youtube_data_api.assert_called_once()
+    assert mock_youtube_data_api.call_args.kwargs["static_discovery"] is True
+    captions.list.assert_called_once()
+    get_youtube_client.cache_clear()
+    caption_checks.clear()
+
+def test_extract_transcript_details_skips_preflight_by_default(mock_yt_api, mock_youtube_data_api):
+    from YoutubeTranscript.backend import extract_transcript_details
+
+    mock_yt_api.get_transcript.return_value = [{"text": "one fetch", "start": 0.0, "duration": 1.0}]
+    with patch("YoutubeTranscript.backend.youtube_api_key", "key"), \
+         patch("YoutubeTranscript.backend.CAPTIONS_PREFLIGHT", False):
+        transcript, _ = extract_transcript_details("https://www.youtube.com/watch?v=single1")
+
+    assert transcript == "one fetch"
+    mock_youtube_data_api.assert_not_called()
+    mock_yt_api.get_transcript.assert_called_once()
+
+def test_long_transcript_uses_chaptered_map_reduce(mock_genai, mock_extract_transcript, mock_db):
+    from YoutubeTranscript.transcript import Transcript
+
+    entries = [{"text": f"sentence {i}", "start": i * 60.0, "duration": 60.0} for i in range(30)]
+    mock_extract_transcript.return_value = (Transcript.from_entries(entries), "long1")
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value.text = "summary"
+
+    with patch("YoutubeTranscript.backend.TRANSCRIPT_SINGLE_SHOT_TOKENS", 10), \
+         patch("YoutubeTranscript.backend.TRANSCRIPT_WINDOW_SECONDS", 600):
+        response = client.post("/transcript", data={"url": "https://www.youtube.com/watch?v=long1"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [c["start"] for c in data["chapters"]] == ["0:00", "10:00", "20:00"]
+    assert data["chapters"][-1]["end"] == "30:00"
+    # Three windows plus the reduce step
+    assert mock_model.generate_content.call_count == 4
+
+def test_chaptered_summarizer_reuses_window_summaries_across_models(tmp_path):
+    import asyncio
+    from YoutubeTranscript.cache import TranscriptCache
+    from YoutubeTranscript.summarizer import ChapteredSummarizer
+    from YoutubeTranscript.transcript import Transcript
+
+    transcript = Transcript.from_entries([{"text": f"part {i}", "start": i * 300.0, "duration": 300.0} for i in range(4)])
+    cache = TranscriptCache(db_path=str(tmp_path / "t.sqlite3"))
+    first_model, second_model = MagicMock(), MagicMock()
+    first_model.generate_content.return_value.text = "window summary"
+    second_model.generate_content.return_value.text = "final"
+
+    asyncio.run(ChapteredSummarizer(first_model, cache=cache).summarize(transcript))
+    second = ChapteredSummarizer(second_model, cache=cache)
+    assert asyncio.run(second.summarize(transcript)) == "final"
+
+    assert first_model.generate_content.call_count == 3  # Two windows plus reduce
+    assert second.cache_hits == 2
+    second_model.generate_content.assert_called_once()
+
+def test_summary_cache_hit_is_zero_token_job(mock_genai, mock_extract_transcript, mock_db, tmp_path):
+    from YoutubeTranscript.summary_cache import SummaryCache, SqliteSummaryStore
+
+    mock_extract_transcript.return_value = ("Some transcript", "cached1")
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value.text = "Fresh summary"
+    mock_model.generate_content.return_value.usage_metadata.total_token_count = 42
+
+    cache = SummaryCache(SqliteSummaryStore(str(tmp_path / "summaries.sqlite3")))
+    with patch("YoutubeTranscript.backend.summary_cache", cache):
+        first = client.post("/transcript", data={"url": "https://www.youtube.com/watch?v=cached1"})
+        second = client.post("/transcript", data={"url": "https://www.youtube.com/watch?v=cached1"})
+        other_model = client.post("/transcript", data={"url": "https://www.youtube.com/watch?v=cached1", "model": "gemini-pro"})
+
+    assert first.json()["summary"] == second.json()["summary"] == "Fresh summary"
+    assert other_model.status_code == 200
+    assert mock_model.generate_content.call_count == 2
+    jobs = [c.args[0] for c in mock_db.save_job.call_args_list]
+    assert (jobs[0]["tokens"], jobs[0]["cache_hit"]) == (42, False)
+    assert (jobs[1]["tokens"], jobs[1]["cache_hit"], jobs[1]["status"]) == (0, True, "Success")
+
+def test_summary_cache_deletes_expired_entries():
+    import time
+    from YoutubeTranscript.summary_cache import SummaryCache, FirestoreSummaryStore
+
+    store = FirestoreSummaryStore.__new__(FirestoreSummaryStore)
+    store.db = MagicMock()
+    store.collection = "youtube_summary_cache"
+    doc_ref = store.db.collection.return_value.document.return_value
+    cache = SummaryCache(store, ttl=60)
+
+    cache.put("k1", {"summary": "s"})
+    written = doc_ref.set.call_args.args[0]
+    assert written["expire_at"].timestamp() == pytest.approx(written["expires_at"])  # TTL policy field
+
+    doc_ref.get.return_value.exists = True
+    doc_ref.get.return_value.to_dict.return_value = {**written, "expires_at": time.time() - 1}
+    assert cache.get("k1") is None
+    doc_ref.delete.assert_called_once()
+
+def test_batch_endpoint_streams_per_video_and_records_one_job(mock_genai, mock_extract_transcript, mock_db):
+    import json
+
+    def fake_extract(url, language="en", timed=False):
+        if "bad" in url:
+            raise ValueError("No captions")
+        return f"transcript of {url}", url.split("v=")[1]
+
+    mock_extract_transcript.side_effect = fake_extract
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value.text = "summary"
+    mock_model.generate_content.return_value.usage_metadata.total_token_count = 10
+
+    response = client.post("/transcript/batch", data={"urls": [
+        "https://www.youtube.com/watch?v=one", "https://www.youtube.com/watch?v=bad", "https://www.youtube.com/watch?v=two"
+    ], "user_id": "u1"})
+
+    assert response.status_code == 200
+    lines = [json.loads(l) for l in response.text.splitlines()]
+    videos = sorted((l for l in lines if l["type"] == "video"), key=lambda l: l["index"])
+    assert [v["status"] for v in videos] == ["Success", "Failed", "Success"]
+    assert videos[0]["summary"] == "summary" and "transcript" not in videos[0]
+    assert lines[-1] == {"type": "done", "videos": 3, "succeeded": 2, "failed": 1, "cache_hits": 0, "tokens": 20}
+
+    mock_db.save_job.assert_called_once()
+    job = mock_db.save_job.call_args.args[0]
+    assert (job["type"], job["status"], job["tokens"], job["videos"]) == ("TranscriptBatch", "Partial", 20, 3)
+
+def test_batch_endpoint_validates_input(mock_db):
+    assert client.post("/transcript/batch", data={}).status_code == 400
+    with patch("YoutubeTranscript.backend.youtube_api_key", None):
+        assert client.post("/transcript/batch", data={"playlist_id": "PL123"}).status_code == 400
+    with patch("YoutubeTranscript.backend.BATCH_MAX_VIDEOS", 1):
+        urls = ["https://youtu.be/a", "https://youtu.be/b"]
+        assert client.post("/transcript/batch", data={"urls": urls}).status_code == 400
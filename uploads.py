@@ -0,0 +1,165 @@
+"""
+Upload ingestion shared by the services.
+Uploads are copied to a temp file in fixed-size chunks while the SHA-256 is computed and
+the MIME type is sniffed from the leading bytes, so inspecting an upload never requires
+holding all of it in memory. Consumers get a path, a file handle or a memoryview.
+"""
+
+import base64
+import hashlib
+import logging
+import mimetypes
+import mmap
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger("Uploads")
+
+CHUNK_SIZE = 1024 * 1024
+# Matches client_max_body_size in nginx.conf
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+# Leading-byte signatures, checked in order
+SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"PK\x03\x04", "application/zip"),
+]
+
+
+def sniff_mime(head: bytes, filename: Optional[str] = None, declared: Optional[str] = None) -> str:
+    """Guesses the MIME type from the first bytes of a file, falling back to the name and the declared type."""
+    guessed = mimetypes.guess_type(filename)[0] if filename else None
+    for magic, mime in SIGNATURES:
+        if head.startswith(magic):
+            # docx/pptx/xlsx are zip containers; the extension tells them apart
+            if mime == "application/zip" and guessed and guessed.startswith("application/vnd.openxmlformats"):
+                return guessed
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        return "video/quicktime" if head[8:10] == b"qt" else "video/mp4"
+    return guessed or declared or "application/octet-stream"
+
+
+class SpooledUpload:
+    """An upload copied to a temp file. Delete it with close() or use it as a context manager."""
+    def __init__(self, path: str, filename: Optional[str], size: int, sha256: str, mime_type: str):
+        self.path = path
+        self.filename = filename
+        self.size = size
+        self.sha256 = sha256
+        self.mime_type = mime_type
+        self._mmap = None
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def read_bytes(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+    def memoryview(self) -> memoryview:
+        """Read-only view of the file backed by mmap, valid until close()."""
+        if self.size == 0:
+            return memoryview(b"")
+        if self._mmap is None:
+            with self.open() as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def b64encode(self) -> str:
+        """Base64 of the file, encoded chunk by chunk so the raw bytes are never fully in memory."""
+        parts = []
+        with self.open() as f:
+            # Chunk length must be a multiple of 3 so the pieces concatenate without padding
+            while chunk := f.read(CHUNK_SIZE - CHUNK_SIZE % 3):
+                parts.append(base64.b64encode(chunk).decode("ascii"))
+        return "".join(parts)
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                logger.warning(f"Upload {self.path} still has live memoryviews; leaving mapping open")
+            self._mmap = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _Spooler:
+    def __init__(self, filename, max_bytes, spool_dir):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        suffix = os.path.splitext(filename or "")[1]
+        fd, self.path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=spool_dir)
+        self.out = os.fdopen(fd, "wb")
+        self.digest = hashlib.sha256()
+        self.head = b""
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.abort()
+            raise HTTPException(status_code=413, detail=f"Upload {self.filename or ''} exceeds the {self.max_bytes // (1024 * 1024)}MB limit.")
+        if len(self.head) < 16:
+            self.head += chunk[:16 - len(self.head)]
+        self.digest.update(chunk)
+        self.out.write(chunk)
+
+    def abort(self):
+        self.out.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def finish(self, declared_type) -> SpooledUpload:
+        self.out.close()
+        mime = sniff_mime(self.head, self.filename, declared_type)
+        return SpooledUpload(self.path, self.filename, self.size, self.digest.hexdigest(), mime)
+
+
+def spool_file(src: BinaryIO, filename: Optional[str] = None, declared_type: Optional[str] = None, max_bytes: int = MAX_UPLOAD_BYTES, spool_dir: Optional[str] = None) -> SpooledUpload:
+    """Spools a readable binary stream. For use from sync handlers."""
+    spooler = _Spooler(filename, max_bytes, spool_dir)
+    try:
+        while chunk := src.read(CHUNK_SIZE):
+            spooler.write(chunk)
+    except HTTPException:
+        raise
+    except Exception:
+        spooler.abort()
+        raise
+    return spooler.finish(declared_type)
+
+
+async def spool_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES, spool_dir: Optional[str] = None) -> SpooledUpload:
+    """Spools a FastAPI UploadFile without blocking the event loop on the whole body."""
+    spooler = _Spooler(upload.filename, max_bytes, spool_dir)
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            spooler.write(chunk)
+    except HTTPException:
+        raise
+    except Exception:
+        spooler.abort()
+        raise
+    return spooler.finish(upload.content_type)
@@ -0,0 +1,268 @@
+"""
+Persistent token usage store shared by the service processes.
+Usage events are appended to one SQLite file in WAL mode, so the services running side by
+side (see start.sh) write to it concurrently and readers see every process's usage. Events
+are partitioned by day; partitions older than the retention window are deleted.
+Per user x service x model x day rollups are updated in the same transaction as each insert,
+so dashboards read a handful of buckets instead of every event.
+Request paths hand events to submit(); a background writer inserts them in batches, one
+transaction per batch, so no request waits on the SQLite write lock.
+"""
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pagination import encode_cursor, decode_cursor
+
+logger = logging.getLogger("UsageStore")
+
+COLUMNS = (
+    "timestamp", "service", "operation", "model", "input_tokens", "output_tokens",
+    "total_tokens", "cost_usd", "user_id", "job_id"
+)
+
+ROLLUP_KEY = ("user_id", "service", "model", "day")
+ROLLUP_COUNTERS = ("operations", "input_tokens", "output_tokens", "total_tokens", "cost_usd")
+
+# How often the writer checks for expired partitions
+PURGE_INTERVAL = 3600
+
+
+class UsageStore:
+    def __init__(self, db_path: str = "usage.sqlite3", retention_days: int = 90, max_queue: int = 10000, batch_size: int = 200):
+        self.db_path = db_path
+        self.retention_days = retention_days
+        self.lock = threading.Lock()
+        self.queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.worker: Optional[threading.Thread] = None
+        self.worker_lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, day TEXT NOT NULL, timestamp TEXT NOT NULL, "
+            "service TEXT, operation TEXT, model TEXT, input_tokens INTEGER, output_tokens INTEGER, "
+            "total_tokens INTEGER, cost_usd REAL, user_id TEXT, job_id TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS usage_events_user_time ON usage_events (user_id, timestamp)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS usage_events_day ON usage_events (day)")
+        # user_id is stored as '' rather than NULL so anonymous usage still aggregates into one bucket
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_rollups ("
+            "user_id TEXT NOT NULL, service TEXT NOT NULL, model TEXT NOT NULL, day TEXT NOT NULL, "
+            "operations INTEGER NOT NULL, input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL, "
+            "total_tokens INTEGER NOT NULL, cost_usd REAL NOT NULL, "
+            "PRIMARY KEY (user_id, service, model, day))"
+        )
+        self.conn.commit()
+        # Databases written before rollups existed: build them once from the events. The check and
+        # the insert share one write transaction so services starting together backfill only once.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not self.conn.execute("SELECT 1 FROM usage_rollups LIMIT 1").fetchone():
+                self.conn.execute(
+                    "INSERT INTO usage_rollups SELECT COALESCE(user_id, ''), COALESCE(service, ''), COALESCE(model, ''), day, "
+                    "COUNT(*), SUM(COALESCE(input_tokens, 0)), SUM(COALESCE(output_tokens, 0)), "
+                    "SUM(COALESCE(total_tokens, 0)), SUM(COALESCE(cost_usd, 0)) "
+                    "FROM usage_events GROUP BY 1, 2, 3, 4"
+                )
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.last_purge = 0.0
+        self.purge_expired()
+        atexit.register(self.flush)
+
+    def submit(self, entry: Dict[str, Any]):
+        """Queues an event for the background writer; writes inline only if the queue is full."""
+        self._ensure_worker()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self.append(entry)
+
+    def flush(self):
+        """Blocks until every submitted event has been written."""
+        self.queue.join()
+
+    def _ensure_worker(self):
+        if self.worker is None or not self.worker.is_alive():
+            with self.worker_lock:
+                if self.worker is None or not self.worker.is_alive():
+                    self.worker = threading.Thread(target=self._run, name="usage-store-writer", daemon=True)
+                    self.worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.append_many(batch)
+            except Exception as e:
+                logger.warning(f"Failed to persist {len(batch)} usage events: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def append(self, entry: Dict[str, Any]):
+        self.append_many([entry])
+
+    def append_many(self, entries: List[Dict[str, Any]]):
+        """Inserts the events and updates their rollups in one transaction."""
+        with self.lock:
+            try:
+                for entry in entries:
+                    day = entry["timestamp"][:10]
+                    self.conn.execute(
+                        f"INSERT INTO usage_events (day, {', '.join(COLUMNS)}) VALUES (?{', ?' * len(COLUMNS)})",
+                        (day, *(entry.get(c) for c in COLUMNS))
+                    )
+                    self.conn.execute(
+                        "INSERT INTO usage_rollups VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?) "
+                        "ON CONFLICT (user_id, service, model, day) DO UPDATE SET "
+                        "operations = operations + 1, "
+                        "input_tokens = input_tokens + excluded.input_tokens, "
+                        "output_tokens = output_tokens + excluded.output_tokens, "
+                        "total_tokens = total_tokens + excluded.total_tokens, "
+                        "cost_usd = cost_usd + excluded.cost_usd",
+                        (entry.get("user_id") or "", entry.get("service") or "", entry.get("model") or "", day,
+                         entry.get("input_tokens") or 0, entry.get("output_tokens") or 0,
+                         entry.get("total_tokens") or 0, entry.get("cost_usd") or 0.0)
+                    )
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+        if time.time() - self.last_purge > PURGE_INTERVAL:
+            self.purge_expired()
+
+    def query(
+        self,
+        user_id: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Events in time order, optionally for one user and within [since, until) (ISO timestamps)."""
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM usage_events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY timestamp {'DESC' if newest_first else 'ASC'}, id {'DESC' if newest_first else 'ASC'}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def page(
+        self,
+        user_id: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a user's events, newest first, within [since, until). Seeks on the
+        (user_id, timestamp) index from the cursor, so deep pages cost the same as the first.
+        """
+        clauses, params = ["user_id = ?"], [user_id]
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        after = decode_cursor(cursor)
+        if after:
+            clauses.append("(timestamp < ? OR (timestamp = ? AND id < ?))")
+            params.extend([after[0], after[0], int(after[1] or 0)])
+        sql = (
+            f"SELECT id, {', '.join(COLUMNS)} FROM usage_events WHERE {' AND '.join(clauses)} "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?"
+        )
+        with self.lock:
+            rows = [dict(row) for row in self.conn.execute(sql, params + [limit + 1]).fetchall()]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["timestamp"], str(rows[-1]["id"]))
+        for row in rows:
+            del row["id"]
+        return rows, next_cursor
+
+    def iter_events(
+        self,
+        user_id: str,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Dict[str, Any]]:
+        """All of a user's events in range, newest first, read in batches for streaming exports."""
+        cursor = None
+        while True:
+            rows, cursor = self.page(user_id, batch_size, cursor, since, until)
+            yield from rows
+            if not cursor:
+                return
+
+    def rollups(self, user_id: Optional[str] = None, since_day: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Daily usage buckets (user_id, service, model, day + counters), optionally for one user and from since_day on."""
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if since_day:
+            clauses.append("day >= ?")
+            params.append(since_day)
+        sql = f"SELECT {', '.join(ROLLUP_KEY + ROLLUP_COUNTERS)} FROM usage_rollups"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        with self.lock:
+            rows = self.conn.execute(sql + " ORDER BY day", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0]
+
+    def purge_expired(self):
+        """Drops the day partitions that fell out of the retention window."""
+        self.last_purge = time.time()
+        if self.retention_days <= 0:
+            return
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime("%Y-%m-%d")
+        try:
+            with self.lock:
+                deleted = self.conn.execute("DELETE FROM usage_events WHERE day < ?", (cutoff,)).rowcount
+                self.conn.execute("DELETE FROM usage_rollups WHERE day < ?", (cutoff,))
+                self.conn.commit()
+            if deleted:
+                logger.info(f"Deleted {deleted} usage events older than {cutoff}")
+        except sqlite3.Error as e:
+            logger.warning(f"Usage retention purge failed: {e}")